@@ -13,6 +13,9 @@ from ..lib.dependencies import on_user
 
 router = APIRouter(prefix='/feed', tags=['feed'])
 db = Db()
+# seconds a feed run may take. After that its scraping job finishes with the articles
+# retrieved so far instead of staying stuck on a hanging outlet.
+RUN_DEADLINE = 300
 
 
 @router.get('', description='List all feeds', response_model=list[DBFeed])
@@ -55,7 +58,7 @@ async def task(user: DBUser, config: list[OutletConfig]):
         user.id, {'daily_scrape_count': user.daily_scrape_count + 1})
     # triggers scraping job status to running
     scraping_job = ScrapingJobRepository.upsert(user.id)
-    await run_from_list(config)
+    await run_from_list(config, deadline=RUN_DEADLINE)
     timestamp = datetime.utcnow()
     # update the scraping job with fresh data
     ScrapingJobRepository.update(scraping_job.id, {
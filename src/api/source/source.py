@@ -4,6 +4,7 @@ import importlib
 from ..lib.db import Db
 from ..lib.exceptions import RepositoryInvalidIdError, RepositoryException
 from models import CustomBaseModel
+from session import create_session
 from .repository import SourceRepository
 
 router = APIRouter(prefix='/source', tags=['source'])
@@ -29,7 +30,8 @@ async def read_feedoutlet(id: str, endpoint: str = Query(..., description='The e
     _module = importlib.import_module(
         'scrapers.' + source.ref)
     try:
-        await _module.list_articles(endpoint)
+        async with create_session(source.ref) as client:
+            await _module.list_articles(client, endpoint)
     except Exception as e:
         return PokeResponse(url=create_url(source.base_url, endpoint), success=False)
     return PokeResponse(url=create_url(source.base_url, endpoint), success=True)
@@ -28,6 +28,8 @@ class CheckResponse(CustomBaseModel):
 class CheckRequestBody(CustomBaseModel):
     name: str
     url: str
+    # serve recently fetched pages from the response cache
+    response_cache: bool = False
 
 
 @router.post(
@@ -38,7 +40,7 @@ class CheckRequestBody(CustomBaseModel):
 async def check_source(body: CheckRequestBody) -> CheckResponse:
     try:
         article_info_models = await create_url_traces(
-            body.name, body.url
+            body.name, body.url, response_cache=body.response_cache
         )
     except Exception as e:
         logger.exception(e)
@@ -6,13 +6,23 @@ SRC_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
 SCRAPER_DIR = SRC_DIR / 'scrapers'
 ROOT_DIR = SRC_DIR.parent
 TEST_DIR = Path(ROOT_DIR) / 'tests'
+# persistent http caches (validators, responses) live here
+CACHE_DIR = Path(os.environ.get('SCRAPER_CACHE_DIR', ROOT_DIR / '.cache'))
+RESPONSE_CACHE_DIR = Path(
+    os.environ.get('SCRAPER_RESPONSE_CACHE_DIR', CACHE_DIR / 'responses'))
 
+# accept-encoding is negotiated by the client transport (see v2.client.compression)
 HEADERS = {
     "user-agent": "Mozilla/5.0 (iPad; CPU OS 11_0 like Mac OS X) AppleWebKit/604.1.34 (KHTML, like Gecko) Version/11.0 Mobile/15A5341f Safari/604.1",
-    "content-type": "application/json",
     "accept": "*/*",
     "sec-fetch-site": "same-site",
     "sec-fetch-mode": "cors",
     "sec-fetch-dest": "empty",
     "accept-language": "en-US,en;q=0.9",
-}
\ No newline at end of file
+}
+
+# per-outlet header profiles used by the v1 engine sessions. Outlets not listed here
+# use HEADERS.
+HEADER_PROFILES = {
+    "aljazeera": {**HEADERS, "wp-site": "aje"},
+}
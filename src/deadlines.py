@@ -0,0 +1,176 @@
+"""Run-wide deadlines and per-stage time budgets.
+
+A deadline is set once, where a run starts (the cli or the api), and flows through
+context to everything the run does: engine stages, http requests (whose timeouts are
+clamped to the time left), retries and database writes. Each stage of an engine run
+(listing articles, fetching them, persisting them) can also have a budget of its own.
+
+When time runs out, stages give up gracefully: a listing that times out yields no
+articles, fetching stops and keeps the articles it already has, and the run returns
+those partial results rather than hanging.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, Optional, Sequence, TypeVar
+
+import aiometer
+
+from exceptions import BaseException
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# seconds the articles retrieved in time are always given to be written, even when the
+# run deadline has (nearly) passed, unless a shorter persist budget is set
+MIN_PERSIST_TIMEOUT = 5.0
+
+
+class DeadlineExceededError(BaseException):
+    """Raised when work is started after the run's deadline has passed."""
+
+
+class Deadline:
+    """A point in time, <seconds> from now, by which a run must be done."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+def remaining() -> float | None:
+    """Seconds left until the current deadline, or None if there is none."""
+    current = current_deadline()
+    return None if current is None else current.remaining()
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[Deadline | None]:
+    """Set a deadline <seconds> from now for the code in the context (including tasks
+    started in it). A nested deadline can't extend an enclosing one. If <seconds> is
+    None, the current deadline (if any) is kept."""
+    parent = current_deadline()
+    if seconds is None:
+        yield parent
+        return
+    new = Deadline(seconds)
+    if parent is not None and parent.expires_at < new.expires_at:
+        new = parent
+    token = _current_deadline.set(new)
+    try:
+        yield new
+    finally:
+        _current_deadline.reset(token)
+
+
+@dataclass
+class StageBudgets:
+    """Seconds each stage of an engine run may take. None means the stage is only
+    bound by the run's deadline.
+
+    Attributes:
+        list (float | None): Getting the article urls from the listing page.
+        articles (float | None): Getting every article.
+        persist (float | None): Writing the articles to the database.
+    """
+
+    list: float | None = None
+    articles: float | None = None
+    persist: float | None = None
+
+    def timeout(self, stage: str) -> float | None:
+        """The seconds <stage> ("list", "articles" or "persist") may take now. The
+        persist budget is set aside from the run's deadline by the stages before it,
+        so articles retrieved in time still get saved, and the persist stage always
+        gets at least `MIN_PERSIST_TIMEOUT` (or its own budget, if shorter)."""
+        if stage != "persist":
+            return stage_timeout(getattr(self, stage), reserve=self.persist)
+        timeout = stage_timeout(self.persist)
+        if timeout is None:
+            return None
+        floor = MIN_PERSIST_TIMEOUT
+        if self.persist is not None:
+            floor = min(floor, self.persist)
+        return max(timeout, floor)
+
+
+def stage_timeout(budget: float | None, reserve: float | None = None) -> float | None:
+    """The seconds a stage may take: its own <budget>, capped by what is left of the
+    current deadline once <reserve> seconds are set aside for the stages after it.
+    None if there's no limit at all."""
+    left = remaining()
+    if left is not None and reserve:
+        left = max(0.0, left - reserve)
+    limits = [limit for limit in (budget, left) if limit is not None]
+    return min(limits) if limits else None
+
+
+async def run_within(
+    name: str,
+    stage: str,
+    timeout: float | None,
+    awaitable: Awaitable[T],
+    default: T,
+) -> T:
+    """Await <awaitable>, or return <default> if it takes longer than <timeout> or
+    the run deadline passes."""
+    try:
+        async with asyncio.timeout(timeout):
+            return await awaitable
+    except (TimeoutError, DeadlineExceededError):
+        logger.warning(f"{name};{stage} ran out of time")
+        return default
+
+
+async def run_all_within(
+    name: str,
+    stage: str,
+    timeout: float | None,
+    jobs: Sequence[Callable[[], Awaitable[Any]]],
+    max_at_once: int | None = None,
+    max_per_second: float | None = None,
+) -> list:
+    """Like `aiometer.run_all`, but stops after <timeout> seconds (or when the run
+    deadline passes) and returns the results of the jobs that completed in time. Like
+    `aiometer.run_all`, results are in the order of <jobs>."""
+    results: dict[int, Any] = {}
+
+    async def run(index: int) -> tuple[int, Any]:
+        return index, await jobs[index]()
+
+    try:
+        async with asyncio.timeout(timeout):
+            async with aiometer.amap(
+                run,
+                range(len(jobs)),
+                max_at_once=max_at_once,
+                max_per_second=max_per_second,
+            ) as completed:
+                async for index, result in completed:
+                    results[index] = result
+    except (TimeoutError, DeadlineExceededError):
+        logger.warning(
+            f"{name};{stage} ran out of time. {len(results)}/{len(jobs)} completed"
+        )
+    return [results[index] for index in sorted(results)]
@@ -5,13 +5,18 @@ import asyncio
 import functools
 from confection import registry
 import catalogue
+import pymongo
 from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
 import httpx
-import aiometer
 from models import Article
 from db import Db
 import logging
 from engine_v2 import Enginev2
+from session import create_session, prewarm
+from deadlines import StageBudgets, run_all_within, run_within
+from v2.client import (concurrency_controllers, hedging, stage_jobs, stage_listing,
+                       staged_run)
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -21,38 +26,97 @@ registry.engine = catalogue.create('engine', 'engines', entry_points=True)
 
 
 @registry.engine.register('engine.v1')
-def _factory(module: str,
-             path: str,
-             max_at_once: int = 10,
-             max_per_second: int = 10,
-             db_uri: str | None = None,
-             db_must_connect: bool = False,
-             debug: bool = False):
-    return Engine(module,
-                  path,
-                  max_at_once=max_at_once,
-                  max_per_second=max_per_second,
-                  db_uri=db_uri,
-                  db_must_connect=db_must_connect,
-                  debug=debug)
+def _factory(
+    module: str,
+    path: str,
+    max_at_once: int = 10,
+    max_per_second: int = 10,
+    db_uri: str | None = None,
+    db_must_connect: bool = False,
+    debug: bool = False,
+    http2: bool = False,
+    max_streams: int | None = None,
+    conditional_get: bool = False,
+    response_cache: bool = False,
+    response_cache_ttl: float | None = None,
+    rate_limit: float | None = None,
+    rate_burst: int | None = None,
+    adaptive: bool = False,
+    hedge_percentile: float | None = None,
+    hedge_budget: float = 0.05,
+    list_timeout: float | None = None,
+    articles_timeout: float | None = None,
+    persist_timeout: float | None = None,
+):
+    return Engine(
+        module,
+        path,
+        max_at_once=max_at_once,
+        max_per_second=max_per_second,
+        db_uri=db_uri,
+        db_must_connect=db_must_connect,
+        debug=debug,
+        http2=http2,
+        max_streams=max_streams,
+        conditional_get=conditional_get,
+        response_cache=response_cache,
+        response_cache_ttl=response_cache_ttl,
+        rate_limit=rate_limit,
+        rate_burst=rate_burst,
+        adaptive=adaptive,
+        hedge_percentile=hedge_percentile,
+        hedge_budget=hedge_budget,
+        list_timeout=list_timeout,
+        articles_timeout=articles_timeout,
+        persist_timeout=persist_timeout,
+    )
 
 
 @registry.engine.register('engine.v2')
-def _factoryv2(module: str,
-             path: str,
-             max_at_once: int = 10,
-             max_per_second: int = 10,
-             db_uri: str | None = None,
-             db_must_connect: bool = False,
-             debug: bool = False):
-    return Enginev2(module,
-                  path,
-                  max_at_once=max_at_once,
-                  max_per_second=max_per_second,
-                  db_uri=db_uri,
-                  db_must_connect=db_must_connect,
-                  debug=debug)
-
+def _factoryv2(
+    module: str,
+    path: str,
+    max_at_once: int = 10,
+    max_per_second: int = 10,
+    db_uri: str | None = None,
+    db_must_connect: bool = False,
+    debug: bool = False,
+    http2: bool = False,
+    max_streams: int | None = None,
+    conditional_get: bool = False,
+    response_cache: bool = False,
+    response_cache_ttl: float | None = None,
+    rate_limit: float | None = None,
+    rate_burst: int | None = None,
+    adaptive: bool = False,
+    hedge_percentile: float | None = None,
+    hedge_budget: float = 0.05,
+    list_timeout: float | None = None,
+    articles_timeout: float | None = None,
+    persist_timeout: float | None = None,
+):
+    return Enginev2(
+        module,
+        path,
+        max_at_once=max_at_once,
+        max_per_second=max_per_second,
+        db_uri=db_uri,
+        db_must_connect=db_must_connect,
+        debug=debug,
+        http2=http2,
+        max_streams=max_streams,
+        conditional_get=conditional_get,
+        response_cache=response_cache,
+        response_cache_ttl=response_cache_ttl,
+        rate_limit=rate_limit,
+        rate_burst=rate_burst,
+        adaptive=adaptive,
+        hedge_percentile=hedge_percentile,
+        hedge_budget=hedge_budget,
+        list_timeout=list_timeout,
+        articles_timeout=articles_timeout,
+        persist_timeout=persist_timeout,
+    )
 
 
 class Engine:
@@ -65,6 +129,19 @@ class Engine:
         db_uri: str | None = None,
         db_must_connect: bool = False,
         debug: bool = False,
+        http2: bool = False,
+        max_streams: int | None = None,
+        conditional_get: bool = False,
+        response_cache: bool = False,
+        response_cache_ttl: float | None = None,
+        rate_limit: float | None = None,
+        rate_burst: int | None = None,
+        adaptive: bool = False,
+        hedge_percentile: float | None = None,
+        hedge_budget: float = 0.05,
+        list_timeout: float | None = None,
+        articles_timeout: float | None = None,
+        persist_timeout: float | None = None,
     ):
         if debug:
             logging.basicConfig(level=logging.DEBUG)
@@ -72,6 +149,17 @@ class Engine:
         self.prefix = prefix
         self.max_at_once = max_at_once
         self.max_per_second = max_per_second
+        self.http2 = http2
+        self.max_streams = max_streams
+        self.conditional_get = conditional_get
+        self.response_cache = response_cache
+        self.response_cache_ttl = response_cache_ttl
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.adaptive = adaptive
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.budgets = StageBudgets(list_timeout, articles_timeout, persist_timeout)
         logger.info(f'{self._name};initialising engine...')
         # import module containing list_articles and get_article
         logger.debug(f'{self._name};importing module scrapers.{self._name}')
@@ -81,27 +169,68 @@ class Engine:
         self._list_articles: Callable[[
             httpx.AsyncClient, Any], Awaitable[list[str]]] = _module.list_articles
         self._get_article: Callable[[
-            httpx.AsyncClient, str], Awaitable[Article]] = _module.get_article
+            httpx.AsyncClient, str, str], Awaitable[Article]] = _module.get_article
+        # where the outlet is scraped from, connected to ahead of the run by prewarm()
+        self.origins: list[str] = [x for x in [getattr(_module, 'ARTICLE_BASE_HREF', None)] if x]
+
+    def _create_session(self) -> httpx.AsyncClient:
+        return create_session(self._name,
+                              max_connections=self.max_at_once,
+                              http2=self.http2,
+                              max_streams=self.max_streams,
+                              conditional_get=self.conditional_get,
+                              response_cache=self.response_cache,
+                              response_cache_ttl=self.response_cache_ttl,
+                              rate_limit=self.rate_limit,
+                              rate_burst=self.rate_burst,
+                              adaptive=self.adaptive,
+                              hedge_percentile=self.hedge_percentile,
+                              hedge_budget=self.hedge_budget)
+
+    async def prewarm(self):
+        """Resolve and connect to the outlet's origins ahead of the run. The session's
+        connection pool outlives it, so run() starts on warm connections."""
+        async with self._create_session() as client:
+            await prewarm(client, self.origins)
 
     async def run(self) -> Awaitable[list[Article]]:
-        logger.info(f'{self._name};getting article urls...')
-        # this may raise, we want it to. We can't continue without it.
-        article_urls = await self._list_articles(self.prefix)
-        logger.info(
-            f'{self._name};got {len(article_urls)} article urls. Beginning article text retrieval...')
-        logger.debug(f'{self._name};{article_urls}')
-        jobs = [functools.partial(self._get_article, url, self.prefix)
-                for url in article_urls]
-        articles = await aiometer.run_all(
-            jobs,
-            max_at_once=self.max_at_once,
-            max_per_second=self.max_per_second,
-        )
+        # validators are only stored once the articles are persisted
+        with staged_run() as validators:
+            # one keep-alive session for the whole run, shared by every request to the outlet
+            async with self._create_session() as client:
+                logger.info(f'{self._name};getting article urls...')
+                # this may raise, we want it to. We can't continue without it.
+                # Running out of time isn't an error though: there's just nothing to get.
+                with stage_listing():
+                    article_urls = await run_within(
+                        self._name, 'list', self.budgets.timeout('list'),
+                        self._list_articles(client, self.prefix), default=[])
+                logger.info(
+                    f'{self._name};got {len(article_urls)} article urls. Beginning article text retrieval...')
+                logger.debug(f'{self._name};{article_urls}')
+                jobs = stage_jobs([
+                    functools.partial(self._get_article, client, url, self.prefix)
+                    for url in article_urls
+                ])
+                # keeps the articles retrieved so far if time runs out
+                articles = await run_all_within(
+                    self._name, 'articles', self.budgets.timeout('articles'),
+                    jobs,
+                    max_at_once=self.max_at_once,
+                    max_per_second=self.max_per_second,
+                )
         articles = [x for x in filter(lambda x: x is not None, articles)]
+        if self.adaptive:
+            logger.info(f'{self._name};adaptive concurrency {concurrency_controllers.snapshot()}')
+        if self.hedge_percentile:
+            logger.info(f'{self._name};hedging {hedging.snapshot()}')
         logger.info(
             f'{self._name};found text for {len(articles)} articles. Updating in db...')
         logger.debug(f'{self._name};{articles}')
-        if not self._db.empty:
+        if not articles:
+            logger.info(f'{self._name};no new articles. skipping db update.')
+            validators.commit()
+        elif not self._db.empty:
             db_ops = [
                 UpdateOne(
                     {'url': article.url, 'outlet': article.outlet},
@@ -109,11 +238,19 @@ class Engine:
                     upsert=True
                 ) for article in articles
             ]
-            write_result = self._db.get_collection(
-                'Article').bulk_write(db_ops)
+            try:
+                with pymongo.timeout(self.budgets.timeout('persist')):
+                    write_result = self._db.get_collection(
+                        'Article').bulk_write(db_ops)
+            except PyMongoError as e:
+                if not e.timeout:
+                    raise
+                logger.warning(f'{self._name};ran out of time updating db: {e!r}')
+                return articles
             logger.info(
                 f'{self._name};updated {write_result.modified_count} articles. inserted {write_result.upserted_count} articles.')
             logger.debug(f'{self._name};{write_result}')
+            validators.commit()
         else:
             logger.info(f'{self._name};no db connection. skipping db update.')
         return articles
@@ -6,12 +6,15 @@ import logging
 import functools
 import itertools
 import traceback
+import contextlib
 
 from confection import registry, Config
 import aiometer
 
 from consts import ROOT_DIR
 from models import Article
+from v2.client import close_shared_http_transports, recording, replaying, transfer_stats
+import deadlines
 import engine
 
 logging.basicConfig(level=logging.INFO)
@@ -28,14 +31,29 @@ async def _wrapper(engine):
         logger.error(f'Engine {engine._name} failed with error {e}')
 
 
-async def run_from_config(config: dict):    
-    results = await aiometer.run_all([functools.partial(_wrapper, engine) for engine in config.values()])
+async def _prewarm(engines: list):
+    """Resolve and connect to every engine's outlet in parallel, so that the runs
+    don't pay for DNS, TCP and TLS on their first requests."""
+    results = await asyncio.gather(*[x.prewarm() for x in engines], return_exceptions=True)
+    for outlet_engine, result in zip(engines, results):
+        if isinstance(result, Exception):
+            logger.warning(f'{outlet_engine._name};prewarming failed with error {result}')
+
+
+async def run_from_config(config: dict, deadline: float | None = None):
+    """Run every engine of a resolved config. If <deadline> is given, the run
+    returns with what it has after that many seconds (see deadlines)."""
+    with deadlines.deadline(deadline):
+        await _prewarm(list(config.values()))
+        results = await aiometer.run_all([functools.partial(_wrapper, engine) for engine in config.values()])
+    logger.info(f'bytes transferred per domain {transfer_stats.snapshot()}')
     results = filter(None, results)
     return list(itertools.chain.from_iterable(results))
 
 
-async def run_from_list(config: list):
-    """From list of config dicts.
+async def run_from_list(config: list, deadline: float | None = None):
+    """From list of config dicts. If <deadline> is given, the run returns with what
+    it has after that many seconds (see deadlines).
     [{
         module: "bbc",
         path: "news/science-environment-56837908",
@@ -49,15 +67,29 @@ async def run_from_list(config: list):
     ]
     """
     engines = [engine._factory(**engine_config) for engine_config in config]
-    results = await aiometer.run_all([functools.partial(_wrapper, engine) for engine in engines])
+    with deadlines.deadline(deadline):
+        await _prewarm(engines)
+        results = await aiometer.run_all([functools.partial(_wrapper, engine) for engine in engines])
+    logger.info(f'bytes transferred per domain {transfer_stats.snapshot()}')
     results = filter(None, results)
     return list(itertools.chain.from_iterable(results))
 
 
-async def main(config_path: str) -> Awaitable[list[Article]]:
+async def main(config_path: str, record: str | None = None, replay: str | None = None, replay_latency: bool = False, deadline: float | None = None) -> Awaitable[list[Article]]:
+    """Run the engines of a config, within <deadline> seconds if given. Optionally
+    record all http traffic of the run to an archive, or replay a previously recorded
+    archive instead of hitting the network (see v2.client.record_replay)."""
     config = Config().from_disk(ROOT_DIR / config_path)
     resolved = registry.resolve(config)
-    results = await run_from_config(resolved)
+    if record:
+        http_mode = recording(record)
+    elif replay:
+        http_mode = replaying(replay, latency=replay_latency)
+    else:
+        http_mode = contextlib.nullcontext()
+    with http_mode:
+        results = await run_from_config(resolved, deadline=deadline)
+    await close_shared_http_transports()
     return results
 
 
@@ -66,5 +98,13 @@ if __name__ == "__main__":
         description='Run a bite-sized news outlet scraper.')
     parser.add_argument(
         'config', type=str, help='path to config file. This path should be relative to the root directory. For examples, see the templates/ folder.')
+    parser.add_argument(
+        '--record', type=str, default=None, help='record all http traffic of the run to this archive (e.g. fixtures/run.jsonl.gz).')
+    parser.add_argument(
+        '--replay', type=str, default=None, help='serve all http traffic from this previously recorded archive instead of the network.')
+    parser.add_argument(
+        '--replay-latency', action='store_true', help='when replaying, delay responses by their recorded latency.')
+    parser.add_argument(
+        '--deadline', type=float, default=None, help='seconds the whole run may take. When they run out, the articles retrieved so far are saved and returned.')
     args = parser.parse_args()
-    asyncio.run(main(args.config))
+    asyncio.run(main(args.config, record=args.record, replay=args.replay, replay_latency=args.replay_latency, deadline=args.deadline))
@@ -23,5 +23,5 @@ async def list_articles(client: Any, *args, **kwargs):
     ]
 
 
-async def get_article(client: Any, url: str):
+async def get_article(client: Any, url: str, *args, **kwargs):
     return Article(**test_article)
@@ -5,10 +5,10 @@ import httpx
 from pydantic import ValidationError
 
 from models import Article, NineEntArticle
-from consts import HEADERS
+from session import is_not_modified
 from exceptions import BaseException
 from utils import normalise_tags
-from bs4 import BeautifulSoup
+from v2.anchor_stream import FirstElement, first_anchor_in, stream_anchors
 
 
 logger = logging.getLogger(__name__)
@@ -17,22 +17,37 @@ OUTLET = 'afr'
 ARTICLE_BASE_HREF = 'https://www.afr.com/'
 
 
-async def list_articles(path: str) -> list[str]:
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path, headers=HEADERS)
-    if res.status_code != 200:
-        logger.error(f'list_articles;{res.status_code};{res.text}')
-        raise BaseException(f'Failed to get {path} with status code {res.status_code}')
-    soup = BeautifulSoup(res.text, 'html.parser')
-    article_ids = [x.a['href'].split("-")[-1] for x in soup.main.findAll('h3')]
+async def list_articles(client: httpx.AsyncClient, path: str) -> list[str]:
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path,
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        if res.status_code != 200:
+            await res.aread()
+            logger.error(f'list_articles;{res.status_code};{res.text}')
+            raise BaseException(f'Failed to get {path} with status code {res.status_code}')
+        # the first anchor of each h3 in the first <main>
+        in_main = FirstElement('main')
+        in_h3 = first_anchor_in('h3')
+        article_ids = [
+            x.href.split("-")[-1] async for x in stream_anchors(res.aiter_bytes(), res.encoding, deny=())
+            if in_main(x) and in_h3(x) and x.href
+        ]
+        if not in_main.found:
+            raise BaseException(f'No <main> in {path}')
     return article_ids
 
 
-async def get_article(url: str, path: str) -> Article:
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
     """In this case, the url is actually an article id which we pass to the API."""
     api_url = "https://api.afr.com/api/content/v0/assets/" + url
-    async with httpx.AsyncClient() as client:
-        response = await client.get(api_url, headers=HEADERS)
+    response = await client.get(api_url)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     try:
         article = NineEntArticle(**response.json(), url=url)
         if article.assetType != 'article':
@@ -2,11 +2,12 @@ import logging
 import itertools
 from datetime import datetime
 from pydantic import ValidationError
-from bs4 import BeautifulSoup
+from v2.parsers import parse_html
+from v2.anchor_stream import FirstElement, first_anchor_in, stream_anchors
 import httpx
 
-from consts import HEADERS
 from models import Article
+from session import is_not_modified
 from .model import AlJazeeraArticle
 from exceptions import BaseException
 
@@ -16,23 +17,36 @@ OUTLET = 'aljazeera'
 ARTICLE_BASE_HREF = 'https://www.aljazeera.com/'
 
 
-async def list_articles(path: str) -> list[str]:
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path.lstrip('/'), headers=HEADERS, follow_redirects=True)
-    if res.status_code != 200:
-        logger.error(f'list_articles;{res.status_code};{res.text}')
-        raise BaseException(
-            f'Failed to get {path} with status code {res.status_code}')
-    soup = BeautifulSoup(res.text, 'html.parser')
-    articles = soup.findAll('article')
-    article_urls = [x.find('h3').a['href'].split('/')[-1] for x in articles]
+async def list_articles(client: httpx.AsyncClient, path: str) -> list[str]:
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path.lstrip('/'), follow_redirects=True,
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        if res.status_code != 200:
+            await res.aread()
+            logger.error(f'list_articles;{res.status_code};{res.text}')
+            raise BaseException(
+                f'Failed to get {path} with status code {res.status_code}')
+        # the first anchor of the first h3 in each article
+        in_first_h3 = FirstElement('h3', within='article')
+        in_h3 = first_anchor_in('h3')
+        article_urls = [
+            x.href.split('/')[-1] async for x in stream_anchors(res.aiter_bytes(), res.encoding, deny=())
+            if in_first_h3(x) and in_h3(x) and x.href
+        ]
     return article_urls
 
 
-async def get_article(url: str, path: str) -> Article:
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
     query = 'graphql?wp-site=aje&operationName=ArchipelagoSingleArticleQuery&variables={"name":"%s","postType":"post","preview":""}' % url
-    async with httpx.AsyncClient() as client:
-        response = await client.get(ARTICLE_BASE_HREF + query, headers={**HEADERS, 'wp-site': 'aje'})
+    # the session's aljazeera header profile sets the wp-site header
+    response = await client.get(ARTICLE_BASE_HREF + query)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     data = response.json()['data']
     if 'errors' in data or data['article'] is None:
         logger.error(
@@ -40,7 +54,7 @@ async def get_article(url: str, path: str) -> Article:
         return None
     try:
         article = AlJazeeraArticle(**data['article'])
-        soup = BeautifulSoup(article.content, 'html.parser')
+        soup = parse_html(article.content)
         article.content = soup.text
     except ValidationError as e:
         logger.error(f'get_article;failed to validate {url};{e}')
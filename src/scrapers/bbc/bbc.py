@@ -1,12 +1,13 @@
 import logging
 from datetime import datetime
 from pydantic import ValidationError
-import json
-from bs4 import BeautifulSoup
+from v2.parsers import parse_html
+from v2.embedded_data import extract_embedded
+from v2.anchor_stream import FirstElement, first_anchor_in, stream_anchors
 import httpx
 
-from consts import HEADERS
 from models import Article
+from session import is_not_modified
 from utils import normalise_tags
 from exceptions import BaseException
 
@@ -16,40 +17,54 @@ OUTLET = 'bbc'
 ARTICLE_BASE_HREF = 'https://www.bbc.com/'
 
 
-async def list_articles(path: str) -> list[str]:
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path.lstrip('/'), headers=HEADERS)
-    if res.status_code != 200:
-        logger.error(f'list_articles;{res.status_code};{res.text}')
-        raise BaseException(f'Failed to get {path} with status code {res.status_code}')
-    soup = BeautifulSoup(res.text, 'html.parser')
-    article_urls = []
-    for article_block in soup.ol.findAll('h3'):
-        atag = article_block.find('a')
-        if atag:
-            article_urls.append(atag['href'])
-    # featured contents
-    featured_section = soup.find('div', {'aria-label': 'Featured Contents'}).findAll('a', {'class': 'gs-c-promo-heading'})
-    article_urls.extend([a['href'] for a in featured_section])
-    article_urls = [x for x in filter(lambda x: x.startswith('/news'), article_urls)]
+async def list_articles(client: httpx.AsyncClient, path: str) -> list[str]:
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path.lstrip('/'),
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        if res.status_code != 200:
+            await res.aread()
+            logger.error(f'list_articles;{res.status_code};{res.text}')
+            raise BaseException(f'Failed to get {path} with status code {res.status_code}')
+        # the first anchor of each h3 in the first <ol>, and the promo links of the
+        # first featured contents
+        in_list = FirstElement('ol')
+        in_featured = FirstElement('div', {'aria-label': 'Featured Contents'})
+        in_h3 = first_anchor_in('h3')
+        article_urls = []
+        featured_urls = []
+        async for anchor in stream_anchors(res.aiter_bytes(), res.encoding, deny=()):
+            if in_list(anchor) and in_h3(anchor):
+                article_urls.append(anchor.href)
+            if in_featured(anchor) and anchor.ancestors[-1].matches('a', {'class': 'gs-c-promo-heading'}):
+                featured_urls.append(anchor.href)
+        if not in_list.found or not in_featured.found:
+            raise BaseException(f'No article list or featured contents in {path}')
+    article_urls.extend(featured_urls)
+    article_urls = [x for x in filter(lambda x: x and x.startswith('/news'), article_urls)]
     return article_urls
 
 
-async def get_article(url: str, path: str) -> Article:
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
     full_url = ARTICLE_BASE_HREF + url
-    async with httpx.AsyncClient() as client:
-        response = await client.get(full_url, headers=HEADERS, follow_redirects=True)
+    response = await client.get(full_url, follow_redirects=True)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     if response.status_code != 200:
         logger.error(f'get_article;failed to get {url} with status code {response.status_code};{response.text}')
         return None
-    soup = BeautifulSoup(response.text, 'html.parser')
-    metadata_html = soup.find(type='application/ld+json')
-    if not metadata_html:
+    # read from the raw body, pages without metadata aren't parsed at all
+    metadata = extract_embedded(response.content, response.encoding).article
+    if not metadata:
         logger.error(f'get_article;no metadata in article;{url}')
         return None
-    metadata = json.loads(metadata_html.text)
-    created_string = metadata['datePublished'] if 'datePublished' in metadata.keys() else metadata['uploadDate']
-    modified_string = metadata['dateModified'] if 'dateModified' in metadata.keys() else metadata['uploadDate']
+    soup = parse_html(response.text)
+    created_string = metadata.date_published
+    modified_string = metadata.date_modified
     created = datetime.strptime(created_string, '%Y-%m-%dT%H:%M:%S.%fZ')
     modified = datetime.strptime(modified_string, '%Y-%m-%dT%H:%M:%S.%fZ')
     published = datetime.strptime(created_string, '%Y-%m-%dT%H:%M:%S.%fZ')
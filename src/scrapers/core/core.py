@@ -1,3 +1,5 @@
+import httpx
+
 from exceptions import BaseException
 from models.article import Article, ArticleType
 
@@ -15,6 +17,8 @@ class CoreScraper:
     each URL returned by list_articles(). However, this also allows for list_articles to populate
     the articles list directly. The engine will only call get_articles if there are no articles in
     the article list after list_articles() has been called.
+
+    Both methods receive the engine's shared http session as their first argument.
     """
 
     BASE_HREF: str = None
@@ -26,11 +30,11 @@ class CoreScraper:
                 "Please provide a BASE_HREF and SOURCE in the child class."
             )
 
-    async def get_article(self, url: URL, prefix: str) -> Article | None:
+    async def get_article(self, client: httpx.AsyncClient, url: URL, prefix: str) -> Article | None:
         """Gets the article content and creates an article object. All errors should
         be caught and should return None on error"""
         raise NotImplementedError("Please implement get_articles()")
 
-    async def list_articles(self, prefix: str) -> list[URL]:
+    async def list_articles(self, client: httpx.AsyncClient, prefix: str) -> list[URL]:
         """List articles from the page found at self.BASE_HREF + prefix."""
         raise NotImplementedError("Please implement list_articles()")
@@ -1,12 +1,13 @@
 import logging
 from datetime import datetime
 from pydantic import ValidationError
-import json
-from bs4 import BeautifulSoup
+from v2.parsers import parse_html
+from v2.embedded_data import extract_embedded
+from v2.anchor_stream import first_anchor_in, stream_anchors
 import httpx
 
-from consts import HEADERS
 from models import Article
+from session import is_not_modified
 from utils import normalise_tags
 from exceptions import BaseException
 
@@ -18,28 +19,40 @@ ARTICLE_BASE_HREF = 'https://www.theguardian.com/'
 
 ## yes i know the guardian has an API, idc ##
 
-async def list_articles(path: str) -> list[str]:
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path, headers=HEADERS)
-    if res.status_code != 200:
-        logger.error(f'list_articles;{res.status_code};{res.text}')
-        raise BaseException(f'Failed to get {path} with status code {res.status_code}')
-    soup = BeautifulSoup(res.text, 'html.parser')
-    article_urls = [x.a['href'] for x in soup.findAll('div', {'class': 'fc-item'})]
+async def list_articles(client: httpx.AsyncClient, path: str) -> list[str]:
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path,
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        if res.status_code != 200:
+            await res.aread()
+            logger.error(f'list_articles;{res.status_code};{res.text}')
+            raise BaseException(f'Failed to get {path} with status code {res.status_code}')
+        in_item = first_anchor_in('div', {'class': 'fc-item'})
+        article_urls = [
+            x.href async for x in stream_anchors(res.aiter_bytes(), res.encoding, deny=())
+            if in_item(x) and x.href
+        ]
     return article_urls
 
 
-async def get_article(url: str, path: str) -> Article:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=HEADERS)
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
+    response = await client.get(url)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     if response.status_code != 200:
         logger.error(f'get_article;failed to get {url} with status code {response.status_code};{response.text}')
         return None
-    soup = BeautifulSoup(response.text, 'html.parser')
-    print(url)
-    metadata = json.loads(soup.find(type='application/ld+json').text)
-    if isinstance(metadata, list):
-        metadata = metadata[0]
+    # read from the raw body, pages without metadata aren't parsed at all
+    metadata = extract_embedded(response.content, response.encoding).article
+    if not metadata:
+        logger.error(f'get_article;no metadata in article;{url}')
+        return None
+    soup = parse_html(response.text)
     title = soup.h1.text
     body = soup.find('div', {'id': 'maincontent'}).text
     tag_div = soup.find('div', {'class': 'dcr-1nx1rmt'})
@@ -52,9 +65,9 @@ async def get_article(url: str, path: str) -> Article:
             outlet=OUTLET,
             author=[],
             url=url,
-            created=datetime.strptime(metadata['datePublished'], '%Y-%m-%dT%H:%M:%S.%fZ'),
-            modified=datetime.strptime(metadata['dateModified'], '%Y-%m-%dT%H:%M:%S.%fZ'),
-            published=datetime.strptime(metadata['datePublished'], '%Y-%m-%dT%H:%M:%S.%fZ'),
+            created=datetime.strptime(metadata.date_published, '%Y-%m-%dT%H:%M:%S.%fZ'),
+            modified=datetime.strptime(metadata.date_modified, '%Y-%m-%dT%H:%M:%S.%fZ'),
+            published=datetime.strptime(metadata.date_published, '%Y-%m-%dT%H:%M:%S.%fZ'),
             title=title,
             body=body,
             tags=tags,
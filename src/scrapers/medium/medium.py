@@ -15,21 +15,20 @@ class Scraper(CoreScraper):
     SOURCE = 'medium'
     BASE_HREF = 'https://medium.com/'
 
-    async def list_articles(self, prefix: str) -> list[URL] | None:
+    async def list_articles(self, client: httpx.AsyncClient, prefix: str) -> list[URL] | None:
         """ Returns none, because we can populate the self.articles list from this function. No need to 
         return list of article urls."""
-        async with httpx.AsyncClient() as client:
-            tag_slug = re.search(r'^/?(tag/(\w+))', prefix)
-            if not tag_slug:
-                raise ScraperError(f'Invalid tag slug: {prefix}')
-            # mode NEW to get latest articles
-            res = await client.post(self.BASE_HREF + "_/graphql", json=[{"operationName": "TopicFeedQuery", "variables": {"tagSlug": tag_slug.group(2), "mode": "NEW", "paging": {"to": "0", "limit": 25}}, "query": query}])
-            res.raise_for_status()
-            data = res.json()
-            articles = data[0]['data']['tagFeed']['items']
-            medium_articles = [self._extract_article(
-                article, tag_slug.group(1)) for article in articles]
-            self.articles = [x for x in medium_articles if x]
+        tag_slug = re.search(r'^/?(tag/(\w+))', prefix)
+        if not tag_slug:
+            raise ScraperError(f'Invalid tag slug: {prefix}')
+        # mode NEW to get latest articles
+        res = await client.post(self.BASE_HREF + "_/graphql", json=[{"operationName": "TopicFeedQuery", "variables": {"tagSlug": tag_slug.group(2), "mode": "NEW", "paging": {"to": "0", "limit": 25}}, "query": query}])
+        res.raise_for_status()
+        data = res.json()
+        articles = data[0]['data']['tagFeed']['items']
+        medium_articles = [self._extract_article(
+            article, tag_slug.group(1)) for article in articles]
+        self.articles = [x for x in medium_articles if x]
 
     def _extract_article(self, article: dict, prefix: str) -> Article:
         try:
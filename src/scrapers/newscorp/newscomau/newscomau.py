@@ -1,12 +1,13 @@
 import logging
 from datetime import datetime
 from pydantic import ValidationError
-import json
-from bs4 import BeautifulSoup
+from v2.parsers import parse_html
+from v2.embedded_data import extract_embedded
+from v2.anchor_stream import FirstElement, first_anchor_in, stream_anchors
 import httpx
 
-from consts import HEADERS
 from models import Article
+from session import is_not_modified
 from exceptions import BaseException
 
 
@@ -16,26 +17,42 @@ OUTLET = 'news.com.au'
 ARTICLE_BASE_HREF = 'https://www.news.com.au/'
 
 
-async def list_articles(path: str) -> list[str]:
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path, headers=HEADERS)
-    if res.status_code != 200:
-        logger.error(f'list_articles;{res.status_code};{res.text}')
-        raise BaseException(f'Failed to get {path} with status code {res.status_code}')
-    soup = BeautifulSoup(res.text, 'html.parser')
-    articles = soup.findAll('article')
-    article_urls = [article.h4.a['href'] for article in articles]
+async def list_articles(client: httpx.AsyncClient, path: str) -> list[str]:
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path,
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        if res.status_code != 200:
+            await res.aread()
+            logger.error(f'list_articles;{res.status_code};{res.text}')
+            raise BaseException(f'Failed to get {path} with status code {res.status_code}')
+        # the first anchor of the first h4 in each article
+        in_first_h4 = FirstElement('h4', within='article')
+        in_h4 = first_anchor_in('h4')
+        article_urls = [
+            x.href async for x in stream_anchors(res.aiter_bytes(), res.encoding, deny=())
+            if in_first_h4(x) and in_h4(x) and x.href
+        ]
     return article_urls
 
 
-async def get_article(url: str, path: str) -> Article:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=HEADERS)
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
+    response = await client.get(url)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     if response.status_code != 200:
         logger.error(f'get_article;failed to get {url} with status code {response.status_code};{response.text}')
         return None
-    soup = BeautifulSoup(response.text, 'html.parser')
-    metadata = json.loads(soup.find(type='application/ld+json').text)
+    # read from the raw body, pages without metadata aren't parsed at all
+    metadata = extract_embedded(response.content, response.encoding).article
+    if not metadata:
+        logger.error(f'get_article;no metadata in article;{url}')
+        return None
+    soup = parse_html(response.text)
     title = soup.h1.text
     body = soup.find(id='story-primary').text
     tags = url.replace(ARTICLE_BASE_HREF, '').split('/')[:-3]
@@ -43,9 +60,9 @@ async def get_article(url: str, path: str) -> Article:
         article = Article(
             outlet=OUTLET,
             url=url,
-            created=datetime.strptime(metadata['datePublished'], '%Y-%m-%dT%H:%M:%S.%fZ'),
-            modified=datetime.strptime(metadata['dateModified'], '%Y-%m-%dT%H:%M:%S.%fZ'),
-            published=datetime.strptime(metadata['datePublished'], '%Y-%m-%dT%H:%M:%S.%fZ'),
+            created=datetime.strptime(metadata.date_published, '%Y-%m-%dT%H:%M:%S.%fZ'),
+            modified=datetime.strptime(metadata.date_modified, '%Y-%m-%dT%H:%M:%S.%fZ'),
+            published=datetime.strptime(metadata.date_published, '%Y-%m-%dT%H:%M:%S.%fZ'),
             title=title,
             body=body,
             wordCount=None,
@@ -1,12 +1,13 @@
 import logging
-import json
 from datetime import datetime
 from pydantic import ValidationError
-from bs4 import BeautifulSoup
+from v2.parsers import parse_html
+from v2.embedded_data import extract_embedded
+from v2.anchor_stream import FirstElement, stream_anchors
 import httpx
 
-from consts import HEADERS
 from models import Article
+from session import is_not_modified
 from exceptions import BaseException
 
 logger = logging.getLogger(__name__)
@@ -15,44 +16,62 @@ OUTLET = 'nytimes'
 ARTICLE_BASE_HREF = 'https://www.nytimes.com/'
 
 
-async def list_articles(path: str) -> list[str]:
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path.lstrip('/'), headers=HEADERS, follow_redirects=True)
-    if res.status_code != 200:
-        logger.error(f'list_articles;{res.status_code};{res.text}')
-        raise BaseException(
-            f'Failed to get {path} with status code {res.status_code}')
-    soup = BeautifulSoup(res.text, 'html.parser')
-    featured_section = soup.find('section', {'id': 'collection-highlights-container'})
-    list_section = soup.find('section', {'id': 'stream-panel'})
-    list_section_urls = set([x['href'] for x in list_section.findAll('a') if x['href'].endswith('.html')])
-    featured_urls = set([x['href'] for x in featured_section.findAll('a') if x['href'].endswith('.html')])
-    article_urls = list(list_section_urls.union(featured_urls))
-    return article_urls
+async def list_articles(client: httpx.AsyncClient, path: str) -> list[str]:
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path.lstrip('/'), follow_redirects=True,
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        if res.status_code != 200:
+            await res.aread()
+            logger.error(f'list_articles;{res.status_code};{res.text}')
+            raise BaseException(
+                f'Failed to get {path} with status code {res.status_code}')
+        # the (first) list and featured sections
+        in_list = FirstElement('section', {'id': 'stream-panel'})
+        in_featured = FirstElement('section', {'id': 'collection-highlights-container'})
+        article_urls = set()
+        async for x in stream_anchors(res.aiter_bytes(), res.encoding, deny=()):
+            # both filters see every anchor, so they find their first section
+            listed, featured = in_list(x), in_featured(x)
+            if (listed or featured) and x.href and x.href.endswith('.html'):
+                article_urls.add(x.href)
+        if not in_list.found or not in_featured.found:
+            raise BaseException(f'No list or featured section in {path}')
+    return list(article_urls)
 
 
-async def get_article(url: str, path: str) -> Article:
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
     full_url = ARTICLE_BASE_HREF + url.lstrip('/')
-    async with httpx.AsyncClient() as client:
-        response = await client.get(full_url, headers=HEADERS)
+    response = await client.get(full_url)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     if response.status_code != 200:
         logger.error(f'get_article;failed to get {url} with status code {response.status_code};{response.text}')
         return None
-    soup = BeautifulSoup(response.text, 'html.parser')
-    metadata = json.loads(soup.find(type='application/ld+json').text)
+    # read from the raw body, pages without metadata (or in another language) aren't
+    # parsed at all
+    metadata = extract_embedded(response.content, response.encoding).article
+    if not metadata:
+        logger.error(f'get_article;no metadata in article;{url}')
+        return None
+    elif metadata.language is not None and metadata.language != 'en':
+        logger.error(f'get_article;article {url} not in english;{metadata.raw}')
+        return None
+    soup = parse_html(response.text)
     article = soup.find('article', {'id': 'story'})
     if not article:
-        logger.error(f'get_article;failed to get {url} with status code {response.status_code};{metadata}')
-        return None
-    elif 'inLanguage' in metadata and metadata['inLanguage'] != 'en':
-        logger.error(f'get_article;article {url} not in english;{metadata}')
+        logger.error(f'get_article;failed to get {url} with status code {response.status_code};{metadata.raw}')
         return None
     title = article.h1.text
     content_section = article.find('section', {'name': 'articleBody'})
     body = ' '.join([x.text for x in content_section.findAll('p', {'class': 'css-at9mc1 evys1bk0'})])
-    author = [x['name'] for x in metadata['author']] if isinstance(metadata['author'], list) else metadata['author']['name']
-    published = metadata['datePublished']
-    modified = metadata['dateModified']
+    author = metadata.authors
+    published = metadata.date_published
+    modified = metadata.date_modified
     try:
         article = Article(
             outlet=OUTLET,
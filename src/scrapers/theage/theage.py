@@ -1,14 +1,15 @@
 import logging
-import json
 from datetime import datetime
 import traceback
 
 import httpx
 from pydantic import ValidationError
-from bs4 import BeautifulSoup
+from v2.parsers import parse_html
+from v2.embedded_data import extract_embedded
+from v2.anchor_stream import FirstElement, first_anchor_in, stream_anchors
 
 from models import Article, NineEntArticle
-from consts import HEADERS
+from session import is_not_modified
 from exceptions import BaseException
 from utils import normalise_tags
 
@@ -19,33 +20,50 @@ OUTLET = 'theage'
 ARTICLE_BASE_HREF = 'https://www.theage.com.au/'
 
 
-async def list_articles(path: str | list[str]) -> list[str]:
+async def list_articles(client: httpx.AsyncClient, path: str | list[str]) -> list[str]:
     """Because the pagination relies on synchronous requests, we simply add the delay between
     using our Requestor context.
     """
-    async with httpx.AsyncClient() as client:
-        res = await client.get(ARTICLE_BASE_HREF + path.lstrip('/'), headers=HEADERS)
-    soup = BeautifulSoup(res.text, 'html.parser')
-    content_div = soup.find('div', {'class': '_1-N-m'})
-    article_urls = [x.a['href'] for x in content_div.findAll('h3')]
+    # streamed, and never coalesced (which would read the body in full): anchors
+    # are read as they arrive, the page is never parsed into a tree
+    async with client.stream('GET', ARTICLE_BASE_HREF + path.lstrip('/'),
+                             extensions={'singleflight': False}) as res:
+        if is_not_modified(res):
+            logger.info(f'list_articles;{path} not modified since last run')
+            return []
+        # the first anchor of each h3 in the first content div
+        in_content = FirstElement('div', {'class': '_1-N-m'})
+        in_h3 = first_anchor_in('h3')
+        article_urls = [
+            x.href async for x in stream_anchors(res.aiter_bytes(), res.encoding, deny=())
+            if in_content(x) and in_h3(x) and x.href
+        ]
+        if not in_content.found:
+            raise BaseException(f'No content div in {path}')
     return article_urls
 
 
-async def get_article(url: str, path: str) -> Article:
+async def get_article(client: httpx.AsyncClient, url: str, path: str) -> Article:
     full_url = ARTICLE_BASE_HREF + url.lstrip('/')
-    async with httpx.AsyncClient() as client:
-        response = await client.get(full_url, headers=HEADERS)
+    response = await client.get(full_url)
+    if is_not_modified(response):
+        logger.debug(f'get_article;{url} not modified since last run')
+        return None
     if response.status_code != 200:
         logger.error(f'get_article;failed to get {url} with status code {response.status_code};{response.text}')
         return None
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # read from the raw body, pages without metadata aren't parsed at all
+    metadata = extract_embedded(response.content, response.encoding).article
+    if not metadata:
+        logger.error(f'get_article;no metadata in article;{url}')
+        return None
+    soup = parse_html(response.text)
     try:
-        metadata = json.loads(soup.find(type='application/ld+json').text)
         title = soup.h1.text
-        author = [x['name'] for x in metadata['author']] if isinstance(metadata['author'], list) else [metadata['author']['name']]
-        published = metadata['datePublished']
-        created = metadata['datePublished']
-        modified = metadata['dateModified']
+        author = metadata.authors
+        published = metadata.date_published
+        created = metadata.date_published
+        modified = metadata.date_modified
         tags = normalise_tags(*[x.text for x in soup.article.header.ul.findAll('li')])
         top_section = soup.find('section', {'data-testid': 'article-body-top'}).findAll('p')
         bottom_section = soup.find('section', {'data-testid': 'article-body-bottom'}).findAll('p')
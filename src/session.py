@@ -0,0 +1,91 @@
+import httpx
+
+from consts import HEADERS, HEADER_PROFILES
+from v2.client.cache import get_response_cache
+from v2.client.conditional import get_validator_store, is_not_modified  # noqa: F401
+from v2.client.connections import prewarm  # noqa: F401
+from v2.client.hedging import DEFAULT_HEDGE_BUDGET
+from v2.client.transports import create_transport
+
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+
+def create_session(
+    outlet: str,
+    max_connections: int = 10,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+    http2: bool = False,
+    max_streams: int | None = None,
+    conditional_get: bool = False,
+    response_cache: bool = False,
+    response_cache_ttl: float | None = None,
+    rate_limit: float | None = None,
+    rate_burst: int | None = None,
+    adaptive: bool = False,
+    hedge_percentile: float | None = None,
+    hedge_budget: float = DEFAULT_HEDGE_BUDGET,
+    **kwargs,
+) -> httpx.AsyncClient:
+    """Create the keep-alive http session an engine shares across every request it
+    makes to an outlet. The session carries the outlet's header profile, so scrapers
+    don't need to pass headers on each call. Its connection pool is shared with every
+    other session of the outlet with the same limits, and outlives the session (see
+    `v2.client.connections`).
+
+    Args:
+        outlet (str): The scraper module name, used to look up the header profile.
+        max_connections (int, optional): Connection (and keep-alive) limit for the
+            session. Usually the engine's max_at_once. Defaults to 10.
+        keepalive_expiry (float, optional): Seconds to keep idle connections open.
+            Defaults to 30.
+        http2 (bool, optional): Multiplex concurrent requests over a single HTTP/2
+            connection, falling back to HTTP/1.1 where unsupported. Defaults to False.
+        max_streams (int | None, optional): Maximum concurrent requests in flight on
+            the session. Defaults to None.
+        conditional_get (bool, optional): Send the ETag / Last-Modified validators
+            stored from previous runs with every GET, so unchanged pages come back as
+            an empty 304. Defaults to False.
+        response_cache (bool, optional): Serve GETs from the on-disk response cache
+            while fresh, e.g. when re-running after a failure. Defaults to False.
+        response_cache_ttl (float | None, optional): Overrides the cache's per-domain
+            TTL. Defaults to None.
+        rate_limit (float | None, optional): Requests per second allowed to each domain
+            the session requests, shared with every other engine in the process.
+            Defaults to None.
+        rate_burst (int | None, optional): Burst size of <rate_limit>. Defaults to
+            None.
+        adaptive (bool, optional): Control the concurrency to each domain adaptively,
+            with <max_connections> as the ceiling. Defaults to False.
+        hedge_percentile (float | None, optional): Fire a duplicate of GET requests
+            that are slower than this percentile of their domain's recent latencies,
+            and use whichever response comes first. Defaults to None.
+        hedge_budget (float, optional): Maximum hedged requests as a share of each
+            domain's requests. Defaults to 0.05.
+
+    Returns:
+        httpx.AsyncClient: A client to be used as an async context manager.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        headers=HEADER_PROFILES.get(outlet, HEADERS),
+        transport=create_transport(
+            limits,
+            http2=http2,
+            max_streams=max_streams,
+            validators=get_validator_store() if conditional_get else None,
+            cache=get_response_cache() if response_cache else None,
+            cache_ttl=response_cache_ttl,
+            rate_limit=rate_limit,
+            rate_burst=rate_burst,
+            adaptive_ceiling=max_connections if adaptive else None,
+            hedge_percentile=hedge_percentile,
+            hedge_budget=hedge_budget,
+            # connections to the outlet stay warm between runs and sessions
+            share_key=outlet,
+        ),
+        **kwargs,
+    )
@@ -1,5 +1,8 @@
 from bs4 import Tag, BeautifulSoup
 
+from v2.heuristic import evaluate_anchors
+from v2.soup_helpers import prune_tree
+
 UNINTERESTING_TAGS = [
     "noscript",
     "script",
@@ -38,22 +41,7 @@ AnchorTag = Tag
 def keep_only_interesting_paths(tag: Tag) -> bool:
     """We only retain paths that a) contain interesting tags and b) contain at
     least one <a> tag."""
-    some_child_contains_a_tag = False
-    children = tag.contents.copy()
-    for child in children:
-        if isinstance(child, Tag):
-            if child.name not in INTERESTING_TAGS:
-                child.decompose()
-                continue
-            child_contains_a_tag = keep_only_interesting_paths(child)
-            # switch flag to true if any child contains <a> tag
-            some_child_contains_a_tag = (
-                some_child_contains_a_tag or child_contains_a_tag
-            )
-            # if child does not contain <a> tag, we can prune it
-            if not child_contains_a_tag:
-                child.decompose()
-    return tag.name == "a" or some_child_contains_a_tag
+    return prune_tree(tag, allow=INTERESTING_TAGS, require="a").kept
 
 
 def keyword_in_tag_attributes(tag: Tag, keyword: str) -> bool:
@@ -121,14 +109,8 @@ def heuristic_article_in_attributes(soup: BeautifulSoup) -> list[AnchorTag]:
     """Heuristic function that checks to see if there is some mention of
     'article' in the <a> tag attributes, or in the attributes of any of
     its parents (up to a certain depth)."""
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if check_upward_keyword_in_tag(a, "article", max_depth=1):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.article_in_attributes)
 
 
 def heuristic_anchor_inside_article_tag(
@@ -137,28 +119,16 @@ def heuristic_anchor_inside_article_tag(
     """A heuristic that checks to see if the <a> tag is a child inside an
     <article> tag. As long as the <a> tag is not too deep inside the <article>.
     """
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if a_inside_tag(a, "article", max_depth=5):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.inside_article)
 
 
 def heuristic_anchor_inside_list_tag(soup: BeautifulSoup) -> list[AnchorTag]:
     """A heuristic that checks to see if the <a> tag is a child inside an
     <li> tag. As long as the <a> tag is not too deep inside the <li>.
     """
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if a_inside_tag(a, "li", max_depth=5):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.inside_list)
 
 
 def heuristic_has_neighbouring_heading(
@@ -166,27 +136,15 @@ def heuristic_has_neighbouring_heading(
 ) -> list[AnchorTag]:
     """Heuristic that returns all <a> tags that are inside an <article> tag
     (up to depth 5) and have a neighbouring <h*> tag."""
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if has_neighbouring_heading_tag(a):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.neighbouring_heading)
 
 
 def heuristic_dot_html(soup: BeautifulSoup) -> list[AnchorTag]:
     """A heuristic that checks to see if the <a> tag has a .html link.
     Returns the link if it does."""
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if a["href"].endswith(".html"):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.dot_html)
 
 
 class Runner:
@@ -28,9 +28,10 @@ def find_json_objects(text: str, decoder=json.JSONDecoder()):
         if match == -1:
             break
         try:
-            result, index = decoder.raw_decode(text[match:])
+            # decodes in place: slicing text[match:] would copy the rest of the text
+            # for every "{", which is quadratic on big scripts
+            result, pos = decoder.raw_decode(text, match)
             yield result
-            pos = match + index
         except ValueError:
             pos = match + 1
 
@@ -2,8 +2,10 @@ import Levenshtein
 from bs4 import BeautifulSoup, Tag
 
 from consts import HEADERS
-from v2.client import get
+from v2.client import stream
+from v2.head_metadata import read_head
 from v2.html_parser import trace_tag_to_root
+from v2.parsers import parse_html
 
 
 def get_h1(soup: BeautifulSoup, expected: str | None = None) -> Tag:
@@ -27,23 +29,55 @@ class ArticleInfoAgent:
     traces for the article page itself. Currently only the article title.
     """
 
-    async def create_title_trace(self, soup: BeautifulSoup) -> list[str]:
+    async def create_title_trace(
+        self, soup: BeautifulSoup, expected: str | None = None
+    ) -> list[str]:
         """Creates a trace to navigate to the title of the article.
 
         Args:
             soup (BeautifulSoup): The soup object to navigate.
+            expected (str | None, optional): The title, if known, to pick the right
+                <h1> when there are several. Defaults to None.
 
         Returns:
             list[str]: The trace to navigate to the title.
         """
-        h1_text = get_h1(soup)
+        h1_text = get_h1(soup, expected)
         if h1_text:
             title_trace = trace_tag_to_root(h1_text)
             return title_trace[::-1]
         raise ValueError("No title found")
 
+    def _parse(
+        self, read: list[bytes], encoding: str, closed_h1s_only: bool = False
+    ) -> BeautifulSoup:
+        html = b"".join(read).decode(encoding, errors="replace")
+        if closed_h1s_only:
+            # up to the last </h1>, so the text of any <h1> parsed is all there
+            last_close = html.lower().rfind("</h1")
+            html = html[: html.find(">", last_close) + 1 or len(html)]
+        return parse_html(html)
+
     async def run(self, url: str) -> list[str]:
-        response = await get(url, headers=HEADERS, follow_redirects=True)
-        soup = BeautifulSoup(response.text, "html.parser")
-        title_trace = await self.create_title_trace(soup)
+        """Finds the title trace of the article at <url>. The title in the page's head
+        metadata picks the right <h1> when there are several, and once an <h1> with
+        exactly that title has been read, the rest of the page isn't downloaded: the
+        trace of an <h1> doesn't depend on anything after it."""
+        async with stream(url, headers=HEADERS, follow_redirects=True) as response:
+            chunks = response.iter_bytes()
+            metadata, head = await read_head(chunks, response.encoding)
+            expected = metadata.headline
+            read = [head]
+            soup = None
+            async for chunk in chunks:
+                closes_h1 = b"</h1" in (read[-1][-4:] + chunk).lower()
+                read.append(chunk)
+                if expected and closes_h1:
+                    soup = self._parse(read, response.encoding, closed_h1s_only=True)
+                    if any(h1.get_text().strip() == expected for h1 in soup("h1")):
+                        break
+                    soup = None
+        if soup is None:
+            soup = self._parse(read, response.encoding)
+        title_trace = await self.create_title_trace(soup, expected)
         return title_trace
@@ -7,11 +7,17 @@ from langgraph.graph import END, StateGraph
 
 from consts import HEADERS
 from v2.agents.rewoo import ArticleLinkReWOO, init, solve2
-from v2.client import get
+from v2.anchor_stream import AnchorRecord, extract_anchors
+from v2.client import stream
 from v2.html_parser import get_unique_anchor_traces
 from v2.soup_helpers import create_soup
 
 
+# the links we're after are in the first few MB of even the heaviest pages, the rest
+# is mostly inline js
+MAX_PAGE_BYTES = 4 * 1024 * 1024
+
+
 class ArticleLinks(BaseModel):
     links: list[str] = Field(
         description="A list of all the links pointing to articles in the html",
@@ -45,17 +51,22 @@ class ArticleLinksAgent:
         return state["result"]
 
     def _create_scraping_traces(
-        self, soup: BeautifulSoup
+        self, soup: BeautifulSoup, anchors: list[AnchorRecord]
     ) -> tuple[list[list[str]], ArticleLinks]:
         """Generate the traces (i.e. unique paths from the root of the HTML to article
-        links) for the given HTML page."""
+        links) for the given HTML page, from the records of its <anchors>."""
         article_links = self.find_article_links(soup)
-        traces = get_unique_anchor_traces(article_links.links, soup)
+        traces = get_unique_anchor_traces(article_links.links, anchors)
         return traces, article_links
 
     async def run(self, url: str) -> tuple[list[list[str]], ArticleLinks]:
         """Run the agent on the given URL."""
-        response = await get(url, headers=HEADERS, follow_redirects=True)
+        async with stream(
+            url, max_bytes=MAX_PAGE_BYTES, headers=HEADERS, follow_redirects=True
+        ) as response:
+            await response.read()
         soup = create_soup(response.text)
-        traces, article_links = self._create_scraping_traces(soup)
+        # traces are matched against streamed anchors, not the configured parser's tree
+        anchors = list(extract_anchors(response.text))
+        traces, article_links = self._create_scraping_traces(soup, anchors)
         return traces, article_links
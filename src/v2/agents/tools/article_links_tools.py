@@ -3,7 +3,8 @@ import re
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import tool
 
-from v2.heuristic import a_inside_tag, check_upward_keyword_in_tag
+from v2.anchor_stream import extract_anchors
+from v2.heuristic import evaluate_anchors
 from v2.soup_helpers import create_soup, find_all_anchor_tags
 from v2.text_helpers import asciify
 
@@ -20,8 +21,8 @@ def list_anchor_tag_info(html_str: str) -> str:
     Example return value:
         ASX climbs on tech rally; Altium soars, BHP slumps (/business/markets/asx-set-to-rise-as-wall-street-steadies-a-rises-20240215-p5f52t.html)
     Where the title is followed by the href in parentheses."""
-    soup = create_soup(html_str)
-    anchors = find_all_anchor_tags(soup)
+    # only the anchors are needed, so the page isn't parsed into a tree
+    anchors = find_all_anchor_tags(extract_anchors(html_str))
     return anchors
 
 
@@ -36,27 +37,30 @@ def extract_anchor_information(html_str: str, anchors_str: str) -> list[tuple]:
     """
     soup = create_soup(html_str)
     anchors: list[tuple[str, str]] = re.findall(article_and_href_pattern, anchors_str)
+    # use these heuristics as extra metadata to help inform LLM model and assist
+    # with isolating only article links. Evaluated for every anchor in one pass
+    features = evaluate_anchors(soup, prune=False)
+    # the first anchor with each (text, href) and with each href
+    by_text_and_href: dict[tuple[str, str], int] = {}
+    by_href: dict[str, int] = {}
+    for row, (anchor, href) in enumerate(zip(features.anchors, features.hrefs)):
+        if href is None:
+            continue
+        by_text_and_href.setdefault((anchor.string, href), row)
+        by_href.setdefault(href, row)
     anchor_list = []
     for anchor_text, anchor_href in anchors:
-        a_tag = soup.find("a", text=anchor_text, href=anchor_href)
-        if not a_tag:
-            a_tag = soup.find("a", href=anchor_href)
-        if not a_tag:
+        row = by_text_and_href.get((anchor_text, anchor_href), by_href.get(anchor_href))
+        if row is None:
             continue
-        # use these heuristics as extra metadata to help inform LLM model and assist
-        # with isolating only article links
-        has_title_in_attrs = check_upward_keyword_in_tag(a_tag, "title", max_depth=2)
-        is_inside_article_tag = a_inside_tag(a_tag, "article", max_depth=5)
-        is_inside_li_tag = a_inside_tag(a_tag, "li", max_depth=5)
-        ends_with_dot_html = anchor_href.endswith(".html")
         anchor_list.append(
             (
                 asciify(anchor_text),
                 asciify(anchor_href),
-                has_title_in_attrs,
-                is_inside_article_tag,
-                is_inside_li_tag,
-                ends_with_dot_html,
+                bool(features.title_in_attributes[row]),
+                bool(features.inside_article[row]),
+                bool(features.inside_list[row]),
+                anchor_href.endswith(".html"),
             )
         )
     return anchor_list
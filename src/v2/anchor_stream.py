@@ -0,0 +1,375 @@
+"""Streaming anchor extraction for listing pages.
+
+Listing pages are only ever searched for their anchors: an anchor's href, its text and
+the tags above it (its path from the root, which is what traces match). Rather than
+parsing the whole page into a tree first, `AnchorExtractor` runs Python's incremental
+html tokenizer over the page as its bytes arrive and emits an `AnchorRecord` for each
+anchor once it closes. It only holds the stack of currently open elements (and the text
+of the anchors being read), so a page is processed in memory bounded by its nesting
+depth, not its size.
+
+Elements are nested like the "html.parser" backend nests them (see `v2.dom_index`), so a
+record's path is the trace `v2.html_parser.trace_tag_to_root` would give the same anchor
+in a parsed soup. Pruning works like `v2.soup_helpers.prune_tree`: anchors under a
+denied (or not allowed) element are never emitted, and the text of pruned elements is
+left out of the anchors' text.
+
+    async with stream(url) as response:
+        async for record in stream_anchors(response.iter_bytes(), response.encoding):
+            ...
+"""
+
+import codecs
+from html.parser import HTMLParser
+from typing import AsyncIterable, Callable, Collection, Iterator, NamedTuple
+
+from v2.dom_index import MULTI_VALUED_ATTRIBUTES, NON_TEXT_ELEMENTS, VOID_ELEMENTS
+from v2.soup_helpers import UNINTERESTING_TAGS
+
+# characters fed to the tokenizer at a time, when the whole page is at hand
+CHUNK_SIZE = 64 * 1024
+
+
+class Ancestor(NamedTuple):
+    """An element on an anchor's path.
+
+    Attributes:
+        name (str): The tag name.
+        attrs (dict[str, str]): The element's attributes, as written in the page.
+        row (int): The element's position in the page, counting elements in document
+            order. Identifies the element among the ancestors of different anchors.
+    """
+
+    name: str
+    attrs: dict[str, str]
+    row: int
+
+    def attribute_contains(self, keyword: str) -> bool:
+        """Whether any attribute value contains <keyword>. Values that are lists of
+        tokens (e.g. class) must contain it as a whole token, like in bs4."""
+        multi = MULTI_VALUED_ATTRIBUTES["*"] | MULTI_VALUED_ATTRIBUTES.get(
+            self.name, set()
+        )
+        return any(
+            keyword in (value.split() if key in multi else value)
+            for key, value in self.attrs.items()
+        )
+
+    def matches(self, name: str, attrs: dict[str, str] | None = None) -> bool:
+        """Whether the element is a <name> element with <attrs>, matched like
+        `soup.find(name, attrs)`: a token attribute (e.g. class) matches any one of
+        its tokens."""
+        if self.name != name:
+            return False
+        multi = MULTI_VALUED_ATTRIBUTES["*"] | MULTI_VALUED_ATTRIBUTES.get(name, set())
+        for key, expected in (attrs or {}).items():
+            value = self.attrs.get(key)
+            if value is None:
+                return False
+            if value != expected and not (key in multi and expected in value.split()):
+                return False
+        return True
+
+
+class AnchorRecord(NamedTuple):
+    """An anchor on a page.
+
+    Attributes:
+        href (str | None): The anchor's href.
+        text (str): The anchor's text, like `Tag.get_text()`.
+        ancestors (tuple[Ancestor, ...]): The elements from the root of the page down
+            to the anchor itself.
+        heading_child (bool): The anchor has a heading (h*) element as a child.
+    """
+
+    href: str | None
+    text: str
+    ancestors: tuple[Ancestor, ...]
+    heading_child: bool = False
+
+    @property
+    def path(self) -> tuple[str, ...]:
+        """The tag names from the root down to the anchor, e.g. ("body", "div", "a")."""
+        return tuple(ancestor.name for ancestor in self.ancestors)
+
+    def inside(
+        self,
+        name: str,
+        attrs: dict[str, str] | None = None,
+        max_depth: int | None = None,
+    ) -> Ancestor | None:
+        """The closest <name> element with <attrs> the anchor is in, at most
+        <max_depth> levels up (any level if None), or None."""
+        ancestors = self.ancestors[-2::-1]
+        if max_depth is not None:
+            ancestors = ancestors[:max_depth]
+        for ancestor in ancestors:
+            if ancestor.matches(name, attrs):
+                return ancestor
+        return None
+
+
+def first_anchor_in(
+    name: str, attrs: dict[str, str] | None = None
+) -> Callable[[AnchorRecord], bool]:
+    """A filter over the records of one page, keeping the first anchor in each <name>
+    element with <attrs>, like `[x.a for x in soup.find_all(name, attrs)]`.
+
+    Records must be filtered in the order they were emitted.
+    """
+    seen: set[int] = set()
+
+    def is_first(record: AnchorRecord) -> bool:
+        first = False
+        for ancestor in record.ancestors[:-1]:
+            if ancestor.row not in seen and ancestor.matches(name, attrs):
+                seen.add(ancestor.row)
+                first = True
+        return first
+
+    return is_first
+
+
+class FirstElement:
+    """A filter over the records of one page, keeping the anchors in the first <name>
+    element with <attrs>, like `soup.find(name, attrs)`. With <within>, the anchors in
+    the first such element of each <within> element are kept instead, like
+    `[x.find(name, attrs) for x in soup.find_all(within)]`.
+
+    Records must be filtered in the order they were emitted. Only elements holding an
+    anchor are ever seen, so an earlier element without anchors doesn't count.
+
+    Args:
+        name (str): The tag name of the element.
+        attrs (dict[str, str] | None, optional): Its attributes. Defaults to None.
+        within (str | None, optional): The tag name of the elements to search in.
+            Defaults to None, i.e. the whole page.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        attrs: dict[str, str] | None = None,
+        within: str | None = None,
+    ):
+        self.name = name
+        self.attrs = attrs
+        self.within = within
+        # the row of the first element, by the row of the element it's within
+        self._rows: dict[int | None, int] = {}
+
+    @property
+    def found(self) -> bool:
+        """Whether an anchor in a matching element has been seen."""
+        return bool(self._rows)
+
+    def __call__(self, record: AnchorRecord) -> bool:
+        ancestors = record.ancestors[:-1]
+        key = None
+        if self.within is not None:
+            container = record.inside(self.within)
+            if container is None:
+                return False
+            key = container.row
+            ancestors = ancestors[ancestors.index(container) + 1 :]
+        for ancestor in ancestors:
+            if ancestor.matches(self.name, self.attrs):
+                if ancestor.row == self._rows.setdefault(key, ancestor.row):
+                    return True
+        return False
+
+
+class _Frame:
+    __slots__ = ("name", "attrs", "row", "skipped", "contains", "texts", "headed")
+
+    def __init__(self, name: str, attrs: dict[str, str], row: int, skipped: bool):
+        self.name = name
+        self.attrs = attrs
+        self.row = row
+        self.skipped = skipped
+        # whether the required tag is in the subtree
+        self.contains = False
+        # the kept text of the subtree, only collected inside anchors
+        self.texts: list[str] | None = None
+        # whether a child is a heading
+        self.headed = False
+
+
+class AnchorExtractor(HTMLParser):
+    """Emits the anchors of a page as it is fed, chunk by chunk.
+
+    Args:
+        allow (Collection[str] | None, optional): If given, only elements with these
+            tag names are kept. Defaults to None.
+        deny (Collection[str], optional): Elements with these tag names are pruned,
+            with their subtrees. Defaults to `v2.soup_helpers.UNINTERESTING_TAGS`,
+            like `create_soup`.
+        require (str | None, optional): If given, elements without a <require>
+            element in their subtree are pruned, as far as the anchors' text and
+            heading children are concerned. Defaults to None.
+        encoding (str, optional): The encoding of bytes fed in. Defaults to "utf-8".
+    """
+
+    def __init__(
+        self,
+        allow: Collection[str] | None = None,
+        deny: Collection[str] = UNINTERESTING_TAGS,
+        require: str | None = None,
+        encoding: str = "utf-8",
+    ):
+        super().__init__(convert_charrefs=True)
+        self.allow = None if allow is None else frozenset(allow)
+        self.deny = frozenset(deny)
+        self.require = require
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._stack: list[_Frame] = []
+        self._rows = 0
+        # open anchors, and the records of nested anchors waiting for them to close
+        self._anchors = 0
+        self._pending: list[tuple[int, AnchorRecord]] = []
+        self._records: list[AnchorRecord] = []
+
+    def feed(self, data: str | bytes) -> list[AnchorRecord]:
+        """Tokenize the next chunk of the page.
+
+        Returns:
+            list[AnchorRecord]: The anchors that were closed in the chunk, in document
+                order.
+        """
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        super().feed(data)
+        return self._take()
+
+    def close(self) -> list[AnchorRecord]:
+        """Finish the page, closing every element still open.
+
+        Returns:
+            list[AnchorRecord]: The remaining anchors.
+        """
+        super().feed(self._decoder.decode(b"", final=True))
+        super().close()
+        while self._stack:
+            self._close()
+        return self._take()
+
+    def _take(self) -> list[AnchorRecord]:
+        records, self._records = self._records, []
+        return records
+
+    def _open(self, name: str, attrs: list[tuple[str, str | None]]):
+        parent = self._stack[-1] if self._stack else None
+        skipped = (
+            (parent is not None and parent.skipped)
+            or name in self.deny
+            or (self.allow is not None and name not in self.allow)
+        )
+        attributes = {key: value or "" for key, value in attrs}
+        frame = _Frame(name, attributes, self._rows, skipped)
+        self._rows += 1
+        in_anchor = parent is not None and parent.texts is not None
+        if not skipped and (name == "a" or in_anchor):
+            frame.texts = []
+            if name == "a":
+                self._anchors += 1
+        self._stack.append(frame)
+
+    def _close(self):
+        frame = self._stack.pop()
+        if frame.skipped:
+            return
+        parent = self._stack[-1] if self._stack else None
+        contains = frame.contains or frame.name == self.require
+        kept = self.require is None or contains
+        if parent is not None:
+            parent.contains = parent.contains or contains
+            if kept and parent.texts is not None:
+                parent.texts.extend(frame.texts)
+                if frame.name.startswith("h"):
+                    parent.headed = True
+        if frame.name != "a":
+            return
+        ancestors = tuple(
+            Ancestor(open_.name, open_.attrs, open_.row) for open_ in self._stack
+        ) + (Ancestor(frame.name, frame.attrs, frame.row),)
+        record = AnchorRecord(
+            href=frame.attrs.get("href"),
+            text="".join(frame.texts),
+            ancestors=ancestors,
+            heading_child=frame.headed,
+        )
+        self._pending.append((frame.row, record))
+        self._anchors -= 1
+        if not self._anchors:
+            # an anchor comes before the anchors nested in it
+            self._pending.sort(key=lambda pending: pending[0])
+            self._records.extend(record for _, record in self._pending)
+            self._pending = []
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._close()
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs)
+        self._close()
+
+    def handle_endtag(self, tag):
+        # closes the most recent open element of its name, if there is one
+        for position in range(len(self._stack) - 1, -1, -1):
+            if self._stack[position].name == tag:
+                while len(self._stack) > position:
+                    self._close()
+                return
+
+    def handle_data(self, data):
+        if not self._anchors or not self._stack:
+            return
+        frame = self._stack[-1]
+        if frame.texts is not None and frame.name not in NON_TEXT_ELEMENTS:
+            frame.texts.append(data)
+
+
+def extract_anchors(
+    html: str | bytes,
+    allow: Collection[str] | None = None,
+    deny: Collection[str] = UNINTERESTING_TAGS,
+    require: str | None = None,
+) -> Iterator[AnchorRecord]:
+    """Yields the anchors of a page that is already in memory, in document order.
+
+    Args:
+        html (str | bytes): The page. Bytes are decoded as utf-8.
+        allow, deny, require: Pruning, see `AnchorExtractor`.
+    """
+    extractor = AnchorExtractor(allow=allow, deny=deny, require=require)
+    for start in range(0, len(html), CHUNK_SIZE):
+        yield from extractor.feed(html[start : start + CHUNK_SIZE])
+    yield from extractor.close()
+
+
+async def stream_anchors(
+    chunks: AsyncIterable[bytes],
+    encoding: str | None = None,
+    allow: Collection[str] | None = None,
+    deny: Collection[str] = UNINTERESTING_TAGS,
+    require: str | None = None,
+):
+    """Yields the anchors of a page as its <chunks> arrive, in document order. Stopping
+    early (e.g. closing the response) stops the download.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The body, e.g. `StreamedResponse.iter_bytes()`
+            or `httpx.Response.aiter_bytes()`.
+        encoding (str | None, optional): The body's encoding. Defaults to utf-8.
+        allow, deny, require: Pruning, see `AnchorExtractor`.
+    """
+    extractor = AnchorExtractor(
+        allow=allow, deny=deny, require=require, encoding=encoding or "utf-8"
+    )
+    async for chunk in chunks:
+        for record in extractor.feed(chunk):
+            yield record
+    for record in extractor.close():
+        yield record
@@ -1,3 +1,50 @@
-from .base_queries import get, post
+from .adaptive import controllers as concurrency_controllers
+from .base_queries import get, post, stream
+from .cache import ResponseCache, get_response_cache
+from .compression import transfer_stats
+from .conditional import (
+    ValidatorStore,
+    get_validator_store,
+    is_not_modified,
+    stage_jobs,
+    stage_listing,
+    staged_run,
+)
+from .connections import close_shared_http_transports, dns_cache, prewarm
+from .hedging import hedging
+from .httplog import configure_http_logging
+from .pool import ClientPool, client_pool, current_pool
+from .record_replay import ReplayMissError, recording, replaying
+from .streaming import StreamedResponse, byte_budgets
+from .wrappers import CircuitOpenError, get_circuit_breaker
 
-__all__ = ["get", "post"]
+__all__ = [
+    "get",
+    "post",
+    "stream",
+    "StreamedResponse",
+    "byte_budgets",
+    "ClientPool",
+    "client_pool",
+    "current_pool",
+    "ValidatorStore",
+    "get_validator_store",
+    "is_not_modified",
+    "staged_run",
+    "stage_listing",
+    "stage_jobs",
+    "ResponseCache",
+    "get_response_cache",
+    "CircuitOpenError",
+    "get_circuit_breaker",
+    "concurrency_controllers",
+    "configure_http_logging",
+    "transfer_stats",
+    "recording",
+    "replaying",
+    "ReplayMissError",
+    "prewarm",
+    "dns_cache",
+    "close_shared_http_transports",
+    "hedging",
+]
@@ -0,0 +1,223 @@
+"""Adaptive (AIMD) per-domain concurrency control.
+
+Instead of hand tuning max_at_once per outlet, engines can let a controller find the
+concurrency each domain tolerates. The engine's static max_at_once becomes a ceiling:
+below it, the controller additively increases the number of requests allowed in flight
+while responses stay healthy, and multiplicatively decreases it when the domain
+answers with 429/503, fails at the transport level or its p95 latency rises well above
+its baseline.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from http import HTTPStatus
+
+import httpx
+
+from .ratelimit import get_rate_limit_key
+from .streams import ReleasingStream
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_STATUS_CODES = frozenset(
+    [
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+    ]
+)
+
+
+class AdaptiveConcurrency:
+    """An AIMD controlled concurrency limit for one domain.
+
+    Args:
+        domain (str): The domain being controlled.
+        ceiling (int, optional): The maximum concurrency. Defaults to 10.
+        floor (int, optional): The minimum concurrency. Defaults to 1.
+        decrease_factor (float, optional): Multiplier applied on back off. Defaults to
+            0.5.
+        latency_tolerance (float, optional): Back off when the p95 latency exceeds the
+            baseline p95 by this factor. Defaults to 2.
+        window (int, optional): Number of recent requests latency and error rate are
+            computed over. Defaults to 50.
+        cooldown (float, optional): Minimum seconds between two back offs, so a burst
+            of errors from requests that were already in flight only counts once.
+            Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        ceiling: int = 10,
+        floor: int = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        window: int = 50,
+        cooldown: float = 1.0,
+    ):
+        self.domain = domain
+        self.ceiling = max(ceiling, floor)
+        self.floor = floor
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.limit = float(max(floor, self.ceiling // 2))
+        self.in_flight = 0
+        self.baseline_p95: float | None = None
+        self.backoffs = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._errors: deque[bool] = deque(maxlen=window)
+        self._last_backoff = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def p95(self) -> float | None:
+        if not self._latencies:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self._errors:
+            return 0.0
+        return sum(self._errors) / len(self._errors)
+
+    def state(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "ceiling": self.ceiling,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "p95": self.p95,
+            "baseline_p95": self.baseline_p95,
+            "error_rate": self.error_rate,
+            "backoffs": self.backoffs,
+        }
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        """Wait for a free slot under the current limit."""
+        if not self._waiters and self._has_capacity():
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we were cancelled
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _backoff(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_backoff < self.cooldown:
+            return
+        self._last_backoff = now
+        self.backoffs += 1
+        self.limit = max(float(self.floor), self.limit * self.decrease_factor)
+        logger.info(f"{self.domain};{reason}. concurrency reduced to {int(self.limit)}")
+
+    def observe(self, status_code: int | None, latency: float):
+        """Record the outcome of a request. A status code of None is a transport
+        error."""
+        failed = status_code is None or status_code in BACKOFF_STATUS_CODES
+        self._errors.append(failed)
+        if failed:
+            self._backoff(f"received {status_code or 'transport error'}")
+            return
+        self._latencies.append(latency)
+        p95 = self.p95
+        if len(self._latencies) >= self._latencies.maxlen // 2:
+            # the baseline follows the best p95 seen, and is allowed to drift upwards
+            # slowly so that a one-off fast period doesn't pin it forever
+            self.baseline_p95 = (
+                p95 if self.baseline_p95 is None else min(p95, self.baseline_p95 * 1.01)
+            )
+            if p95 > self.baseline_p95 * self.latency_tolerance:
+                self._backoff(f"p95 latency rose to {p95:.2f}s")
+                return
+        # additive increase: about one extra slot per <limit> healthy responses
+        self.limit = min(float(self.ceiling), self.limit + 1 / self.limit)
+        self._wake()
+
+
+class AdaptiveConcurrencyRegistry:
+    """The process-wide controllers, keyed by domain."""
+
+    def __init__(self):
+        self._controllers: dict[str, AdaptiveConcurrency] = {}
+
+    def get(self, url: str, ceiling: int = 10) -> AdaptiveConcurrency:
+        """Get the controller for the domain of <url>. If several engines share a
+        domain, the largest ceiling applies."""
+        key = get_rate_limit_key(url)
+        controller = self._controllers.get(key)
+        if controller is None:
+            controller = AdaptiveConcurrency(key, ceiling=ceiling)
+            self._controllers[key] = controller
+        elif ceiling > controller.ceiling:
+            controller.ceiling = ceiling
+        return controller
+
+    def snapshot(self) -> dict[str, dict]:
+        """The state of every controller, for inspection."""
+        return {key: c.state() for key, c in self._controllers.items()}
+
+    def clear(self):
+        self._controllers = {}
+
+
+controllers = AdaptiveConcurrencyRegistry()
+
+
+class AdaptiveConcurrencyTransport(httpx.AsyncBaseTransport):
+    """Holds a slot of the domain's controller for the lifetime of each request and
+    feeds the outcome back to it."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        ceiling: int,
+        registry: AdaptiveConcurrencyRegistry = controllers,
+    ):
+        self._transport = transport
+        self.ceiling = ceiling
+        self.registry = registry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        controller = self.registry.get(str(request.url), self.ceiling)
+        await controller.acquire()
+        start = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            controller.release()
+            controller.observe(None, time.monotonic() - start)
+            raise
+        except BaseException:
+            controller.release()
+            raise
+        controller.observe(response.status_code, time.monotonic() - start)
+        response.stream = ReleasingStream(response.stream, controller.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -1,8 +1,12 @@
 import logging
+from contextlib import asynccontextmanager
 from enum import Enum
+from typing import AsyncIterator
 
-from httpx import AsyncClient, Response
+from httpx import Response
 
+from .pool import client_pool, current_pool
+from .streaming import StreamedResponse
 from .wrappers import log_and_raise_if_non_200, retry_on_failed_request
 
 logger = logging.getLogger(__name__)
@@ -22,10 +26,64 @@ async def _call(
     *args,
     **kwargs,
 ) -> Response:
-    """Make a http request"""
-    async with AsyncClient() as client:
-        response = await client.request(method, url, *args, **kwargs)
-    return response
+    """Make a http request. If a `ClientPool` is open, the pooled keep-alive client
+    for the url's origin is used, otherwise a one-off pool is opened for it."""
+    async with client_pool() as pool:
+        return await pool.client_for(url).request(method, url, *args, **kwargs)
+
+
+@log_and_raise_if_non_200
+@retry_on_failed_request(
+    max_attempts=3,
+    backoff_factor=1,
+)
+async def _send_streamed(
+    url: str,
+    method: Method = Method.GET,
+    follow_redirects: bool = False,
+    **kwargs,
+) -> Response:
+    """Send a request through the current pool without reading the response body."""
+    client = current_pool().client_for(url)
+    # a coalesced request would be read in full, defeating the byte budgets
+    request = client.build_request(
+        method, url, extensions={"singleflight": False}, **kwargs
+    )
+    return await client.send(request, stream=True, follow_redirects=follow_redirects)
+
+
+@asynccontextmanager
+async def stream(
+    url: str,
+    max_bytes: int | None = None,
+    method: Method = Method.GET,
+    **kwargs,
+) -> AsyncIterator[StreamedResponse]:
+    """Send a request and stream the response body instead of buffering it.
+
+    The body is read with `StreamedResponse.iter_bytes` or `StreamedResponse.read`,
+    and stops at <max_bytes> or when the domain's byte budget (see
+    `v2.client.byte_budgets`) runs out. Leaving the context closes the response, so a
+    caller can stop reading as soon as it has what it needs and the rest of the body
+    is never downloaded.
+
+    Args:
+        url (str): A url of a resource on which to perform the request.
+        max_bytes (int | None, optional): Maximum decoded bytes to read. Defaults to
+            None.
+        method (Method, optional): The http method. Defaults to GET.
+
+    Yields:
+        StreamedResponse: A successful response, with its body not yet read.
+    """
+    async with client_pool():
+        response = StreamedResponse(
+            await _send_streamed(url, method, **kwargs), max_bytes=max_bytes
+        )
+        try:
+            yield response
+        finally:
+            await response.aclose()
 
 
 @log_and_raise_if_non_200
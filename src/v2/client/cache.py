@@ -0,0 +1,327 @@
+"""A local, size-bounded, on-disk cache of http responses.
+
+Responses are content addressed: the file name is a hash of the normalised url plus the
+request headers the response may vary on. Each entry is stored gzip compressed and
+carries its status, headers and the time it was stored. Entries expire after a
+per-domain TTL, and the least recently used entries are evicted once the cache grows
+past its size cap.
+
+`MemoryResponseCache` keeps entries in memory instead, for as long as its owner (e.g. a
+`ClientPool`) lives, so a page several callers read one after the other is only
+downloaded once.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from consts import RESPONSE_CACHE_DIR
+
+from .helpers import get_domain, normalise_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE_CACHE_DIR = RESPONSE_CACHE_DIR
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 15 * 60
+VARY_HEADERS = ("accept", "accept-language", "wp-site")
+
+_caches: dict[Path, "ResponseCache"] = {}
+
+
+def _key(
+    method: str,
+    url: str,
+    headers: httpx.Headers | None,
+    vary_headers: tuple[str, ...],
+) -> str:
+    headers = headers or httpx.Headers()
+    parts = [method.upper(), normalise_url(url)]
+    parts.extend(f"{name}:{headers.get(name, '')}" for name in vary_headers)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    path: Path
+    size: int
+    last_access: float
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    stored_at: float
+
+
+class ResponseCache:
+    """Content addressed response cache on disk.
+
+    Args:
+        directory (Path, optional): Where entries are stored. Defaults to
+            `consts.RESPONSE_CACHE_DIR`: $SCRAPER_RESPONSE_CACHE_DIR, or the
+            responses directory in `consts.CACHE_DIR`.
+        max_bytes (int, optional): Size cap of the (compressed) cache. Least recently
+            used entries are evicted past it. Defaults to 256MB.
+        default_ttl (float, optional): Seconds an entry stays fresh. Defaults to 15
+            minutes.
+        domain_ttls (dict[str, float] | None, optional): Per-domain TTL overrides, e.g.
+            {"www.bbc.com": 3600}. Defaults to None.
+        vary_headers (tuple[str, ...], optional): Request headers that are part of the
+            cache key.
+    """
+
+    def __init__(
+        self,
+        directory: Path = DEFAULT_RESPONSE_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        default_ttl: float = DEFAULT_TTL,
+        domain_ttls: dict[str, float] | None = None,
+        vary_headers: tuple[str, ...] = VARY_HEADERS,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.domain_ttls = domain_ttls or {}
+        self.vary_headers = vary_headers
+        # entries are read and written from worker threads
+        self._lock = threading.RLock()
+        self._entries: dict[str, CacheEntry] = self._scan()
+        self._size = sum(entry.size for entry in self._entries.values())
+
+    def _scan(self) -> dict[str, CacheEntry]:
+        entries = {}
+        if not self.directory.exists():
+            return entries
+        for path in self.directory.glob("*/*.gz"):
+            stat = path.stat()
+            entries[path.stem] = CacheEntry(path, stat.st_size, stat.st_mtime)
+        return entries
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, url: str) -> float:
+        return self.domain_ttls.get(get_domain(url), self.default_ttl)
+
+    def key(self, method: str, url: str, headers: httpx.Headers | None = None) -> str:
+        return _key(method, url, headers, self.vary_headers)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.gz"
+
+    def get(self, key: str, ttl: float) -> CachedResponse | None:
+        """Read a fresh entry, or None if it is missing or older than <ttl>."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            try:
+                with gzip.open(entry.path, "rb") as file:
+                    meta = json.loads(file.readline())
+                    content = file.read()
+            except (OSError, ValueError):
+                self.delete(key)
+                return None
+            if time.time() - meta["stored_at"] > ttl:
+                self.delete(key)
+                return None
+            entry.last_access = time.time()
+            # mtime doubles as the last access time so LRU order survives restarts
+            os.utime(entry.path, (entry.last_access, entry.last_access))
+        return CachedResponse(
+            status_code=meta["status_code"],
+            headers=[tuple(header) for header in meta["headers"]],
+            content=content,
+            stored_at=meta["stored_at"],
+        )
+
+    def set(self, key: str, response: CachedResponse):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "status_code": response.status_code,
+            "headers": response.headers,
+            "stored_at": response.stored_at,
+        }
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wb") as file:
+            file.write(json.dumps(meta).encode("utf-8") + b"\n")
+            file.write(response.content)
+        with self._lock:
+            os.replace(tmp_path, path)
+            previous = self._entries.get(key)
+            if previous:
+                self._size -= previous.size
+            size = path.stat().st_size
+            self._entries[key] = CacheEntry(path, size, time.time())
+            self._size += size
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self._size -= entry.size
+            try:
+                entry.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for key, _ in sorted(self._entries.items(), key=lambda x: x[1].last_access):
+            self.delete(key)
+            if self._size <= self.max_bytes:
+                break
+
+    def clear(self):
+        for key in list(self._entries.keys()):
+            self.delete(key)
+
+
+def get_response_cache(directory: Path = DEFAULT_RESPONSE_CACHE_DIR) -> ResponseCache:
+    """Get the process-wide response cache for <directory>."""
+    directory = Path(directory)
+    if directory not in _caches:
+        _caches[directory] = ResponseCache(directory)
+    return _caches[directory]
+
+
+class MemoryResponseCache:
+    """Responses kept in memory. Entries don't expire: the cache only lives as long as
+    its owner, e.g. the `ClientPool` of a source check.
+
+    Args:
+        vary_headers (tuple[str, ...], optional): Request headers that are part of the
+            cache key.
+    """
+
+    def __init__(self, vary_headers: tuple[str, ...] = VARY_HEADERS):
+        self.vary_headers = vary_headers
+        self._entries: dict[str, CachedResponse] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, url: str) -> float:
+        return float("inf")
+
+    def key(self, method: str, url: str, headers: httpx.Headers | None = None) -> str:
+        return _key(method, url, headers, self.vary_headers)
+
+    def get(self, key: str, ttl: float) -> CachedResponse | None:
+        response = self._entries.get(key)
+        if response is None or time.time() - response.stored_at > ttl:
+            return None
+        return response
+
+    def set(self, key: str, response: CachedResponse):
+        self._entries[key] = response
+
+    def clear(self):
+        self._entries = {}
+
+
+class CachingStream(httpx.AsyncByteStream):
+    """Passes a response body on as it is read, and calls <store> with the whole body
+    once it has been read to the end. A body that isn't read in full, e.g. because the
+    caller closed the response early or ran out of byte budget, isn't stored."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        store: Callable[[bytes], Awaitable[None]],
+    ):
+        self._stream = stream
+        self._store = store
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        chunks = []
+        async for chunk in self._stream:
+            chunks.append(chunk)
+            yield chunk
+        await self._store(b"".join(chunks))
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class CacheTransport(httpx.AsyncBaseTransport):
+    """Serves GET requests from a `ResponseCache` (or `MemoryResponseCache`) and stores
+    successful responses.
+
+    Bodies are cached decoded (the entries themselves are gzip compressed), so cache
+    hits skip both the network and the content decoding. Misses are streamed to the
+    caller as they arrive and only stored once read to the end, so streamed requests
+    keep their byte budgets and early stops (see `v2.client.stream`): a body that is
+    cut short is simply not cached.
+
+    Args:
+        transport (httpx.AsyncBaseTransport): The transport to fall through to.
+        cache (ResponseCache | MemoryResponseCache): The cache.
+        ttl (float | None, optional): Overrides the cache's per-domain TTL for requests
+            made through this transport. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        cache: ResponseCache | MemoryResponseCache,
+        ttl: float | None = None,
+    ):
+        self._transport = transport
+        self.cache = cache
+        self.ttl = ttl
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self._transport.handle_async_request(request)
+        url = str(request.url)
+        key = self.cache.key(request.method, url, request.headers)
+        ttl = self.ttl if self.ttl is not None else self.cache.ttl_for(url)
+        cached = await asyncio.to_thread(self.cache.get, key, ttl)
+        if cached is not None:
+            logger.debug(f"{url};response cache hit")
+            return httpx.Response(
+                cached.status_code,
+                headers=cached.headers,
+                stream=httpx.ByteStream(cached.content),
+                extensions={"from_cache": True},
+            )
+        response = await self._transport.handle_async_request(request)
+        if response.status_code != HTTPStatus.OK:
+            return response
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in response.headers.raw
+        ]
+
+        async def store(content: bytes):
+            cached = CachedResponse(response.status_code, headers, content, time.time())
+            await asyncio.to_thread(self.cache.set, key, cached)
+
+        response.stream = CachingStream(response.stream, store)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
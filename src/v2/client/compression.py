@@ -0,0 +1,277 @@
+"""Content-encoding negotiation, incremental decoding and wire-size accounting.
+
+Requests advertise the best encodings this environment can decode (brotli and zstd
+need the optional brotli / zstandard packages, gzip and deflate are always available).
+Responses are decoded chunk by chunk as they stream in, and each one records how many
+bytes came over the wire, how many it decoded to and how long decoding took. The
+totals are kept per domain so the bandwidth spent on each outlet can be compared.
+"""
+
+import logging
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Callable, Protocol
+
+import httpx
+
+from .ratelimit import get_rate_limit_key
+
+logger = logging.getLogger(__name__)
+
+
+class Decoder(Protocol):
+    def decode(self, data: bytes) -> bytes:
+        ...
+
+    def flush(self) -> bytes:
+        ...
+
+
+class GZipDecoder:
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def decode(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+class DeflateDecoder:
+    """Servers send deflate both with and without the zlib wrapper."""
+
+    def __init__(self):
+        self._first_chunk = True
+        self._decompressor = zlib.decompressobj()
+
+    def decode(self, data: bytes) -> bytes:
+        if self._first_chunk:
+            self._first_chunk = False
+            try:
+                return self._decompressor.decompress(data)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+class BrotliDecoder:
+    def __init__(self):
+        import brotli
+
+        self._decompressor = brotli.Decompressor()
+
+    def decode(self, data: bytes) -> bytes:
+        return self._decompressor.process(data)
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class ZStandardDecoder:
+    def __init__(self):
+        import zstandard
+
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def decode(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def supported_decoders() -> dict[str, Callable[[], Decoder]]:
+    """The encodings that can be decoded here, in order of preference."""
+    decoders: dict[str, Callable[[], Decoder]] = {}
+    if _available("brotli"):
+        decoders["br"] = BrotliDecoder
+    if _available("zstandard"):
+        decoders["zstd"] = ZStandardDecoder
+    decoders["gzip"] = GZipDecoder
+    decoders["deflate"] = DeflateDecoder
+    return decoders
+
+
+@dataclass
+class TransferStats:
+    """Wire versus decoded size of response bodies.
+
+    Attributes:
+        requests (int): Number of responses.
+        wire_bytes (int): Bytes received off the wire.
+        decoded_bytes (int): Bytes after decoding.
+        decode_time (float): Seconds spent decoding.
+    """
+
+    requests: int = 0
+    wire_bytes: int = 0
+    decoded_bytes: int = 0
+    decode_time: float = 0.0
+
+    @property
+    def ratio(self) -> float | None:
+        """Decoded bytes per wire byte."""
+        return self.decoded_bytes / self.wire_bytes if self.wire_bytes else None
+
+    def add(self, other: "TransferStats"):
+        self.requests += other.requests
+        self.wire_bytes += other.wire_bytes
+        self.decoded_bytes += other.decoded_bytes
+        self.decode_time += other.decode_time
+
+
+class TransferStatsRegistry:
+    """The process-wide transfer totals, keyed by domain."""
+
+    def __init__(self):
+        self._stats: dict[str, TransferStats] = {}
+
+    def record(self, url: str, stats: TransferStats):
+        key = get_rate_limit_key(url)
+        self._stats.setdefault(key, TransferStats()).add(stats)
+
+    def get(self, url: str) -> TransferStats | None:
+        return self._stats.get(get_rate_limit_key(url))
+
+    def snapshot(self) -> dict[str, dict]:
+        """The totals of every domain, for inspection."""
+        return {
+            key: {**asdict(stats), "ratio": stats.ratio}
+            for key, stats in self._stats.items()
+        }
+
+    def clear(self):
+        self._stats = {}
+
+
+transfer_stats = TransferStatsRegistry()
+
+
+class MeteredStream(httpx.AsyncByteStream):
+    """Decodes a content-encoded stream incrementally (if <decoders> are given),
+    counting bytes and decode time as it goes. <on_close> is called with the stats
+    once the stream is closed."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        decoders: list[Decoder],
+        stats: TransferStats,
+        on_close: Callable[[TransferStats], None],
+    ):
+        self._stream = stream
+        self._decoders = decoders
+        self.stats = stats
+        self._on_close = on_close
+        self._closed = False
+
+    def _decode(self, data: bytes, flush: bool = False) -> bytes:
+        start = time.perf_counter()
+        for decoder in self._decoders:
+            data = decoder.decode(data) if data else b""
+            if flush:
+                data += decoder.flush()
+        self.stats.decode_time += time.perf_counter() - start
+        self.stats.decoded_bytes += len(data)
+        return data
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self.stats.wire_bytes += len(chunk)
+            if not self._decoders:
+                self.stats.decoded_bytes += len(chunk)
+                yield chunk
+                continue
+            decoded = self._decode(chunk)
+            if decoded:
+                yield decoded
+        if self._decoders:
+            decoded = self._decode(b"", flush=True)
+            if decoded:
+                yield decoded
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            self._on_close(self.stats)
+        await self._stream.aclose()
+
+
+class CompressionTransport(httpx.AsyncBaseTransport):
+    """Negotiates compression and decodes responses itself, so that the wire size,
+    decoded size and decode time of every response can be measured.
+
+    Decoded responses lose their Content-Encoding and Content-Length headers (the
+    original values are kept in `response.extensions["content_encoding"]` and
+    `response.extensions["wire_content_length"]`). The stats of each response are
+    available as `response.extensions["transfer_stats"]` and are added to the totals
+    of its domain once the response is closed.
+
+    Args:
+        transport (httpx.AsyncBaseTransport): The transport to wrap.
+        registry (TransferStatsRegistry, optional): Where per-domain totals are kept.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        registry: TransferStatsRegistry = transfer_stats,
+    ):
+        self._transport = transport
+        self.registry = registry
+        self._decoders = supported_decoders()
+        self._accept_encoding = ", ".join(self._decoders.keys())
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.headers["accept-encoding"] = self._accept_encoding
+        response = await self._transport.handle_async_request(request)
+        url = str(request.url)
+        stats = TransferStats(requests=1)
+
+        def record(stats: TransferStats):
+            self.registry.record(url, stats)
+
+        encodings = [
+            encoding.strip().lower()
+            for encoding in response.headers.get("content-encoding", "").split(",")
+            if encoding.strip() and encoding.strip().lower() != "identity"
+        ]
+        if not encodings or any(e not in self._decoders for e in encodings):
+            if encodings:
+                # left to httpx, which raises a DecodingError if it can't decode it
+                logger.debug(f"{url};unsupported content-encoding {encodings}")
+            response.stream = MeteredStream(response.stream, [], stats, record)
+            response.extensions["transfer_stats"] = stats
+            return response
+        headers = httpx.Headers(response.headers)
+        wire_content_length = headers.pop("content-length", None)
+        del headers["content-encoding"]
+        # encodings are listed in the order they were applied, so undo them in reverse
+        decoders = [self._decoders[encoding]() for encoding in reversed(encodings)]
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            stream=MeteredStream(response.stream, decoders, stats, record),
+            extensions={
+                **response.extensions,
+                "transfer_stats": stats,
+                "content_encoding": ", ".join(encodings),
+                "wire_content_length": wire_content_length,
+            },
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
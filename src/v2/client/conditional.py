@@ -0,0 +1,263 @@
+"""Conditional GET support.
+
+The validators (ETag / Last-Modified) of every page fetched are persisted between runs.
+On the next request for the same url they are sent back as If-None-Match /
+If-Modified-Since so that the server can answer with an empty 304 Not Modified when
+the page hasn't changed.
+
+A 304 means the page was already scraped, so a page's validators must only be stored
+once what was scraped from it has been persisted. Otherwise a page that failed to parse
+or persist would be skipped forever. Engines wrap their run in `staged_run`: the
+validators received while fetching the listing (`stage_listing`) and each article
+(`stage_jobs`) are held back, and only stored and saved by `StagedRun.commit`, after the
+articles have been written to the db.
+"""
+
+import json
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Optional, Sequence
+
+import httpx
+
+from consts import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VALIDATOR_STORE_PATH = CACHE_DIR / "validators.json"
+
+_stores: dict[Path, "ValidatorStore"] = {}
+_current_run: ContextVar[Optional["StagedRun"]] = ContextVar(
+    "current_staged_run", default=None
+)
+# the validators of the listing or article being fetched
+_current_staged: ContextVar[Optional["StagedValidators"]] = ContextVar(
+    "current_staged_validators", default=None
+)
+
+
+def is_not_modified(response: httpx.Response) -> bool:
+    return response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+class ValidatorStore:
+    """A persistent url -> {etag, last_modified} map.
+
+    Validators are held in memory and only written to disk on `save`, which merges
+    with whatever is on disk so that concurrent processes don't clobber each other.
+    """
+
+    def __init__(self, path: Path = DEFAULT_VALIDATOR_STORE_PATH):
+        self.path = Path(path)
+        self._validators: dict[str, dict[str, str]] = self._load()
+        self._dirty = False
+
+    def _load(self) -> dict[str, dict[str, str]]:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"{self.path};corrupt validator store. starting afresh.")
+            return {}
+
+    def get(self, url: str) -> dict[str, str] | None:
+        return self._validators.get(url)
+
+    def set(self, url: str, etag: str | None, last_modified: str | None):
+        validators = {}
+        if etag:
+            validators["etag"] = etag
+        if last_modified:
+            validators["last_modified"] = last_modified
+        if not validators or self._validators.get(url) == validators:
+            return
+        self._validators[url] = validators
+        self._dirty = True
+
+    def delete(self, url: str):
+        if self._validators.pop(url, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Persist the validators, merged with the current contents of the file."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        validators = {**self._load(), **self._validators}
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(validators, file)
+        os.replace(tmp_path, self.path)
+        self._validators = validators
+        self._dirty = False
+
+
+class StagedValidators:
+    """The validators received while fetching a listing or an article, held back until
+    what was scraped from it has been persisted."""
+
+    def __init__(self):
+        # a 304 was received, i.e. the page was scraped in a previous run
+        self.not_modified = False
+        self._validators: list[tuple[ValidatorStore, str, str | None, str | None]] = []
+
+    def add(
+        self,
+        store: ValidatorStore,
+        url: str,
+        etag: str | None,
+        last_modified: str | None,
+    ):
+        self._validators.append((store, url, etag, last_modified))
+
+    def commit(self) -> set[ValidatorStore]:
+        """Store the validators.
+
+        Returns:
+            set[ValidatorStore]: The stores that were updated.
+        """
+        for store, url, etag, last_modified in self._validators:
+            store.set(url, etag, last_modified)
+        return {store for store, *_ in self._validators}
+
+
+class StagedRun:
+    """The validators received during a run: those of the listing, and those of each
+    article job, with whether the job returned an article."""
+
+    def __init__(self):
+        self.listing = StagedValidators()
+        self._jobs: list[tuple[bool, StagedValidators]] = []
+        self._total = 0
+
+    def stage(self, job: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+        """Wrap an article job so that the validators it receives are staged."""
+        self._total += 1
+
+        async def staged_job():
+            staged = StagedValidators()
+            token = _current_staged.set(staged)
+            try:
+                result = await job()
+            finally:
+                _current_staged.reset(token)
+            self._jobs.append((result is not None, staged))
+            return result
+
+        return staged_job
+
+    def commit(self):
+        """Store and save the validators of the run, once its articles have been
+        persisted: those of every article retrieved, and the listing's if every article
+        listed was either retrieved or not modified. Otherwise the listing is fetched in
+        full next run, so that the articles that failed are listed again."""
+        stores = set()
+        complete = len(self._jobs) == self._total
+        for retrieved, staged in self._jobs:
+            if retrieved:
+                stores |= staged.commit()
+            elif not staged.not_modified:
+                complete = False
+        if complete:
+            stores |= self.listing.commit()
+        for store in stores:
+            store.save()
+
+
+def get_validator_store(path: Path = DEFAULT_VALIDATOR_STORE_PATH) -> ValidatorStore:
+    """Get the process-wide validator store for <path>, so that every engine in the
+    process shares one in-memory copy."""
+    path = Path(path)
+    if path not in _stores:
+        _stores[path] = ValidatorStore(path)
+    return _stores[path]
+
+
+@contextmanager
+def staged_run() -> Iterator[StagedRun]:
+    """Stage the validators received in the context (including tasks started in it)
+    by `stage_listing` and `stage_jobs`, rather than storing them. Call
+    `StagedRun.commit` once the run's articles have been persisted."""
+    run = StagedRun()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def stage_listing() -> Iterator[None]:
+    """Stage the validators received in the context as the current run's listing. A
+    no-op outside of `staged_run`."""
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    token = _current_staged.set(run.listing)
+    try:
+        yield
+    finally:
+        _current_staged.reset(token)
+
+
+def stage_jobs(
+    jobs: Sequence[Callable[[], Awaitable[Any]]]
+) -> list[Callable[[], Awaitable[Any]]]:
+    """Wrap the article jobs of the current run so that the validators each receives
+    are staged. A no-op outside of `staged_run`."""
+    run = _current_run.get()
+    if run is None:
+        return list(jobs)
+    return [run.stage(job) for job in jobs]
+
+
+class ConditionalTransport(httpx.AsyncBaseTransport):
+    """Sends stored validators with GET requests and records new ones.
+
+    A 304 Not Modified response is passed through untouched; callers are expected to
+    check `is_not_modified` and skip parsing and persisting for that url. New
+    validators are staged when received within `staged_run`, and stored straight away
+    otherwise. Either way they are only written to disk by `ValidatorStore.save`.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, store: ValidatorStore):
+        self._transport = transport
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self._transport.handle_async_request(request)
+        url = str(request.url)
+        validators = self.store.get(url)
+        if validators:
+            if "etag" in validators and "if-none-match" not in request.headers:
+                request.headers["If-None-Match"] = validators["etag"]
+            if (
+                "last_modified" in validators
+                and "if-modified-since" not in request.headers
+            ):
+                request.headers["If-Modified-Since"] = validators["last_modified"]
+        response = await self._transport.handle_async_request(request)
+        staged = _current_staged.get()
+        if is_not_modified(response):
+            logger.debug(f"{url};not modified")
+            if staged is not None:
+                staged.not_modified = True
+        elif response.status_code == HTTPStatus.OK:
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+            if staged is not None:
+                staged.add(self.store, url, etag, last_modified)
+            else:
+                self.store.set(url, etag, last_modified)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,291 @@
+"""Warm, long-lived connections: DNS caching, shared TLS configuration and prewarming.
+
+By default every engine session starts cold. Each new host costs a DNS lookup, a TCP
+connect and a TLS handshake, and all of them happen with the first requests. This
+module takes that cost out of the critical path:
+
+- DNS results are cached process-wide for a TTL, and concurrent lookups of the same
+  host share one query.
+- One SSL context (certificate store included) is shared by every transport instead of
+  being built per session.
+- Sessions that pass a share key get their connection pool from a process-wide
+  registry. The pool outlives the session, so a long-lived process (e.g. the api)
+  reuses open keep-alive connections across runs.
+- `prewarm` resolves hosts and opens connections to them in parallel before a run
+  starts. Its requests go straight to the network (see `PrewarmTransport`), so they
+  don't spend rate limit tokens or concurrency slots.
+
+TLS session tickets can't be handed to asyncio's TLS upgrade, so connections are kept
+warm instead of resumed.
+"""
+
+import asyncio
+import logging
+import socket
+import ssl
+import time
+from typing import Iterable, Sequence
+
+import httpcore
+import httpx
+
+from .helpers import get_origin
+from .record_replay import current_recording_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DNS_TTL = 300.0
+# marks the requests sent by `prewarm`
+PREWARM_EXTENSION = "prewarm"
+
+
+class DNSCache:
+    """Caches the addresses of hosts for <ttl> seconds.
+
+    Args:
+        ttl (float, optional): Seconds a lookup stays valid. getaddrinfo doesn't report
+            record TTLs, so one TTL applies to every host. Defaults to 300.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_DNS_TTL):
+        self.ttl = ttl
+        self._addresses: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lookups: dict[tuple[str, int], asyncio.Task] = {}
+
+    async def _lookup(self, host: str, port: int) -> list[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        # keep the resolver's order (e.g. RFC 6724), without duplicates
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._addresses[(host, port)] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        key = (host, port)
+        cached = self._addresses.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        lookup = self._lookups.get(key)
+        if lookup is None or lookup.get_loop() is not asyncio.get_running_loop():
+            lookup = asyncio.ensure_future(self._lookup(host, port))
+            self._lookups[key] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(key, None))
+        return await asyncio.shield(lookup)
+
+    def forget(self, host: str, port: int):
+        self._addresses.pop((host, port), None)
+
+    def clear(self):
+        self._addresses = {}
+
+
+dns_cache = DNSCache()
+
+
+class CachingResolverBackend(httpcore.AsyncNetworkBackend):
+    """A network backend that resolves hosts through a `DNSCache`, trying each of a
+    host's addresses in turn. TLS still uses the host name (SNI and certificate
+    checks are done against the origin, not the address)."""
+
+    def __init__(
+        self,
+        backend: httpcore.AsyncNetworkBackend | None = None,
+        cache: DNSCache = dns_cache,
+    ):
+        self._backend = backend or httpcore.AnyIOBackend()
+        self.cache = cache
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        try:
+            addresses = await self.cache.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        error: Exception | None = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        # the cached addresses may be stale
+        self.cache.forget(host, port)
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(
+        self, *args, **kwargs
+    ) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(*args, **kwargs)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+_ssl_context: ssl.SSLContext | None = None
+
+
+def shared_ssl_context() -> ssl.SSLContext:
+    """The SSL context shared by every transport in the process."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+class CachingHTTPTransport(httpx.AsyncHTTPTransport):
+    """An `httpx.AsyncHTTPTransport` whose connections resolve hosts through a
+    `DNSCache`. Takes the same arguments, except that TLS is configured by an SSL
+    context and there is no proxy (connections through a proxy only ever resolve the
+    proxy's host).
+
+    httpx doesn't take a network backend, so the connection pool is built here with the
+    settings httpx would use, plus one. This relies on the transport's pool attribute,
+    hence the pinned httpx version.
+    """
+
+    def __init__(
+        self,
+        limits: httpx.Limits,
+        ssl_context: ssl.SSLContext,
+        http1: bool = True,
+        http2: bool = False,
+        uds: str | None = None,
+        local_address: str | None = None,
+        retries: int = 0,
+        socket_options: Sequence | None = None,
+        dns: DNSCache = dns_cache,
+    ):
+        super().__init__(
+            verify=ssl_context,
+            http1=http1,
+            http2=http2,
+            limits=limits,
+            uds=uds,
+            local_address=local_address,
+            retries=retries,
+            socket_options=socket_options,
+        )
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=http1,
+            http2=http2,
+            uds=uds,
+            local_address=local_address,
+            retries=retries,
+            socket_options=socket_options,
+            network_backend=CachingResolverBackend(cache=dns),
+        )
+
+
+def create_http_transport(
+    limits: httpx.Limits, http2: bool = False
+) -> httpx.AsyncHTTPTransport:
+    """An http transport that uses the DNS cache and the shared SSL context."""
+    return CachingHTTPTransport(limits, shared_ssl_context(), http2=http2)
+
+
+class PrewarmTransport(httpx.AsyncBaseTransport):
+    """Sends the requests of `prewarm` straight to <network>, the transport at the
+    bottom of the stack, past the rate limit, concurrency controls and caches in
+    between: warming a connection shouldn't spend a token or a slot."""
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, network: httpx.AsyncBaseTransport
+    ):
+        self._transport = transport
+        self.network = network
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get(PREWARM_EXTENSION):
+            return await self.network.handle_async_request(request)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class UnclosableTransport(httpx.AsyncBaseTransport):
+    """Lends a shared transport to a session without letting the session close it."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+_shared_transports: dict[
+    tuple, tuple[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]
+] = {}
+
+
+def get_shared_http_transport(
+    key: str, limits: httpx.Limits, http2: bool = False
+) -> httpx.AsyncBaseTransport:
+    """Get the process-wide http transport for <key> (e.g. an outlet) and settings.
+    Connections opened through it stay open for reuse after the caller's session
+    closes, until they expire or `close_shared_http_transports` is called."""
+    registry_key = (
+        key,
+        limits.max_connections,
+        limits.max_keepalive_connections,
+        limits.keepalive_expiry,
+        http2,
+    )
+    loop = asyncio.get_running_loop()
+    shared = _shared_transports.get(registry_key)
+    # connections are bound to the event loop they were opened in
+    if shared is None or shared[0] is not loop:
+        shared = (loop, create_http_transport(limits, http2=http2))
+        _shared_transports[registry_key] = shared
+    return UnclosableTransport(shared[1])
+
+
+async def close_shared_http_transports():
+    """Close every shared transport (and its connections) of the running loop."""
+    loop = asyncio.get_running_loop()
+    for key, (transport_loop, transport) in list(_shared_transports.items()):
+        if transport_loop is loop:
+            await transport.aclose()
+        del _shared_transports[key]
+
+
+async def prewarm(client: httpx.AsyncClient, urls: Iterable[str]):
+    """Resolve the hosts of <urls> and open a connection to each of their origins in
+    parallel, by sending a HEAD request to the origin. Through a client of
+    `create_transport`, the request goes straight to the network. Failures are only
+    logged: the run will just start cold for that origin. Nothing is done while
+    recording or replaying, so archives only hold the run's own traffic."""
+    if current_recording_session() is not None:
+        return
+
+    async def warm(origin: str):
+        start = time.monotonic()
+        try:
+            response = await client.head(
+                origin, extensions={PREWARM_EXTENSION: True}
+            )
+        except httpx.HTTPError as e:
+            logger.info(f"{origin};prewarming failed: {e!r}")
+            return
+        logger.debug(
+            f"{origin};prewarmed in {time.monotonic() - start:.3f}s "
+            f"({response.status_code})"
+        )
+
+    origins = {get_origin(url) for url in urls if url}
+    await asyncio.gather(*[warm(origin) for origin in origins])
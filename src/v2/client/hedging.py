@@ -0,0 +1,251 @@
+"""Hedged requests.
+
+A run waits for its slowest article, and the slowest articles are usually slow because
+of one unlucky request rather than the page itself. With hedging, a GET that is still
+waiting for its response after the domain's usual latency (a percentile of its recent
+latencies) gets a duplicate fired off. Whichever answers first is used and the other is
+cancelled. The number of duplicates per domain is capped at a share of its requests,
+so hedging can't snowball into load on an outlet that is slow across the board.
+
+A request may first wait for a rate limit token or a concurrency slot. That wait says
+nothing about the outlet, so requests are timed from when they are actually sent: a
+`SendTimingTransport` below the limits marks the moment, and only then does the hedge
+timer start.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+
+from .ratelimit import get_rate_limit_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_BUDGET = 0.05
+HEDGED_METHODS = frozenset(["GET", "HEAD"])
+
+
+class DomainLatency:
+    """Recent latencies and hedging counts of one domain.
+
+    Args:
+        window (int, optional): Number of recent latencies percentiles are computed
+            over. Defaults to 100.
+        min_samples (int, optional): Don't hedge before this many latencies are known.
+            Defaults to 20.
+    """
+
+    def __init__(self, window: int = 100, min_samples: int = 20):
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def observe(self, latency: float):
+        self._latencies.append(latency)
+
+    def percentile(self, percentile: float) -> float | None:
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile))]
+
+    def can_hedge(self, budget: float) -> bool:
+        """Whether one more hedge keeps the extra load within <budget>."""
+        return self.hedges + 1 <= budget * self.requests
+
+    def state(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+        }
+
+
+class HedgingRegistry:
+    """The process-wide latency trackers, keyed by domain."""
+
+    def __init__(self):
+        self._domains: dict[str, DomainLatency] = {}
+
+    def get(self, url: str) -> DomainLatency:
+        key = get_rate_limit_key(url)
+        if key not in self._domains:
+            self._domains[key] = DomainLatency()
+        return self._domains[key]
+
+    def snapshot(self) -> dict[str, dict]:
+        return {key: domain.state() for key, domain in self._domains.items()}
+
+    def clear(self):
+        self._domains = {}
+
+
+hedging = HedgingRegistry()
+
+
+class _Attempt:
+    """One request sent by a `HedgingTransport`: the primary or its hedge."""
+
+    def __init__(self):
+        self.sent = asyncio.Event()
+        self.sent_at: float | None = None
+
+    def mark_sent(self):
+        if self.sent_at is None:
+            self.sent_at = time.monotonic()
+            self.sent.set()
+
+
+_current_attempt: ContextVar[Optional[_Attempt]] = ContextVar(
+    "current_hedging_attempt", default=None
+)
+
+
+class SendTimingTransport(httpx.AsyncBaseTransport):
+    """Marks the moment a request is sent, for the `HedgingTransport` above. Goes below
+    the rate limit and concurrency controls, so time spent waiting on them isn't
+    taken for latency."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = _current_attempt.get()
+        if attempt is not None:
+            attempt.mark_sent()
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HedgingTransport(httpx.AsyncBaseTransport):
+    """Fires a duplicate of a slow GET / HEAD request and uses whichever response
+    comes first.
+
+    Args:
+        transport (httpx.AsyncBaseTransport): The transport to wrap.
+        percentile (float, optional): Hedge once a request has been waiting longer
+            than this percentile of its domain's recent latencies. Defaults to 0.95.
+        budget (float, optional): Maximum hedges as a share of the domain's requests,
+            e.g. 0.05 for at most 5% extra requests. Defaults to 0.05.
+        registry (HedgingRegistry, optional): Where per-domain latencies are kept.
+        timed_from_send (bool, optional): Time requests from when a
+            `SendTimingTransport` further down sends them, rather than from when they
+            are passed down. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget: float = DEFAULT_HEDGE_BUDGET,
+        registry: HedgingRegistry = hedging,
+        timed_from_send: bool = False,
+    ):
+        self._transport = transport
+        self.percentile = percentile
+        self.budget = budget
+        self.registry = registry
+        self.timed_from_send = timed_from_send
+
+    def _send(self, request: httpx.Request) -> tuple[asyncio.Future, _Attempt]:
+        """Pass <request> down in a task of its own."""
+        attempt = _Attempt()
+        if not self.timed_from_send:
+            attempt.mark_sent()
+        token = _current_attempt.set(attempt)
+        try:
+            task = asyncio.ensure_future(self._transport.handle_async_request(request))
+        finally:
+            _current_attempt.reset(token)
+        return task, attempt
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in HEDGED_METHODS:
+            return await self._transport.handle_async_request(request)
+        domain = self.registry.get(str(request.url))
+        domain.requests += 1
+        delay = domain.percentile(self.percentile)
+        primary, attempt = self._send(request)
+        try:
+            # the hedge timer starts once the primary is sent
+            sent = asyncio.ensure_future(attempt.sent.wait())
+            try:
+                await asyncio.wait([primary, sent], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                sent.cancel()
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not domain.can_hedge(self.budget):
+                response = await primary
+                _observe(domain, attempt)
+                return response
+            domain.hedges += 1
+            logger.debug(f"{request.url};no response after {delay:.2f}s. hedging...")
+            hedge, hedge_attempt = self._send(request)
+            response, winner = await self._first_response(primary, hedge)
+        except BaseException:
+            primary.cancel()
+            raise
+        if winner is hedge:
+            domain.hedge_wins += 1
+            attempt = hedge_attempt
+        _observe(domain, attempt)
+        return response
+
+    async def _first_response(
+        self, primary: asyncio.Future, hedge: asyncio.Future
+    ) -> tuple[httpx.Response, asyncio.Future]:
+        """The first successful response of the two. The other request is cancelled,
+        or closed if it completed too. If both fail, the primary's error is raised."""
+        pending = {primary, hedge}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # the primary wins a tie
+                successful = [
+                    task
+                    for task in (primary, hedge)
+                    if task in done and task.exception() is None
+                ]
+                if successful:
+                    winner = successful[0]
+                    # both may have completed at once
+                    for other in successful[1:]:
+                        await other.result().aclose()
+        finally:
+            for loser in pending:
+                loser.cancel()
+                loser.add_done_callback(_close_response)
+        if winner is None:
+            return primary.result(), primary
+        return winner.result(), winner
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _observe(domain: DomainLatency, attempt: _Attempt):
+    """Record the latency of a request that was answered, from when it was sent."""
+    if attempt.sent_at is not None:
+        domain.observe(time.monotonic() - attempt.sent_at)
+
+
+def _close_response(task: asyncio.Future):
+    """A cancelled loser may still have finished: give its connection back."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(task.result().aclose())
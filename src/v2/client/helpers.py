@@ -1,4 +1,4 @@
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse
 
 
 def get_url_stem(url: str):
@@ -14,3 +14,23 @@ def get_url_stem(url: str):
 def get_domain(url: str):
     parsed_url = urlparse(url)
     return parsed_url.netloc
+
+
+def get_origin(url: str):
+    """The scheme and host of a url, e.g. https://www.bbc.com"""
+    parsed_url = urlparse(str(url))
+    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+
+def normalise_url(url: str):
+    """Normalise a url so that equivalent urls compare equal: lowercase scheme and
+    host, default ports and fragments dropped, query parameters sorted."""
+    parsed_url = urlparse(str(url))
+    scheme = parsed_url.scheme.lower()
+    netloc = parsed_url.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = "&".join(sorted(parsed_url.query.split("&"))) if parsed_url.query else ""
+    return urlunparse(
+        (scheme, netloc, parsed_url.path or "/", parsed_url.params, query, "")
+    )
@@ -0,0 +1,141 @@
+"""Structured, lazily rendered request/response log events.
+
+Nothing is decoded or formatted unless the event is actually emitted. Bodies are only
+included for a sample of responses (and for error responses), and are capped to a
+number of bytes.
+"""
+
+import logging
+import random
+from dataclasses import dataclass
+
+import httpx
+
+
+@dataclass
+class HttpLogConfig:
+    """How request/response events are logged.
+
+    Attributes:
+        body_sample_rate (float): Fraction of responses whose bodies are included.
+        sample_errors (bool): Always include the body of 4xx/5xx responses.
+        max_body_bytes (int): Bodies are truncated to this many bytes.
+    """
+
+    body_sample_rate: float = 0.0
+    sample_errors: bool = True
+    max_body_bytes: int = 2048
+
+
+config = HttpLogConfig()
+
+
+def configure_http_logging(
+    body_sample_rate: float | None = None,
+    sample_errors: bool | None = None,
+    max_body_bytes: int | None = None,
+):
+    """Update the process-wide http logging config. Arguments left as None are kept."""
+    if body_sample_rate is not None:
+        config.body_sample_rate = body_sample_rate
+    if sample_errors is not None:
+        config.sample_errors = sample_errors
+    if max_body_bytes is not None:
+        config.max_body_bytes = max_body_bytes
+
+
+def should_sample_body(response: httpx.Response) -> bool:
+    if config.sample_errors and response.status_code >= 400:
+        return True
+    return config.body_sample_rate > 0 and random.random() < config.body_sample_rate
+
+
+def _truncate(content: bytes, max_bytes: int) -> str:
+    text = content[:max_bytes].decode("utf-8", errors="replace")
+    if len(content) > max_bytes:
+        text += f"... [{len(content) - max_bytes} more bytes]"
+    return text
+
+
+def _request_content(request: httpx.Request) -> bytes | None:
+    try:
+        return request.content
+    except httpx.RequestNotRead:
+        return None
+
+
+def _response_content(response: httpx.Response) -> bytes | None:
+    try:
+        return response.content
+    except httpx.ResponseNotRead:
+        return None
+
+
+def _elapsed(response: httpx.Response) -> float | None:
+    try:
+        return response.elapsed.total_seconds()
+    except RuntimeError:
+        # only known once the response is closed
+        return None
+
+
+class HttpEvent:
+    """A request/response log event. Rendering (`as_dict` / `str`) only happens when
+    a handler actually emits the record."""
+
+    __slots__ = ("response", "include_body", "max_body_bytes")
+
+    def __init__(
+        self,
+        response: httpx.Response,
+        include_body: bool = False,
+        max_body_bytes: int | None = None,
+    ):
+        self.response = response
+        self.include_body = include_body
+        self.max_body_bytes = (
+            config.max_body_bytes if max_body_bytes is None else max_body_bytes
+        )
+
+    def as_dict(self) -> dict:
+        request = self.response.request
+        event = {
+            "method": request.method,
+            "url": str(request.url),
+            "status_code": self.response.status_code,
+            "elapsed": _elapsed(self.response),
+            "request_headers": dict(request.headers),
+            "response_headers": dict(self.response.headers),
+        }
+        if self.include_body:
+            request_content = _request_content(request)
+            response_content = _response_content(self.response)
+            if request_content:
+                event["request_body"] = _truncate(request_content, self.max_body_bytes)
+            if response_content is not None:
+                event["response_body"] = _truncate(
+                    response_content, self.max_body_bytes
+                )
+        return event
+
+    def __str__(self) -> str:
+        event = self.as_dict()
+        text = (
+            f"{event['method']} {event['url']} returned {event['status_code']}. "
+            f"{event['elapsed']}s elapsed. |\n"
+            f"REQ HEADERS: {event['request_headers']} |\n"
+            f"RESP HEADERS: {event['response_headers']}"
+        )
+        if "request_body" in event:
+            text += f" |\nREQ BODY: {event['request_body']}"
+        if "response_body" in event:
+            text += f" |\nRESPONSE: {event['response_body']}"
+        return text
+
+
+def log_http_event(logger: logging.Logger, response: httpx.Response):
+    """Log <response> at DEBUG level. Costs next to nothing when DEBUG is disabled."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    event = HttpEvent(response, include_body=should_sample_body(response))
+    logger.debug("%s", event, extra={"http_event": event})
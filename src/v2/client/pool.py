@@ -0,0 +1,181 @@
+"""A pool of long-lived, keep-alive http clients.
+
+One client is kept per origin (scheme + host) so that repeated requests to the same
+website reuse warm connections instead of paying for a new TCP+TLS handshake on every
+request. The connections themselves outlive the pool (see `v2.client.connections`), so
+later pools to the same origin start warm too.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from .cache import MemoryResponseCache, ResponseCache
+from .conditional import ValidatorStore
+from .hedging import DEFAULT_HEDGE_BUDGET
+from .helpers import get_origin
+from .transports import create_transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_current_pool: ContextVar[Optional["ClientPool"]] = ContextVar(
+    "current_pool", default=None
+)
+
+
+class ClientPool:
+    """Keeps one keep-alive AsyncClient per origin.
+
+    The pool is an async context manager. While it is open it is the "current" pool
+    and every request made through `v2.client` (and any task spawned inside the
+    context) is routed through it. Closing the pool closes all of its clients.
+
+    Args:
+        max_connections (int, optional): The maximum number of concurrent connections
+            per origin. Defaults to 10.
+        max_keepalive_connections (int, optional): The maximum number of idle
+            connections kept alive per origin. Defaults to 10.
+        keepalive_expiry (float, optional): Seconds an idle connection is kept alive
+            for. Defaults to 30.
+        http2 (bool, optional): Multiplex requests to an origin over a single HTTP/2
+            connection where the server supports it. Defaults to False.
+        max_streams (int | None, optional): Maximum concurrent requests in flight per
+            origin (i.e. per HTTP/2 connection). Defaults to None.
+        validators (ValidatorStore | None, optional): Make GET requests conditional
+            on the validators in this store. Defaults to None.
+        cache (ResponseCache | None, optional): Serve GET requests from this on-disk
+            response cache while fresh. Defaults to None.
+        cache_ttl (float | None, optional): Overrides the cache's per-domain TTL.
+            Defaults to None.
+        memory_cache (bool, optional): Keep the pages fetched through the pool in
+            memory while it is open, so pages read one after the other by several
+            callers (e.g. a listing read by an agent, then by the scraper) are only
+            downloaded once. Defaults to False.
+        rate_limit (float | None, optional): Requests per second allowed to each
+            domain, shared with every other pool and engine session in the process.
+            Defaults to None.
+        rate_burst (int | None, optional): Burst size of <rate_limit>. Defaults to
+            None.
+        adaptive (bool, optional): Control the concurrency to each domain adaptively,
+            with <max_connections> as the ceiling. Defaults to False.
+        hedge_percentile (float | None, optional): Hedge GET requests slower than this
+            percentile of their domain's latencies. Defaults to None.
+        hedge_budget (float, optional): Maximum hedged requests as a share of each
+            domain's requests. Defaults to 0.05.
+        **client_kwargs: Extra keyword arguments passed to each `httpx.AsyncClient`.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = False,
+        max_streams: int | None = None,
+        validators: ValidatorStore | None = None,
+        cache: ResponseCache | None = None,
+        cache_ttl: float | None = None,
+        memory_cache: bool = False,
+        rate_limit: float | None = None,
+        rate_burst: int | None = None,
+        adaptive: bool = False,
+        hedge_percentile: float | None = None,
+        hedge_budget: float = DEFAULT_HEDGE_BUDGET,
+        **client_kwargs,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.max_streams = max_streams
+        self.validators = validators
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.memory_cache = MemoryResponseCache() if memory_cache else None
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.adaptive = adaptive
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self._client_kwargs = client_kwargs
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._token: Token | None = None
+
+    def _create_client(self, origin: str) -> httpx.AsyncClient:
+        logger.debug(f"{origin};opening pooled client")
+        transport = create_transport(
+            self.limits,
+            http2=self.http2,
+            max_streams=self.max_streams,
+            validators=self.validators,
+            cache=self.cache,
+            cache_ttl=self.cache_ttl,
+            memory_cache=self.memory_cache,
+            rate_limit=self.rate_limit,
+            rate_burst=self.rate_burst,
+            adaptive_ceiling=self.limits.max_connections if self.adaptive else None,
+            hedge_percentile=self.hedge_percentile,
+            hedge_budget=self.hedge_budget,
+            share_key=origin,
+        )
+        return httpx.AsyncClient(transport=transport, **self._client_kwargs)
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Get (or lazily create) the client responsible for the origin of <url>."""
+        origin = get_origin(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._create_client(origin)
+            self._clients[origin] = client
+        return client
+
+    @property
+    def origins(self) -> list[str]:
+        return list(self._clients.keys())
+
+    async def aclose(self):
+        """Close every client in the pool."""
+        clients, self._clients = self._clients, {}
+        for origin, client in clients.items():
+            logger.debug(f"{origin};closing pooled client")
+            await client.aclose()
+
+    async def __aenter__(self) -> "ClientPool":
+        self._token = _current_pool.set(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._token is not None:
+            _current_pool.reset(self._token)
+            self._token = None
+        await self.aclose()
+
+
+def current_pool() -> ClientPool | None:
+    """The pool of the enclosing `ClientPool` context, if there is one."""
+    return _current_pool.get()
+
+
+@asynccontextmanager
+async def client_pool(**kwargs) -> AsyncIterator[ClientPool]:
+    """Share warm connections for the duration of the context.
+
+    If a pool is already open in the current context it is reused (and left open on
+    exit), otherwise a new pool is created with <kwargs> and closed on exit. This lets
+    nested callers, e.g. an agent run inside a trace creation, share one pool.
+    """
+    pool = current_pool()
+    if pool is not None:
+        yield pool
+        return
+    async with ClientPool(**kwargs) as pool:
+        yield pool
@@ -0,0 +1,130 @@
+"""A process-wide, per-domain token bucket rate limiter.
+
+Every engine (v1, v2 and Enginev2) sends its requests through the same limiter, so
+several configs scraping the same outlet at once share that outlet's budget instead of
+each running at the full rate.
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+
+from .helpers import get_domain
+
+logger = logging.getLogger(__name__)
+
+
+def get_rate_limit_key(url: str) -> str:
+    """Requests to www.<domain> and <domain> share a bucket."""
+    domain = get_domain(url).lower()
+    return domain[len("www.") :] if domain.startswith("www.") else domain
+
+
+class TokenBucket:
+    """Allows <rate> requests per second on average, with bursts of up to <burst>."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        # buckets are process-wide, but a lock is bound to the loop it's waited on in,
+        # so each loop gets its own (e.g. between asyncio.run calls)
+        self._lock: tuple[asyncio.AbstractEventLoop, asyncio.Lock] | None = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock[0] is not loop:
+            self._lock = (loop, asyncio.Lock())
+        return self._lock[1]
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it. Waiters are served in order."""
+        async with self._get_lock():
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class DomainRateLimiter:
+    """Token buckets keyed by domain. Domains without a configured bucket are not
+    limited."""
+
+    def __init__(self):
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def configure(self, url_or_domain: str, rate: float, burst: int | None = None):
+        """Set the rate (requests per second) and burst for a domain. If the domain is
+        already configured, the more conservative of the two settings is kept."""
+        if "//" not in url_or_domain:
+            url_or_domain = f"https://{url_or_domain}"
+        key = get_rate_limit_key(url_or_domain)
+        burst = burst or max(int(rate), 1)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            logger.debug(f"{key};rate limit {rate}/s, burst {burst}")
+            self._buckets[key] = TokenBucket(rate, burst)
+            return
+        bucket.rate = min(bucket.rate, rate)
+        bucket.burst = min(bucket.burst, burst)
+
+    def is_configured(self, url: str) -> bool:
+        return get_rate_limit_key(url) in self._buckets
+
+    async def acquire(self, url: str):
+        bucket = self._buckets.get(get_rate_limit_key(url))
+        if bucket is not None:
+            await bucket.acquire()
+
+    def clear(self):
+        self._buckets = {}
+
+
+# shared by every engine in the process
+limiter = DomainRateLimiter()
+
+
+class RateLimitTransport(httpx.AsyncBaseTransport):
+    """Takes a token from the domain's bucket before each request.
+
+    If <rate> is given, any domain requested through this transport that doesn't have a
+    limit yet is configured with it, so an engine's limit applies to every domain it
+    touches (e.g. an outlet's API host as well as its website).
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiter: DomainRateLimiter = limiter,
+        rate: float | None = None,
+        burst: int | None = None,
+    ):
+        self._transport = transport
+        self.limiter = limiter
+        self.rate = rate
+        self.burst = burst
+        self._configured: set[str] = set()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if self.rate:
+            key = get_rate_limit_key(url)
+            if key not in self._configured:
+                self.limiter.configure(url, self.rate, self.burst)
+                self._configured.add(key)
+        await self.limiter.acquire(url)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
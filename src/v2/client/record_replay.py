@@ -0,0 +1,255 @@
+"""Record / replay of http traffic ("VCR" mode).
+
+While `recording(path)` is active, every request made through a pooled client or an
+engine session is forwarded as usual and captured, together with its latency, into a
+compact archive (gzipped json lines). While `replaying(path)` is active, nothing goes
+over the network: responses are served back from the archive, optionally after their
+original latency. This makes runs on real traffic reproducible offline, e.g. to
+profile `Engine.run`, `Scraper.run` or `create_url_traces` before and after a change.
+
+Both are context managers and only affect transports created inside them:
+
+    with replaying("fixtures/bbc.jsonl.gz", latency=True):
+        await engine.run()
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Iterator, Optional
+
+import httpx
+
+from exceptions import BaseException
+
+from .helpers import normalise_url
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayMissError(BaseException):
+    """Raised when a request being replayed isn't in the archive."""
+
+
+class RecordingMode(str, Enum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+@dataclass
+class Interaction:
+    method: str
+    url: str
+    body_hash: str
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    # seconds from sending the request to having read the response body
+    latency: float
+    # seconds since the recording started
+    started_at: float
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {**asdict(self), "content": base64.b64encode(self.content).decode("ascii")}
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> "Interaction":
+        data = json.loads(line)
+        data["content"] = base64.b64decode(data["content"])
+        data["headers"] = [tuple(header) for header in data["headers"]]
+        return cls(**data)
+
+
+def _body_hash(request: httpx.Request) -> str:
+    try:
+        content = request.content
+    except httpx.RequestNotRead:
+        content = b""
+    return hashlib.sha1(content).hexdigest()
+
+
+def interaction_key(method: str, url: str, body_hash: str) -> str:
+    return f"{method.upper()} {normalise_url(url)} {body_hash}"
+
+
+class Cassette:
+    """An archive of recorded interactions.
+
+    When the same request was recorded several times, the recordings are replayed in
+    order and the last one is repeated.
+
+    Args:
+        path (Path): The archive file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.interactions: list[Interaction] = []
+        self._started_at = time.monotonic()
+        self._queues: dict[str, deque[Interaction]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "Cassette":
+        cassette = cls(path)
+        with gzip.open(cassette.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    cassette.add(Interaction.from_json(line))
+        logger.info(f"{path};loaded {len(cassette)} recorded interactions")
+        return cassette
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started_at
+
+    def add(self, interaction: Interaction):
+        self.interactions.append(interaction)
+        key = interaction_key(
+            interaction.method, interaction.url, interaction.body_hash
+        )
+        self._queues.setdefault(key, deque()).append(interaction)
+
+    def next(self, request: httpx.Request) -> Interaction | None:
+        key = interaction_key(request.method, str(request.url), _body_hash(request))
+        queue = self._queues.get(key)
+        if not queue:
+            return None
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+            for interaction in self.interactions:
+                file.write(interaction.to_json() + "\n")
+        os.replace(tmp_path, self.path)
+        logger.info(f"{self.path};saved {len(self)} recorded interactions")
+
+
+@dataclass
+class RecordingSession:
+    mode: RecordingMode
+    cassette: Cassette
+    latency: bool = False
+
+
+_current_session: ContextVar[Optional[RecordingSession]] = ContextVar(
+    "current_recording_session", default=None
+)
+
+
+def current_recording_session() -> RecordingSession | None:
+    return _current_session.get()
+
+
+@contextmanager
+def recording(path: Path) -> Iterator[Cassette]:
+    """Record the traffic of transports created in the context into <path>. The
+    archive is written when the context exits."""
+    cassette = Cassette(path)
+    token = _current_session.set(RecordingSession(RecordingMode.RECORD, cassette))
+    try:
+        yield cassette
+    finally:
+        _current_session.reset(token)
+        cassette.save()
+
+
+@contextmanager
+def replaying(path: Path, latency: bool = False) -> Iterator[Cassette]:
+    """Serve the traffic of transports created in the context from the archive at
+    <path>. If <latency> is True, each response is delayed by its recorded
+    latency."""
+    cassette = Cassette.load(path)
+    token = _current_session.set(
+        RecordingSession(RecordingMode.REPLAY, cassette, latency)
+    )
+    try:
+        yield cassette
+    finally:
+        _current_session.reset(token)
+
+
+class RecordTransport(httpx.AsyncBaseTransport):
+    """Captures every request / response that goes through the transport."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        self._transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started_at = self.cassette.elapsed()
+        start = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.stream.aclose()
+        self.cassette.add(
+            Interaction(
+                method=request.method,
+                url=str(request.url),
+                body_hash=_body_hash(request),
+                status_code=response.status_code,
+                headers=[
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in response.headers.raw
+                ],
+                content=content,
+                latency=time.monotonic() - start,
+                started_at=started_at,
+            )
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(content),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves responses from a cassette instead of the network.
+
+    Args:
+        cassette (Cassette): The recorded interactions.
+        latency (bool, optional): Delay each response by its recorded latency.
+            Defaults to False.
+    """
+
+    def __init__(self, cassette: Cassette, latency: bool = False):
+        self.cassette = cassette
+        self.latency = latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self.cassette.next(request)
+        if interaction is None:
+            raise ReplayMissError(
+                f"No recorded response for {request.method} {request.url}"
+            )
+        if self.latency:
+            await asyncio.sleep(interaction.latency)
+        return httpx.Response(
+            interaction.status_code,
+            headers=interaction.headers,
+            stream=httpx.ByteStream(interaction.content),
+            extensions={"replayed": True},
+        )
@@ -0,0 +1,159 @@
+"""Coalescing of identical concurrent requests ("singleflight").
+
+When several callers of a client (e.g. the jobs of an engine run) ask for the same
+resource at the same moment, only the first request goes out. The others wait for it
+and each get their own copy of its response.
+
+Requests are shared between the transport stacks (i.e. clients) configured alike, e.g.
+the sessions of feeds that overlap, or two concurrent source checks: stacks that differ
+in their caches, conditional requests or limits each get a group of their own (see
+`get_singleflight_group`), since a response fetched through one isn't a valid answer
+for another. Requests are only shared if all their headers match.
+
+The shared request runs in a task of its own, so a caller that goes away (e.g. is
+cancelled by a timeout) only stops waiting: the request carries on for everyone else,
+and is only cancelled once no caller is waiting for it anymore.
+"""
+
+import asyncio
+import hashlib
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+import httpx
+
+from .helpers import normalise_url
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+COALESCED_METHODS = frozenset(["GET", "HEAD"])
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleflightGroup:
+    """Shares in-flight calls between callers that use the same key."""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: dict[str, _Call] = {}
+
+    def key(self, request: httpx.Request) -> str:
+        """The method, url and every header of <request>: requests that differ in any
+        header (e.g. conditional ones) are never coalesced."""
+        parts = [request.method.upper(), normalise_url(str(request.url))]
+        parts.extend(
+            sorted(f"{name}:{value}" for name, value in request.headers.multi_items())
+        )
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await the in-flight call for <key>, or start one with <fn>.
+
+        Every waiter receives the call's result or exception. Cancelling a waiter
+        doesn't cancel the call unless it was the last one waiting.
+        """
+        call = self._calls.get(key)
+        # calls don't outlive their event loop (e.g. between asyncio.run calls)
+        if call is None or call.task.get_loop() is not asyncio.get_running_loop():
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, call=call: self._forget(key, call))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # everyone went away
+                call.task.cancel()
+
+
+# a group lives as long as a transport uses it
+_groups: weakref.WeakValueDictionary[Hashable, SingleflightGroup] = (
+    weakref.WeakValueDictionary()
+)
+
+
+def get_singleflight_group(key: Hashable) -> SingleflightGroup:
+    """Get the process-wide group of the transports configured alike, i.e. with the
+    same <key>."""
+    group = _groups.get(key)
+    if group is None:
+        group = _groups[key] = SingleflightGroup()
+    return group
+
+
+@dataclass
+class _SharedResponse:
+    status_code: int
+    headers: httpx.Headers
+    content: bytes
+    extensions: dict
+
+
+class SingleflightTransport(httpx.AsyncBaseTransport):
+    """Coalesces identical concurrent GET / HEAD requests.
+
+    The shared response body is read in full and every caller gets a response of
+    its own over a copy of it. Requests can opt out with
+    `extensions={"singleflight": False}`, e.g. when they stream the body.
+
+    Args:
+        transport (httpx.AsyncBaseTransport): The transport to wrap.
+        group (SingleflightGroup | None, optional): The group in-flight requests are
+            shared in. Defaults to None, i.e. a group of the transport's own.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        group: SingleflightGroup | None = None,
+    ):
+        self._transport = transport
+        self.group = group if group is not None else SingleflightGroup()
+
+    async def _fetch(self, request: httpx.Request) -> _SharedResponse:
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.stream.aclose()
+        return _SharedResponse(
+            response.status_code, response.headers, content, response.extensions
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in COALESCED_METHODS or not request.extensions.get(
+            "singleflight", True
+        ):
+            return await self._transport.handle_async_request(request)
+        shared = await self.group.do(
+            self.group.key(request), lambda: self._fetch(request)
+        )
+        return httpx.Response(
+            shared.status_code,
+            headers=shared.headers,
+            stream=httpx.ByteStream(shared.content),
+            extensions=dict(shared.extensions),
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
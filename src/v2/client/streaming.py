@@ -0,0 +1,185 @@
+"""Streamed response bodies with byte budgets.
+
+Instead of buffering a whole page, `v2.client.stream` hands out the body chunk by
+chunk. Reading stops once the request's own max_bytes cap, or the remaining budget of
+its domain, is used up, and a caller can stop early by simply closing the response
+once it has what it needs. Either way, the rest of the body is never downloaded.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import httpx
+
+from .ratelimit import get_rate_limit_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ByteStats:
+    """What happened to a streamed body.
+
+    Attributes:
+        bytes_read (int): Decoded bytes handed to the caller.
+        bytes_downloaded (int): Bytes received off the wire (i.e. before decoding).
+        bytes_skipped (int | None): Wire bytes that were never downloaded. None if the
+            body was cut short and the server didn't send a Content-Length.
+        truncated (bool): Reading stopped because a byte budget ran out.
+        aborted (bool): The caller closed the response before reading all of it.
+    """
+
+    bytes_read: int = 0
+    bytes_downloaded: int = 0
+    bytes_skipped: int | None = 0
+    truncated: bool = False
+    aborted: bool = False
+
+
+class DomainByteBudget:
+    """A process-wide cap on the bytes streamed from each domain. Domains without a
+    configured budget are not capped."""
+
+    def __init__(self):
+        self._remaining: dict[str, int] = {}
+
+    def configure(self, url_or_domain: str, max_bytes: int):
+        """Set the budget of a domain. If the domain already has a budget, the smaller
+        of the two remaining amounts is kept."""
+        if "//" not in url_or_domain:
+            url_or_domain = f"https://{url_or_domain}"
+        key = get_rate_limit_key(url_or_domain)
+        self._remaining[key] = min(self._remaining.get(key, max_bytes), max_bytes)
+
+    def remaining(self, url: str) -> int | None:
+        return self._remaining.get(get_rate_limit_key(url))
+
+    def consume(self, url: str, num_bytes: int):
+        key = get_rate_limit_key(url)
+        if key in self._remaining:
+            self._remaining[key] = max(0, self._remaining[key] - num_bytes)
+
+    def clear(self):
+        self._remaining = {}
+
+
+# shared by every streamed request in the process
+byte_budgets = DomainByteBudget()
+
+
+class StreamedResponse:
+    """A response whose body is read on demand, within a byte budget.
+
+    The accounting is available as `stats`, and is also attached to the underlying
+    `httpx.Response` as `response.extensions["byte_stats"]`.
+
+    Args:
+        response (httpx.Response): A response opened with `stream=True`.
+        max_bytes (int | None, optional): Maximum decoded bytes to read from this
+            response. Defaults to None, i.e. only capped by the domain's budget.
+        budgets (DomainByteBudget, optional): The per-domain budgets to draw from.
+    """
+
+    def __init__(
+        self,
+        response: httpx.Response,
+        max_bytes: int | None = None,
+        budgets: DomainByteBudget = byte_budgets,
+    ):
+        self.response = response
+        self.max_bytes = max_bytes
+        self.budgets = budgets
+        self.stats = ByteStats()
+        self.content: bytes | None = None
+        self._exhausted = False
+        self._closed = False
+        response.extensions["byte_stats"] = self.stats
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.response.headers
+
+    @property
+    def url(self) -> httpx.URL:
+        return self.response.url
+
+    @property
+    def encoding(self) -> str:
+        return self.response.encoding or "utf-8"
+
+    @property
+    def text(self) -> str:
+        """The body read so far, decoded. Call `read` first."""
+        if self.content is None:
+            raise httpx.ResponseNotRead()
+        # a truncated body may end part way through a multi-byte character
+        return self.content.decode(self.encoding, errors="replace")
+
+    def _allowance(self) -> int | None:
+        """Bytes that may still be read, or None if there is no cap."""
+        allowance = self.budgets.remaining(str(self.url))
+        if self.max_bytes is not None:
+            left = self.max_bytes - self.stats.bytes_read
+            allowance = left if allowance is None else min(allowance, left)
+        return allowance
+
+    async def iter_bytes(self, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+        """Yield the decoded body until it ends or the budget runs out."""
+        url = str(self.url)
+        if self._allowance() == 0:
+            self.stats.truncated = True
+            return
+        async for chunk in self.response.aiter_bytes(chunk_size):
+            allowance = self._allowance()
+            if allowance is not None and len(chunk) > allowance:
+                chunk = chunk[:allowance]
+                self.stats.truncated = True
+            self.stats.bytes_read += len(chunk)
+            self.budgets.consume(url, len(chunk))
+            if chunk:
+                yield chunk
+            if self.stats.truncated:
+                logger.debug(f"{url};byte budget reached after {self.stats.bytes_read}")
+                return
+        self._exhausted = True
+
+    async def read(self) -> bytes:
+        """Read the body, within the budget, and close the response."""
+        try:
+            self.content = b"".join([chunk async for chunk in self.iter_bytes()])
+        finally:
+            await self.aclose()
+        return self.content
+
+    async def aclose(self):
+        """Close the response. Closing it before the body has been read aborts the
+        download."""
+        if self._closed:
+            return
+        self._closed = True
+        await self.response.aclose()
+        transfer_stats = self.response.extensions.get("transfer_stats")
+        self.stats.bytes_downloaded = (
+            transfer_stats.wire_bytes
+            if transfer_stats is not None
+            else self.response.num_bytes_downloaded
+        )
+        if self._exhausted:
+            self.stats.bytes_skipped = 0
+            return
+        self.stats.aborted = not self.stats.truncated
+        # a decoded response's Content-Length is in the extensions (see
+        # `v2.client.compression`)
+        content_length = self.response.extensions.get(
+            "wire_content_length"
+        ) or self.headers.get("content-length")
+        self.stats.bytes_skipped = (
+            max(0, int(content_length) - self.stats.bytes_downloaded)
+            if content_length and content_length.isdigit()
+            else None
+        )
@@ -0,0 +1,24 @@
+from typing import AsyncIterator, Callable
+
+import httpx
+
+
+class ReleasingStream(httpx.AsyncByteStream):
+    """Wraps a response stream and calls <release> once the stream is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
@@ -0,0 +1,247 @@
+"""Transports shared by the v2 client pool and the v1 engine sessions."""
+
+import asyncio
+import logging
+
+import httpx
+
+from deadlines import DeadlineExceededError, remaining
+
+from .adaptive import AdaptiveConcurrencyTransport
+from .cache import CacheTransport, MemoryResponseCache, ResponseCache
+from .compression import CompressionTransport
+from .conditional import ConditionalTransport, ValidatorStore
+from .hedging import DEFAULT_HEDGE_BUDGET, HedgingTransport, SendTimingTransport
+from .connections import (
+    PrewarmTransport,
+    create_http_transport,
+    get_shared_http_transport,
+)
+from .ratelimit import RateLimitTransport
+from .record_replay import (
+    RecordingMode,
+    RecordTransport,
+    ReplayTransport,
+    current_recording_session,
+)
+from .singleflight import SingleflightTransport, get_singleflight_group
+from .streams import ReleasingStream
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """HTTP/2 support in httpx depends on the optional h2 package."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class StreamLimitTransport(httpx.AsyncBaseTransport):
+    """Caps the number of concurrent requests (streams) in flight through a transport.
+
+    A pool client (or engine session) serves a single origin, and with HTTP/2 all of
+    its requests are multiplexed over one connection, so this is effectively a
+    per-connection stream limit. A slot is held until the response body is closed.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_streams: int):
+        self._transport = transport
+        self.max_streams = max_streams
+        self._semaphore = asyncio.Semaphore(max_streams)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._semaphore.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        response.stream = ReleasingStream(response.stream, self._semaphore.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class DeadlineTransport(httpx.AsyncBaseTransport):
+    """Keeps requests within the current run deadline (see `deadlines`).
+
+    Request timeouts are clamped to the time left, and a request still in flight when
+    the deadline passes is abandoned. Requests started after the deadline fail fast
+    with `DeadlineExceededError`.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        left = remaining()
+        if left is None:
+            return await self._transport.handle_async_request(request)
+        if left <= 0:
+            raise DeadlineExceededError(
+                f"Deadline passed. Not making request to {request.url}"
+            )
+        timeouts = request.extensions.get("timeout", {})
+        request.extensions["timeout"] = {
+            key: left if value is None else min(value, left)
+            for key, value in timeouts.items()
+        }
+        try:
+            async with asyncio.timeout(left):
+                return await self._transport.handle_async_request(request)
+        except TimeoutError as e:
+            raise DeadlineExceededError(
+                f"Deadline passed while requesting {request.url}"
+            ) from e
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def create_transport(
+    limits: httpx.Limits,
+    http2: bool = False,
+    max_streams: int | None = None,
+    validators: ValidatorStore | None = None,
+    cache: ResponseCache | None = None,
+    cache_ttl: float | None = None,
+    memory_cache: MemoryResponseCache | None = None,
+    rate_limit: float | None = None,
+    rate_burst: int | None = None,
+    adaptive_ceiling: int | None = None,
+    hedge_percentile: float | None = None,
+    hedge_budget: float = DEFAULT_HEDGE_BUDGET,
+    share_key: str | None = None,
+) -> httpx.AsyncBaseTransport:
+    """Create the transport used by pooled clients and engine sessions.
+
+    Responses are always decoded by a `CompressionTransport`, which negotiates the
+    best available content-encoding and records wire / decoded sizes per domain, and
+    identical concurrent GET requests made through the transport, or any other
+    transport created with the same arguments, are always coalesced (see
+    `v2.client.singleflight`). Inside `v2.client.recording` or
+    `v2.client.replaying`, network traffic is recorded or replayed. Within a run
+    deadline (see `deadlines`), requests are kept to the time left.
+
+    Args:
+        limits (httpx.Limits): Connection and keep-alive limits.
+        http2 (bool, optional): Opt in to HTTP/2. The protocol is negotiated with the
+            server, so hosts without HTTP/2 support (and plain http urls) fall back to
+            HTTP/1.1. If the h2 package isn't installed, HTTP/1.1 is always used.
+            Defaults to False.
+        max_streams (int | None, optional): Maximum concurrent requests in flight
+            through the transport. Defaults to None, i.e. only bounded by <limits>
+            and the server's own HTTP/2 stream limit.
+        validators (ValidatorStore | None, optional): If given, GET requests are made
+            conditional on the stored ETag / Last-Modified validators. Defaults to
+            None.
+        cache (ResponseCache | None, optional): If given, GET requests are served from
+            this on-disk response cache while fresh. Defaults to None.
+        cache_ttl (float | None, optional): Overrides the cache's per-domain TTL.
+            Defaults to None.
+        memory_cache (MemoryResponseCache | None, optional): If given, GET requests
+            are served from this in-memory cache, in front of <cache>. Defaults to
+            None.
+        rate_limit (float | None, optional): Requests per second allowed to each domain
+            requested through the transport, shared process-wide with every other
+            transport hitting that domain. Requests always go through the global
+            limiter, so domains configured elsewhere are limited regardless. Defaults
+            to None.
+        rate_burst (int | None, optional): Burst size of <rate_limit>. Defaults to
+            None, i.e. the rate rounded down.
+        adaptive_ceiling (int | None, optional): If given, the concurrency to each
+            domain is controlled adaptively (see `v2.client.adaptive`) up to this
+            ceiling. Defaults to None.
+        hedge_percentile (float | None, optional): If given, GET requests still
+            waiting this percentile of their domain's recent latencies after being
+            sent (past the rate limit and concurrency controls) are hedged with a
+            duplicate request (see `v2.client.hedging`). Defaults to None.
+        hedge_budget (float, optional): Maximum hedged requests as a share of each
+            domain's requests. Defaults to 0.05.
+        share_key (str | None, optional): If given, the connection pool is shared
+            process-wide with every other transport created with the same key and
+            limits, and outlives this transport, so its warm connections can be
+            reused by later sessions (see `v2.client.connections`). Defaults to None.
+
+    Returns:
+        httpx.AsyncBaseTransport: The transport.
+    """
+    if http2 and not http2_available():
+        logger.warning(
+            "http2 requested but the h2 package is not installed. Falling back to HTTP/1.1"
+        )
+        http2 = False
+    recording = current_recording_session()
+    transport: httpx.AsyncBaseTransport
+    if recording is not None and recording.mode == RecordingMode.REPLAY:
+        transport = network = ReplayTransport(
+            recording.cassette, latency=recording.latency
+        )
+    else:
+        transport = network = (
+            get_shared_http_transport(share_key, limits, http2=http2)
+            if share_key
+            else create_http_transport(limits, http2=http2)
+        )
+        # innermost, so only bytes that actually came over the network are counted
+        transport = CompressionTransport(transport)
+        if recording is not None:
+            transport = RecordTransport(transport, recording.cassette)
+    if hedge_percentile:
+        # below the limits, so requests are timed from when they're actually sent
+        transport = SendTimingTransport(transport)
+    if max_streams:
+        transport = StreamLimitTransport(transport, max_streams)
+    if adaptive_ceiling:
+        transport = AdaptiveConcurrencyTransport(transport, adaptive_ceiling)
+    # cache hits never reach the network, so they don't spend rate limit tokens
+    transport = RateLimitTransport(transport, rate=rate_limit, burst=rate_burst)
+    if hedge_percentile:
+        # above the rate limiter and concurrency controls, so hedges are subject to
+        # them too. The hedge timer only starts once the request is past them
+        transport = HedgingTransport(
+            transport,
+            percentile=hedge_percentile,
+            budget=hedge_budget,
+            timed_from_send=True,
+        )
+    if validators is not None:
+        transport = ConditionalTransport(transport, validators)
+    if cache is not None:
+        transport = CacheTransport(transport, cache, ttl=cache_ttl)
+    if memory_cache is not None:
+        transport = CacheTransport(transport, memory_cache)
+    # so concurrent misses of the same page fill the cache once. Requests are shared
+    # with every stack configured like this one, whose callers go through the same
+    # layers. Stores, caches and recordings are told apart by identity: each stack
+    # keeps them alive, so their ids aren't reused while its group is
+    group = get_singleflight_group(
+        (
+            share_key,
+            limits.max_connections,
+            limits.max_keepalive_connections,
+            limits.keepalive_expiry,
+            http2,
+            max_streams,
+            id(validators) if validators is not None else None,
+            id(cache) if cache is not None else None,
+            cache_ttl,
+            id(memory_cache) if memory_cache is not None else None,
+            rate_limit,
+            rate_burst,
+            adaptive_ceiling,
+            hedge_percentile,
+            hedge_budget,
+            id(recording.cassette) if recording is not None else None,
+        )
+    )
+    transport = SingleflightTransport(transport, group=group)
+    # prewarming only opens connections, it doesn't spend tokens or slots
+    transport = PrewarmTransport(transport, network)
+    # outermost, so a caller out of time stops waiting on a coalesced request
+    # without cancelling it for the others
+    return DeadlineTransport(transport)
@@ -5,12 +5,21 @@ https://github.com/encode/httpx/issues/108#issuecomment-1434439481
 
 import asyncio
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import Enum
 from http import HTTPStatus
 from typing import Any, Awaitable, Callable, Mapping, Union
 
 import httpx
 
+from deadlines import remaining
+from exceptions import BaseException
+
+from .helpers import get_domain
+from .httplog import HttpEvent, log_http_event, should_sample_body
+
 logger = logging.getLogger(__name__)
 
 RETRYABLE_STATUS_CODES = frozenset(
@@ -27,60 +36,204 @@ RETRYABLE_STATUS_CODES = frozenset(
 def log_and_raise_if_non_200(func: Callable[[Any], Awaitable[httpx.Response]]):
     async def wrapper(*args, **kwargs):
         response = await func(*args, **kwargs)
-        # log request/response information
-        response.request.read()
-        logger.debug(
-            f"{response.request.method} {response.request.url} returned {response.status_code}. {response.elapsed} elapsed. |\n"  # noqa
-            + f"REQ HEADERS: {response.request.headers} |\n"
-            + f"REQ BODY: {response.request.content} |\n"
-            + f"RESP HEADERS: {response.headers} |\n"
-            + f"RESPONSE: {response.text}"
-        )
+        # log request/response information. Rendered lazily, bodies are sampled
+        log_http_event(logger, response)
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            # answer to a conditional request, the caller decides what to do with it
+            return response
         try:
             response.raise_for_status()
         except httpx.HTTPStatusError as e:
             logger.error(
-                f"Error making {response.request.method} request to {response.request.url}: {response.status_code}"  # noqa
+                "Error making %s request to %s: %s",
+                response.request.method,
+                response.request.url,
+                response.status_code,
+                extra={"http_event": HttpEvent(response, should_sample_body(response))},
             )
+            # a streamed response would otherwise hold on to its connection
+            await response.aclose()
             raise e
         return response
 
     return wrapper
 
 
+class CircuitOpenError(BaseException):
+    """Raised instead of making a request to a host whose circuit is open."""
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """A per-host circuit breaker.
+
+    The circuit opens after <failure_threshold> consecutive failed requests (retryable
+    status codes or transport errors) to the host. While open, every request to the
+    host fails fast with `CircuitOpenError`, and requests sleeping between retries are
+    woken up to fail too. After <recovery_timeout> seconds the circuit is half-open: a
+    single probe request is let through, which closes the circuit on success and
+    re-opens it on failure.
+
+    Args:
+        host (str): The host this breaker guards.
+        failure_threshold (int, optional): Consecutive failures before opening.
+            Defaults to 5.
+        recovery_timeout (float, optional): Seconds to stay open before probing.
+            Defaults to 30.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_started_at: float | None = None
+        # set while the circuit is open. Events are bound to the loop they're awaited
+        # in, so each loop gets its own (e.g. between asyncio.run calls)
+        self._opened: tuple[asyncio.AbstractEventLoop, asyncio.Event] | None = None
+
+    def _opened_event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._opened is None or self._opened[0] is not loop:
+            event = asyncio.Event()
+            if self.opened_at is not None:
+                event.set()
+            self._opened = (loop, event)
+        return self._opened[1]
+
+    @property
+    def state(self) -> CircuitState:
+        if self.opened_at is None:
+            return CircuitState.CLOSED
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return CircuitState.HALF_OPEN
+        return CircuitState.OPEN
+
+    def before_request(self):
+        """Raises `CircuitOpenError` if a request to the host may not be made now."""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return
+        # a probe that never reported back (e.g. it was cancelled) doesn't block the
+        # next one forever
+        probe_in_flight = (
+            self._probe_started_at is not None
+            and time.monotonic() - self._probe_started_at < self.recovery_timeout
+        )
+        if state == CircuitState.HALF_OPEN and not probe_in_flight:
+            logger.info(f"{self.host};circuit half-open. probing...")
+            self._probe_started_at = time.monotonic()
+            return
+        raise CircuitOpenError(f"Circuit open for {self.host}. Not making request.")
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"{self.host};circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started_at = None
+        if self._opened is not None:
+            self._opened[1].clear()
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probe_started_at is not None or (
+            self.opened_at is None and self.failures >= self.failure_threshold
+        ):
+            logger.warning(
+                f"{self.host};circuit opened after {self.failures} consecutive failures"
+            )
+            self.opened_at = time.monotonic()
+            self._probe_started_at = None
+            if self._opened is not None:
+                self._opened[1].set()
+
+    async def sleep(self, seconds: float):
+        """Sleep for <seconds>, returning early if the circuit opens."""
+        try:
+            await asyncio.wait_for(self._opened_event().wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(url: str, **kwargs) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for the host of <url>."""
+    host = get_domain(url)
+    if host not in _circuit_breakers:
+        _circuit_breakers[host] = CircuitBreaker(host, **kwargs)
+    return _circuit_breakers[host]
+
+
 def retry_on_failed_request(
     max_attempts: int = 3,
     max_backoff_wait: float = 30,
     backoff_factor: float = 0.1,
 ):
-    """Decorator to retry a request if it fails.
+    """Decorator to retry a request if it fails. Waits for the response's Retry-After
+    header if it has one, otherwise backs off exponentially. Every attempt goes
+    through the circuit breaker of the request's host, so a degraded host fails fast
+    rather than being retried. A retry that would start after the run deadline (see
+    `deadlines`) isn't made: the last response is returned instead.
+
+    The wrapped function must take the request url as its first argument.
 
     Args:
-        max_attempts (int, optional): _description_. Defaults to 3.
-        max_backoff_wait (float, optional): _description_. Defaults to 30.
-        backoff_factor (float, optional): _description_. Defaults to 0.1.
+        max_attempts (int, optional): Retries after the first attempt. Defaults to 3.
+        max_backoff_wait (float, optional): Maximum seconds to wait between attempts.
+            Defaults to 30.
+        backoff_factor (float, optional): Base of the exponential backoff. Defaults
+            to 0.1.
     """
 
     def wrap(fn: Callable[..., Awaitable[httpx.Response]]):
-        async def wrapper(*args, **kwargs):
+        async def wrapper(url: str, *args, **kwargs):
+            breaker = get_circuit_breaker(url)
             remaining_attempts = max_attempts
             attempts_made = 0
+            wait = 0.0
             while True:
                 if attempts_made > 0:
-                    await asyncio.sleep(
-                        _calculate_sleep(
-                            attempts_made,
-                            {},
-                            max_backoff_wait,
-                            backoff_factor,
-                        )
+                    await breaker.sleep(wait)
+                breaker.before_request()
+                try:
+                    response = await fn(url, *args, **kwargs)
+                except httpx.TransportError:
+                    breaker.record_failure()
+                    raise
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if remaining_attempts < 1:
+                    return response
+                wait = _calculate_sleep(
+                    attempts_made + 1,
+                    response.headers,
+                    max_backoff_wait,
+                    backoff_factor,
+                )
+                time_left = remaining()
+                if time_left is not None and wait >= time_left:
+                    # the retry couldn't finish in time anyway
+                    logger.warning(
+                        f"Not retrying {response.request.method} request to {response.url}. Run deadline passes in {time_left:.1f}s"  # noqa
                     )
-                response = await fn(*args, **kwargs)
-                if (
-                    remaining_attempts < 1
-                    or response.status_code not in RETRYABLE_STATUS_CODES
-                ):
                     return response
+                await response.aclose()
                 attempts_made += 1
                 remaining_attempts -= 1
                 logger.warning(
@@ -112,15 +265,16 @@ def _calculate_sleep(
     retry_after_header = (headers.get("Retry-After") or "").strip()
     if retry_after_header:
         if retry_after_header.isdigit():
-            return float(retry_after_header)
+            return min(float(retry_after_header), max_backoff_wait)
         try:
-            parsed_date = datetime.fromisoformat(
-                retry_after_header
-            ).astimezone()  # converts to local time
-            diff = (parsed_date - datetime.now().astimezone()).total_seconds()
+            # an HTTP-date, e.g. "Wed, 21 Oct 2015 07:28:00 GMT"
+            parsed_date = parsedate_to_datetime(retry_after_header)
+            if parsed_date.tzinfo is None:
+                parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+            diff = (parsed_date - datetime.now(timezone.utc)).total_seconds()
             if diff > 0:
                 return min(diff, max_backoff_wait)
-        except ValueError:
+        except (TypeError, ValueError):
             pass
     backoff = backoff_factor * (2 ** (attempts_made - 1))
     return min(backoff, max_backoff_wait)
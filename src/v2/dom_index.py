@@ -0,0 +1,313 @@
+"""A flattened, array-backed index of a page's elements.
+
+Walking BeautifulSoup `Tag` objects costs a Python object per element and a method call
+per step. For high-volume parsing, a page can instead be indexed once into NumPy arrays
+with one row per element, in document order:
+
+- `tag`: the tag name, as an id into `names`.
+- `parent`: the row of the parent element (-1 for top-level elements).
+- `depth`: the nesting depth (0 for top-level elements).
+- `path`: the path from the root (e.g. body/div/a), as an id. Elements matching a
+  trace are those whose path id is the trace's, so trace matching is an array lookup.
+- `end`: the row after the element's last descendant. An element's subtree is the
+  rows [i, end[i]).
+- `attr_start` / `attr_stop` and `text_start` / `text_stop`: offsets into the flat
+  attribute and text lists.
+
+Ancestor queries (e.g. "is the anchor within 5 levels of an <li>?") climb the parent
+array for every element at once, so heuristics are evaluated for all anchors in bulk.
+
+`DomIndex.from_soup` indexes a parsed tree, whatever its parser. `DomIndex.from_html`
+indexes a page straight from Python's html parser events, building the same tree as the
+"html.parser" backend without allocating any bs4 objects.
+"""
+
+from html.parser import HTMLParser
+from typing import Iterable
+
+import numpy as np
+from bs4 import CData, NavigableString, Tag
+from bs4.builder import HTMLTreeBuilder
+
+# mirror bs4's html tree builders
+VOID_ELEMENTS = HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+# elements whose strings get_text() leaves out
+NON_TEXT_ELEMENTS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+# attributes whose values are lists of tokens, e.g. class
+MULTI_VALUED_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+# the strings get_text() does include (comments, scripts etc. are subclasses)
+TEXT_STRING_TYPES = (NavigableString, CData)
+
+
+class _Builder:
+    """Accumulates rows in document order, from open / close / text events."""
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.name_ids: dict[str, int] = {}
+        self.paths: dict[tuple[int, int], int] = {}
+        self.tag: list[int] = []
+        self.parent: list[int] = []
+        self.depth: list[int] = []
+        self.path: list[int] = []
+        self.end: list[int] = []
+        self.attr_start: list[int] = []
+        self.attr_stop: list[int] = []
+        self.attr_names: list[int] = []
+        self.attr_values: list[str] = []
+        self.attr_multi: list[bool] = []
+        self.text_start: list[int] = []
+        self.text_stop: list[int] = []
+        self.texts: list[str] = []
+        self.elements: list[Tag] = []
+        self.open: list[int] = []
+
+    def name_id(self, name: str) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def start(self, name: str, attrs: Iterable[tuple[str, str, bool]]):
+        """Open a <name> element with (name, value, multi-valued) <attrs>."""
+        row = len(self.tag)
+        parent = self.open[-1] if self.open else -1
+        name_id = self.name_id(name)
+        parent_path = self.path[parent] if parent >= 0 else -1
+        path = self.paths.setdefault((parent_path, name_id), len(self.paths))
+        self.tag.append(name_id)
+        self.parent.append(parent)
+        self.depth.append(len(self.open))
+        self.path.append(path)
+        self.end.append(row + 1)
+        self.attr_start.append(len(self.attr_values))
+        for key, value, multi in attrs:
+            self.attr_names.append(self.name_id(key))
+            self.attr_values.append(value)
+            self.attr_multi.append(multi)
+        self.attr_stop.append(len(self.attr_values))
+        self.text_start.append(len(self.texts))
+        self.text_stop.append(len(self.texts))
+        self.open.append(row)
+
+    def close(self):
+        row = self.open.pop()
+        self.end[row] = len(self.tag)
+        self.text_stop[row] = len(self.texts)
+
+    def text(self, data: str):
+        if self.open and self.names[self.tag[self.open[-1]]] in NON_TEXT_ELEMENTS:
+            return
+        self.texts.append(data)
+
+
+class _IndexingParser(HTMLParser):
+    """Feeds html.parser events to a `_Builder`, nesting elements like bs4's
+    html.parser tree builder: void elements are never opened, and an end tag closes
+    the most recent open element of its name (or nothing, if there is none)."""
+
+    def __init__(self, builder: _Builder):
+        super().__init__(convert_charrefs=True)
+        self.builder = builder
+
+    def _attrs(self, tag: str, attrs: list[tuple[str, str | None]]):
+        multi = MULTI_VALUED_ATTRIBUTES["*"] | MULTI_VALUED_ATTRIBUTES.get(tag, set())
+        return [(key, value or "", key in multi) for key, value in attrs]
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, self._attrs(tag, attrs))
+        if tag in VOID_ELEMENTS:
+            self.builder.close()
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.start(tag, self._attrs(tag, attrs))
+        self.builder.close()
+
+    def handle_endtag(self, tag):
+        open_ = self.builder.open
+        names = self.builder.names
+        for position in range(len(open_) - 1, -1, -1):
+            if names[self.builder.tag[open_[position]]] == tag:
+                while len(open_) > position:
+                    self.builder.close()
+                return
+
+    def handle_data(self, data):
+        self.builder.text(data)
+
+
+class DomIndex:
+    """The elements of a page, flattened into arrays (see the module docstring). Build
+    one with `DomIndex.from_soup` or `DomIndex.from_html`."""
+
+    def __init__(self, builder: _Builder):
+        while builder.open:
+            builder.close()
+        self.names = builder.names
+        self._name_ids = builder.name_ids
+        self._paths = builder.paths
+        self.tag = np.array(builder.tag, dtype=np.int32)
+        self.parent = np.array(builder.parent, dtype=np.int32)
+        self.depth = np.array(builder.depth, dtype=np.int32)
+        self.path = np.array(builder.path, dtype=np.int32)
+        self.end = np.array(builder.end, dtype=np.int32)
+        self.attr_start = np.array(builder.attr_start, dtype=np.int32)
+        self.attr_stop = np.array(builder.attr_stop, dtype=np.int32)
+        self.attr_names = np.array(builder.attr_names, dtype=np.int32)
+        self.attr_values = builder.attr_values
+        self.attr_multi = builder.attr_multi
+        self.text_start = np.array(builder.text_start, dtype=np.int32)
+        self.text_stop = np.array(builder.text_stop, dtype=np.int32)
+        self.texts = builder.texts
+        # the bs4 elements of the rows, when indexed from a soup
+        self.elements: list[Tag] | None = builder.elements or None
+
+    def __len__(self) -> int:
+        return len(self.tag)
+
+    @classmethod
+    def from_soup(cls, root: Tag) -> "DomIndex":
+        """Index the elements under <root> (e.g. a BeautifulSoup object or its body).
+        Paths are relative to <root>, like the traces of `v2.html_parser`."""
+        builder = _Builder()
+        # (node, entering) pairs: elements are closed once their children are done
+        stack: list[tuple[Tag | NavigableString, bool]] = [
+            (child, True) for child in reversed(root.contents)
+        ]
+        while stack:
+            node, entering = stack.pop()
+            if not entering:
+                builder.close()
+            elif isinstance(node, Tag):
+                builder.start(
+                    node.name,
+                    [
+                        (key, " ".join(value), True)
+                        if isinstance(value, list)
+                        else (key, value, False)
+                        for key, value in node.attrs.items()
+                    ],
+                )
+                builder.elements.append(node)
+                stack.append((node, False))
+                stack.extend((child, True) for child in reversed(node.contents))
+            elif type(node) in TEXT_STRING_TYPES:
+                builder.text(str(node))
+        return cls(builder)
+
+    @classmethod
+    def from_html(cls, html: str) -> "DomIndex":
+        """Index <html> straight from the parser, without building a bs4 tree. The
+        rows are those of the tree the "html.parser" backend builds."""
+        builder = _Builder()
+        parser = _IndexingParser(builder)
+        parser.feed(html)
+        parser.close()
+        return cls(builder)
+
+    # lookups
+
+    def name_id(self, name: str) -> int:
+        """The id of tag or attribute <name>, or -1 if the page doesn't have one."""
+        return self._name_ids.get(name, -1)
+
+    def name_ids(self, names: Iterable[str]) -> np.ndarray:
+        return np.array(
+            [self._name_ids[name] for name in names if name in self._name_ids],
+            dtype=np.int32,
+        )
+
+    def find_all(self, name: str) -> np.ndarray:
+        """The rows of every <name> element, in document order."""
+        return np.flatnonzero(self.tag == self.name_id(name))
+
+    def path_id(self, trace: list[str]) -> int:
+        """The path id of <trace>, or -1 if no element has that path."""
+        path = -1
+        for name in trace:
+            path = self._paths.get((path, self.name_id(name)), -2)
+            if path < 0:
+                return -1
+        return path
+
+    def match_trace(self, trace: list[str]) -> np.ndarray:
+        """The rows of the elements whose path from the root is <trace>."""
+        path = self.path_id(trace)
+        if path < 0:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.path == path)
+
+    def match_traces(self, traces: list[list[str]]) -> list[np.ndarray]:
+        """The rows matched by each of <traces>."""
+        return [self.match_trace(trace) for trace in traces]
+
+    def get(self, row: int, attribute: str, default: str | None = None) -> str | None:
+        name_id = self.name_id(attribute)
+        start, stop = self.attr_start[row], self.attr_stop[row]
+        for position in range(start, stop):
+            if self.attr_names[position] == name_id:
+                return self.attr_values[position]
+        return default
+
+    def attrs(self, row: int) -> dict[str, str]:
+        start, stop = self.attr_start[row], self.attr_stop[row]
+        return {
+            self.names[self.attr_names[position]]: self.attr_values[position]
+            for position in range(start, stop)
+        }
+
+    def text(self, row: int) -> str:
+        """The text of the element and its descendants, like `Tag.get_text()`."""
+        return "".join(self.texts[self.text_start[row] : self.text_stop[row]])
+
+    def element(self, row: int) -> Tag:
+        if self.elements is None:
+            raise ValueError("Only indices built with from_soup have elements.")
+        return self.elements[row]
+
+    # bulk queries, over many rows at once
+
+    def within(
+        self, rows: np.ndarray, mask: np.ndarray, max_depth: int
+    ) -> np.ndarray:
+        """For each of <rows>: whether the element itself or one of its ancestors up to
+        <max_depth> levels above it is set in the per-row <mask>."""
+        rows = np.asarray(rows)
+        found = np.zeros(len(rows), dtype=bool)
+        current = rows.copy()
+        for _ in range(max_depth + 1):
+            alive = current >= 0
+            found[alive] |= mask[current[alive]]
+            current = np.where(alive, self.parent[np.maximum(current, 0)], -1)
+            if not (current >= 0).any():
+                break
+        return found
+
+    def inside_tag(self, rows: np.ndarray, names: Iterable[str], max_depth: int):
+        """For each of <rows>: whether it is a <names> element or within <max_depth>
+        levels below one."""
+        return self.within(rows, np.isin(self.tag, self.name_ids(names)), max_depth)
+
+    def attribute_contains(self, keyword: str) -> np.ndarray:
+        """Per row: whether any attribute value of the element contains <keyword>.
+        Like `keyword in tag.attrs[name]`, values that are lists of tokens (e.g.
+        class) must contain <keyword> as a whole token."""
+        has_keyword = np.fromiter(
+            (
+                keyword in (value.split() if multi else value)
+                for value, multi in zip(self.attr_values, self.attr_multi)
+            ),
+            dtype=bool,
+            count=len(self.attr_values),
+        )
+        # count matching attributes per element: cumulative sums over the flat list
+        counts = np.concatenate([[0], np.cumsum(has_keyword)])
+        return counts[self.attr_stop] > counts[self.attr_start]
+
+    def has_child(self, mask: np.ndarray) -> np.ndarray:
+        """Per row: whether any child element of the element is set in <mask>."""
+        result = np.zeros(len(self), dtype=bool)
+        children = np.flatnonzero(mask & (self.parent >= 0))
+        result[self.parent[children]] = True
+        return result
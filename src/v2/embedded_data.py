@@ -0,0 +1,254 @@
+"""Structured data embedded in a page, read straight from its raw bytes.
+
+Most news pages embed what a scraper is after as JSON, in <script> elements:
+
+- JSON-LD (`<script type="application/ld+json">`): schema.org metadata such as the
+  headline, authors and publication dates.
+- `__NEXT_DATA__` (`<script id="__NEXT_DATA__" type="application/json">`): the props of
+  a Next.js page.
+- Client state assigned to a global, e.g. `window.__APOLLO_STATE__ = {...}` (Apollo)
+  or `window.__PRELOADED_STATE__ = {...}` (Redux).
+
+`extract_embedded` finds these scripts with a couple of regular expressions over the
+raw body and decodes each one in place, through a memoryview, without building a DOM
+or copying the page (pages in another encoding than utf-8 are re-encoded first). JSON is decoded with orjson when it is installed, and the standard
+library otherwise.
+"""
+
+import codecs
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_LD_TYPE = b"application/ld+json"
+NEXT_DATA_ID = b"__NEXT_DATA__"
+# globals that pages assign their client state to
+STATE_VARIABLES = (
+    "__APOLLO_STATE__",
+    "__PRELOADED_STATE__",
+    "__INITIAL_STATE__",
+    "__REDUX_STATE__",
+)
+# schema.org types of the JSON-LD object describing an article
+ARTICLE_TYPES = frozenset(
+    [
+        "Article",
+        "NewsArticle",
+        "ReportageNewsArticle",
+        "AnalysisNewsArticle",
+        "OpinionNewsArticle",
+        "LiveBlogPosting",
+        "BlogPosting",
+        "VideoObject",
+    ]
+)
+
+_SCRIPT = re.compile(rb"<script\b([^>]*)>", re.IGNORECASE)
+_SCRIPT_END = re.compile(rb"</script\s*>", re.IGNORECASE)
+# the attribute itself, not e.g. data-type
+_TYPE = re.compile(rb"""(?:^|\s)type\s*=\s*["']?\s*([^"'\s>]+)""", re.IGNORECASE)
+_ID = re.compile(rb"""(?:^|\s)id\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+_STATE = re.compile(
+    rb"(?:window\.)?("
+    + b"|".join(name.encode() for name in STATE_VARIABLES)
+    + rb")\s*=\s*"
+)
+_JSON_DECODER = json.JSONDecoder()
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    """Decode JSON with orjson, if installed. <data> may be a memoryview into a larger
+    buffer, which orjson decodes without copying it."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _strip(view: memoryview) -> memoryview:
+    """<view> without surrounding whitespace, and a trailing semicolon."""
+    start, stop = 0, len(view)
+    while start < stop and view[start] in b" \t\r\n":
+        start += 1
+    while stop > start and view[stop - 1] in b" \t\r\n;":
+        stop -= 1
+    return view[start:stop]
+
+
+def _scripts(html: bytes) -> Iterator[tuple[bytes, int, int]]:
+    """Yields the attributes of each <script> and the start and end offsets of its
+    contents."""
+    position = 0
+    while True:
+        script = _SCRIPT.search(html, position)
+        if script is None:
+            return
+        end = _SCRIPT_END.search(html, script.end())
+        stop = end.start() if end else len(html)
+        yield script.group(1), script.end(), stop
+        position = end.end() if end else stop
+
+
+def _decode_state(html: bytes, view: memoryview, start: int, stop: int) -> Any:
+    """Decode the value assigned at <start> in a script ending at <stop>. Usually the
+    assignment is the whole rest of the script, otherwise only the value is decoded."""
+    try:
+        return loads(_strip(view[start:stop]))
+    except ValueError:
+        pass
+    # more statements follow. Only the script is decoded, from the value onwards
+    text = html[start:stop].decode("utf-8", errors="replace")
+    value, _ = _JSON_DECODER.raw_decode(text, len(text) - len(text.lstrip()))
+    return value
+
+
+@dataclass
+class ArticleMetadata:
+    """What a page's JSON-LD says about its article.
+
+    Attributes:
+        headline (str | None): The headline.
+        authors (list[str]): The names of the authors.
+        date_published (str | None): When the article was published, as written,
+            falling back to the upload date of videos.
+        date_modified (str | None): When the article was last modified, as written,
+            falling back to the upload date of videos.
+        language (str | None): The article's language, e.g. "en".
+        keywords (list[str]): The keywords.
+        raw (dict): The JSON-LD object the metadata was read from.
+    """
+
+    headline: str | None = None
+    authors: list[str] = field(default_factory=list)
+    date_published: str | None = None
+    date_modified: str | None = None
+    language: str | None = None
+    keywords: list[str] = field(default_factory=list)
+    raw: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_json_ld(cls, obj: dict) -> "ArticleMetadata":
+        authors = obj.get("author") or []
+        if not isinstance(authors, list):
+            authors = [authors]
+        keywords = obj.get("keywords") or []
+        if isinstance(keywords, str):
+            keywords = [keyword.strip() for keyword in keywords.split(",")]
+        upload_date = obj.get("uploadDate")
+        return cls(
+            headline=obj.get("headline"),
+            authors=[
+                author if isinstance(author, str) else author["name"]
+                for author in authors
+                if isinstance(author, str)
+                or (isinstance(author, dict) and "name" in author)
+            ],
+            date_published=obj.get("datePublished", upload_date),
+            date_modified=obj.get("dateModified", upload_date),
+            language=obj.get("inLanguage"),
+            keywords=keywords,
+            raw=obj,
+        )
+
+
+@dataclass
+class EmbeddedData:
+    """The structured data embedded in a page.
+
+    Attributes:
+        json_ld (list): The decoded JSON-LD scripts, in document order.
+        next_data (dict | None): The decoded `__NEXT_DATA__`, if any.
+        state (dict[str, Any]): The decoded client state, by global (e.g.
+            "__APOLLO_STATE__").
+    """
+
+    json_ld: list = field(default_factory=list)
+    next_data: dict | None = None
+    state: dict[str, Any] = field(default_factory=dict)
+
+    def json_ld_objects(self) -> Iterator[dict]:
+        """The JSON-LD objects, including those in lists and in @graph, in document
+        order."""
+        objects = list(self.json_ld)
+        while objects:
+            obj = objects.pop(0)
+            if isinstance(obj, list):
+                objects[:0] = obj
+            elif isinstance(obj, dict):
+                yield obj
+                if isinstance(obj.get("@graph"), list):
+                    objects[:0] = obj["@graph"]
+
+    @property
+    def article(self) -> ArticleMetadata | None:
+        """The metadata of the first JSON-LD object describing an article, or of the
+        first JSON-LD object if none does. None if the page has no JSON-LD."""
+        first = None
+        for obj in self.json_ld_objects():
+            types = obj.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if ARTICLE_TYPES.intersection(types):
+                return ArticleMetadata.from_json_ld(obj)
+            first = first or obj
+        return ArticleMetadata.from_json_ld(first) if first is not None else None
+
+    @property
+    def page_props(self) -> dict | None:
+        """The page props of a Next.js page."""
+        if not self.next_data:
+            return None
+        return self.next_data.get("props", {}).get("pageProps")
+
+
+def _is_utf8(encoding: str) -> bool:
+    try:
+        return codecs.lookup(encoding).name in ("utf-8", "ascii")
+    except LookupError:
+        return True
+
+
+def extract_embedded(html: bytes | str, encoding: str | None = None) -> EmbeddedData:
+    """Find and decode the JSON-LD, `__NEXT_DATA__` and client state in a page.
+    Scripts that aren't valid JSON are skipped.
+
+    Args:
+        html (bytes | str): The page, ideally its raw body, e.g. `response.content`.
+        encoding (str | None, optional): The encoding of a raw body, e.g.
+            `response.encoding`. Defaults to None, i.e. utf-8.
+
+    Returns:
+        EmbeddedData: What was found.
+    """
+    if isinstance(html, bytes) and encoding is not None and not _is_utf8(encoding):
+        html = html.decode(encoding, errors="replace")
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    view = memoryview(html)
+    data = EmbeddedData()
+    for attributes, start, stop in _scripts(html):
+        type_ = _TYPE.search(attributes)
+        type_ = type_.group(1).lower() if type_ else None
+        id_ = _ID.search(attributes)
+        try:
+            if type_ == JSON_LD_TYPE:
+                data.json_ld.append(loads(_strip(view[start:stop])))
+            elif id_ is not None and id_.group(1) == NEXT_DATA_ID:
+                data.next_data = loads(_strip(view[start:stop]))
+            elif type_ is None or b"javascript" in type_:
+                state = _STATE.search(html, start, stop)
+                if state is not None:
+                    name = state.group(1).decode()
+                    data.state[name] = _decode_state(html, view, state.end(), stop)
+        except ValueError:
+            logger.debug(f"skipping a script that isn't valid json at {start}")
+    return data
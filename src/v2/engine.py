@@ -1,12 +1,24 @@
 import functools
 import logging
-from typing import Awaitable
+from typing import AsyncContextManager, Awaitable
 
-import aiometer
+import pymongo
 from dotenv import load_dotenv
 from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
 
 from db import Db
+from deadlines import StageBudgets
+from v2.client import (
+    ClientPool,
+    client_pool,
+    concurrency_controllers,
+    get_response_cache,
+    get_validator_store,
+    hedging,
+    prewarm,
+    staged_run,
+)
 from v2.client.helpers import get_domain
 from v2.models.article import Article
 from v2.scraper import Scraper
@@ -25,6 +37,20 @@ class Engine:
         db_uri: str | None = None,
         db_must_connect: bool = False,
         debug: bool = False,
+        http2: bool = False,
+        max_streams: int | None = None,
+        conditional_get: bool = False,
+        response_cache: bool = False,
+        response_cache_ttl: float | None = None,
+        rate_limit: float | None = None,
+        rate_burst: int | None = None,
+        adaptive: bool = False,
+        hedge_percentile: float | None = None,
+        hedge_budget: float = 0.05,
+        list_timeout: float | None = None,
+        articles_timeout: float | None = None,
+        persist_timeout: float | None = None,
+        head_only: bool = False,
     ):
         if debug:
             logging.basicConfig(level=logging.DEBUG)
@@ -32,16 +58,67 @@ class Engine:
         self.url = url
         self.max_at_once = max_at_once
         self.max_per_second = max_per_second
+        self.http2 = http2
+        self.max_streams = max_streams
+        self.conditional_get = conditional_get
+        self.response_cache = response_cache
+        self.response_cache_ttl = response_cache_ttl
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.adaptive = adaptive
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.budgets = StageBudgets(list_timeout, articles_timeout, persist_timeout)
         logger.info(f"{self._name};initialising engine...")
         self._db = Db(db_uri, must_connect=db_must_connect)
         self.scraper: Scraper = Scraper(
             max_at_once=max_at_once,
             max_per_second=max_per_second,
+            head_only=head_only,
         )
 
+    def _client_pool(self) -> AsyncContextManager[ClientPool]:
+        return client_pool(
+            max_connections=self.max_at_once,
+            max_keepalive_connections=self.max_at_once,
+            http2=self.http2,
+            max_streams=self.max_streams,
+            validators=get_validator_store() if self.conditional_get else None,
+            cache=get_response_cache() if self.response_cache else None,
+            cache_ttl=self.response_cache_ttl,
+            rate_limit=self.rate_limit,
+            rate_burst=self.rate_burst,
+            adaptive=self.adaptive,
+            hedge_percentile=self.hedge_percentile,
+            hedge_budget=self.hedge_budget,
+        )
+
+    @property
+    def origins(self) -> list[str]:
+        return [self.url]
+
+    async def prewarm(self):
+        """Resolve and connect to the source ahead of the run. Pooled connections
+        outlive the pool, so run() starts on warm connections."""
+        async with self._client_pool() as pool:
+            await prewarm(pool.client_for(self.url), self.origins)
+
     async def run(self) -> Awaitable[list[Article]]:
-        articles = await self.scraper.run(self.url)
-        if not self._db.empty:
+        # keep one warm connection pool for the listing page and every article page
+        # validators are only stored once the articles are persisted
+        with staged_run() as validators:
+            async with self._client_pool():
+                articles = await self.scraper.run(self.url, budgets=self.budgets)
+        if self.adaptive:
+            logger.info(
+                f"{self._name};adaptive concurrency {concurrency_controllers.snapshot()}"
+            )
+        if self.hedge_percentile:
+            logger.info(f"{self._name};hedging {hedging.snapshot()}")
+        if not articles:
+            logger.info(f"{self._name};no new articles. skipping db update.")
+            validators.commit()
+        elif not self._db.empty:
             db_ops = [
                 UpdateOne(
                     {"url": article.url, "outlet": article.outlet},
@@ -50,11 +127,21 @@ class Engine:
                 )
                 for article in articles
             ]
-            write_result = self._db.get_collection("Article").bulk_write(db_ops)
+            try:
+                with pymongo.timeout(self.budgets.timeout("persist")):
+                    write_result = self._db.get_collection("Article").bulk_write(
+                        db_ops
+                    )
+            except PyMongoError as e:
+                if not e.timeout:
+                    raise
+                logger.warning(f"{self._name};ran out of time updating db: {e!r}")
+                return articles
             logger.info(
                 f"{self._name};updated {write_result.modified_count} articles. inserted {write_result.upserted_count} articles."
             )
             logger.debug(f"{self._name};{write_result}")
+            validators.commit()
         else:
             logger.info(f"{self._name};no db connection. skipping db update.")
         return articles
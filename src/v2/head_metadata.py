@@ -0,0 +1,216 @@
+"""Metadata from the <head> of a page, read without downloading the rest of it.
+
+News pages describe themselves in their <head>: the <title>, Open Graph (og:*) and
+Twitter card (twitter:*) meta tags, and schema.org JSON-LD. That is usually all a
+title-only run needs, and it is in the first few kilobytes of pages that are often
+hundreds of kilobytes long. `HeadExtractor` tokenizes a page as it streams in and
+reports when it is done: once the fields it needs have been found, or the head has
+ended. `read_head` stops reading the stream at that point, so closing the response
+aborts the rest of the download.
+"""
+
+import codecs
+import logging
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import AsyncIterator, Collection
+
+from v2.embedded_data import EmbeddedData, loads
+
+logger = logging.getLogger(__name__)
+
+# the elements allowed in a <head>. Any other element means the body has started
+HEAD_ELEMENTS = frozenset(
+    [
+        "html",
+        "head",
+        "title",
+        "meta",
+        "link",
+        "base",
+        "script",
+        "style",
+        "noscript",
+        "template",
+    ]
+)
+META_PREFIXES = ("og:", "twitter:")
+JSON_LD_TYPE = "application/ld+json"
+# elements whose contents may be anything, e.g. a tracking pixel's <img>
+OPAQUE_ELEMENTS = frozenset(["noscript", "template"])
+# the best source of an article title, found before the head ends
+TITLE_NEEDS = ("og:title",)
+
+
+@dataclass
+class HeadMetadata:
+    """The metadata found in a page's <head>.
+
+    Attributes:
+        title (str | None): The text of the <title>.
+        meta (dict[str, str]): The og:* and twitter:* meta tags, by property (or
+            name), e.g. {"og:title": "..."}. The first of each wins.
+        json_ld (list): The parsed JSON-LD scripts.
+        complete (bool): The whole head was read.
+    """
+
+    title: str | None = None
+    meta: dict[str, str] = field(default_factory=dict)
+    json_ld: list = field(default_factory=list)
+    complete: bool = False
+
+    def json_ld_values(self, key: str) -> list:
+        """The values of <key> in the JSON-LD objects, including those in lists and in
+        @graph, in document order."""
+        objects = EmbeddedData(json_ld=self.json_ld).json_ld_objects()
+        return [obj[key] for obj in objects if key in obj]
+
+    @property
+    def headline(self) -> str | None:
+        """The article's title: og:title, twitter:title, the JSON-LD headline or the
+        <title>, whichever comes first in that order."""
+        candidates = [
+            self.meta.get("og:title"),
+            self.meta.get("twitter:title"),
+            *self.json_ld_values("headline"),
+            self.title,
+        ]
+        for candidate in candidates:
+            if isinstance(candidate, str) and candidate.strip():
+                return candidate.strip()
+        return None
+
+    def has(self, name: str) -> bool:
+        """Whether the field <name> was found: "title", "json_ld", or a meta
+        property such as "og:title"."""
+        if name == "title":
+            return self.title is not None
+        if name == "json_ld":
+            return bool(self.json_ld)
+        return name in self.meta
+
+
+class HeadExtractor(HTMLParser):
+    """Reads the metadata of a page's <head> as the page is fed, chunk by chunk.
+
+    Args:
+        needs (Collection[str], optional): The fields that are needed (see
+            `HeadMetadata.has`). The extractor is done as soon as they are all found.
+            Defaults to (), i.e. the whole head is read.
+        encoding (str, optional): The encoding of bytes fed in. Defaults to "utf-8".
+    """
+
+    def __init__(self, needs: Collection[str] = (), encoding: str = "utf-8"):
+        super().__init__(convert_charrefs=True)
+        self.needs = tuple(needs)
+        self.metadata = HeadMetadata()
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        # the element whose text is being read: "title" or "script", if any
+        self._capturing: str | None = None
+        self._text: list[str] = []
+        # depth inside <noscript> and <template> elements
+        self._opaque = 0
+
+    @property
+    def done(self) -> bool:
+        return self.metadata.complete or (
+            bool(self.needs) and all(self.metadata.has(name) for name in self.needs)
+        )
+
+    def feed(self, data: str | bytes) -> bool:
+        """Tokenize the next chunk of the page.
+
+        Returns:
+            bool: Whether the extractor is done, i.e. the rest of the page isn't
+                needed.
+        """
+        if self.done:
+            return True
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        super().feed(data)
+        return self.done
+
+    def close(self):
+        """Finish the page. A page that ends within its head has no body."""
+        if not self.done:
+            super().feed(self._decoder.decode(b"", final=True))
+            super().close()
+        self.metadata.complete = True
+
+    def handle_starttag(self, tag, attrs):
+        if self.metadata.complete:
+            return
+        if tag in OPAQUE_ELEMENTS:
+            self._opaque += 1
+        if self._opaque:
+            return
+        if tag not in HEAD_ELEMENTS:
+            self.metadata.complete = True
+            return
+        attributes = {key: value or "" for key, value in attrs}
+        if tag == "meta":
+            key = attributes.get("property") or attributes.get("name") or ""
+            if key.startswith(META_PREFIXES) and "content" in attributes:
+                self.metadata.meta.setdefault(key, attributes["content"])
+        elif tag == "title" or (
+            tag == "script" and attributes.get("type", "").strip() == JSON_LD_TYPE
+        ):
+            self._capturing = tag
+            self._text = []
+
+    def handle_startendtag(self, tag, attrs):
+        # a self-closed <noscript/> has no contents to skip
+        if tag not in OPAQUE_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in OPAQUE_ELEMENTS and self._opaque:
+            self._opaque -= 1
+        if tag == "head":
+            self.metadata.complete = True
+        if tag != self._capturing:
+            return
+        text = "".join(self._text)
+        self._capturing = None
+        self._text = []
+        if tag == "title":
+            if self.metadata.title is None:
+                self.metadata.title = text.strip()
+            return
+        try:
+            self.metadata.json_ld.append(loads(text))
+        except ValueError:
+            logger.debug("ignoring invalid JSON-LD")
+
+    def handle_data(self, data):
+        if self._capturing is not None:
+            self._text.append(data)
+
+
+async def read_head(
+    chunks: AsyncIterator[bytes],
+    encoding: str | None = None,
+    needs: Collection[str] = TITLE_NEEDS,
+) -> tuple[HeadMetadata, bytes]:
+    """Read a streamed page until the fields in <needs> are found in its head, or the
+    head ends. The rest of <chunks> is left unread, so the caller can either close the
+    response or carry on reading the page from the same iterator.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The body, e.g. `StreamedResponse.iter_bytes()`.
+        encoding (str | None, optional): The body's encoding. Defaults to utf-8.
+        needs (Collection[str], optional): The fields needed. Defaults to og:title.
+
+    Returns:
+        tuple[HeadMetadata, bytes]: The metadata found, and the bytes read to find it.
+    """
+    extractor = HeadExtractor(needs, encoding or "utf-8")
+    read = []
+    async for chunk in chunks:
+        read.append(chunk)
+        if extractor.feed(chunk):
+            break
+    else:
+        extractor.close()
+    return extractor.metadata, b"".join(read)
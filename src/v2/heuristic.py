@@ -1,5 +1,11 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
 from bs4 import BeautifulSoup, Tag
 
+from v2.anchor_stream import AnchorRecord
+from v2.dom_index import DomIndex
 from v2.soup_helpers import keep_only_interesting_paths
 
 AnchorTag = Tag
@@ -68,18 +74,154 @@ def has_neighbouring_heading_tag(anchor: Tag) -> bool:
     return False
 
 
+@dataclass
+class AnchorFeatures:
+    """The heuristic signals of every anchor on a page: a table with one row per
+    anchor, in document order. Each signal is a boolean column, so callers filter by
+    combining columns, e.g. `features.select(features.inside_article &
+    features.dot_html)`.
+
+    Attributes:
+        anchors (list[Tag] | list[AnchorRecord]): The anchors, or their records if the
+            table was built from a stream (see `from_records`).
+        hrefs (list[str | None]): Their hrefs.
+        article_in_attributes (np.ndarray): 'article' is in the attributes of the
+            anchor or its parent.
+        title_in_attributes (np.ndarray): 'title' is in the attributes of the anchor or
+            one of its two closest ancestors.
+        inside_article (np.ndarray): The anchor is at most 5 levels inside an
+            <article>.
+        inside_list (np.ndarray): The anchor is at most 5 levels inside an <li>.
+        neighbouring_heading (np.ndarray): The anchor has a heading child, or is at
+            most 2 levels inside a <h2> to <h5>.
+        dot_html (np.ndarray): The href ends with .html.
+    """
+
+    anchors: list[AnchorTag] | list[AnchorRecord]
+    hrefs: list[str | None]
+    article_in_attributes: np.ndarray
+    title_in_attributes: np.ndarray
+    inside_article: np.ndarray
+    inside_list: np.ndarray
+    neighbouring_heading: np.ndarray
+    dot_html: np.ndarray
+
+    SIGNALS = (
+        "article_in_attributes",
+        "title_in_attributes",
+        "inside_article",
+        "inside_list",
+        "neighbouring_heading",
+        "dot_html",
+    )
+
+    def __len__(self) -> int:
+        return len(self.anchors)
+
+    @classmethod
+    def from_records(cls, records: Iterable[AnchorRecord]) -> "AnchorFeatures":
+        """Computes the signals of streamed anchors (see `v2.anchor_stream`), from
+        their records alone. Records extracted with `allow=INTERESTING_TAGS, deny=(),
+        require="a"` get the signals `evaluate_anchors` gives the pruned page."""
+        records = list(records)
+        hrefs = [record.href for record in records]
+
+        def column(signal) -> np.ndarray:
+            return np.fromiter(map(signal, records), dtype=bool, count=len(records))
+
+        def contains(record: AnchorRecord, keyword: str, max_depth: int) -> bool:
+            return any(
+                ancestor.attribute_contains(keyword)
+                for ancestor in record.ancestors[-1 - max_depth :]
+            )
+
+        def inside(record: AnchorRecord, names: Iterable[str], max_depth: int) -> bool:
+            ancestors = record.ancestors[-1 - max_depth :]
+            return any(ancestor.name in names for ancestor in ancestors)
+
+        return cls(
+            anchors=records,
+            hrefs=hrefs,
+            article_in_attributes=column(lambda r: contains(r, "article", 1)),
+            title_in_attributes=column(lambda r: contains(r, "title", 2)),
+            inside_article=column(lambda r: inside(r, ["article"], 5)),
+            inside_list=column(lambda r: inside(r, ["li"], 5)),
+            neighbouring_heading=column(
+                lambda r: r.heading_child or inside(r, ["h5", "h4", "h3", "h2"], 2)
+            ),
+            dot_html=np.array(
+                [(href or "").endswith(".html") for href in hrefs], dtype=bool
+            ),
+        )
+
+    def select(self, mask: np.ndarray) -> list[AnchorTag]:
+        """The anchors of the rows set in <mask>."""
+        return [anchor for anchor, keep in zip(self.anchors, mask) if keep]
+
+    def rows(self) -> list[dict]:
+        """The table as one dict per anchor, e.g. to log or to hand to a model."""
+        return [
+            {
+                "href": href,
+                **{signal: bool(getattr(self, signal)[row]) for signal in self.SIGNALS},
+            }
+            for row, href in enumerate(self.hrefs)
+        ]
+
+
+def evaluate_anchors(soup: BeautifulSoup, prune: bool = True) -> AnchorFeatures:
+    """Computes every heuristic signal for every anchor in the body of <soup>.
+
+    The page is pruned once (see `keep_only_interesting_paths`) and indexed in a single
+    walk (see `v2.dom_index`). The signals are then evaluated for all anchors at once
+    against the index: each is a handful of array operations, rather than a walk up
+    the tree per anchor and per heuristic.
+
+    Args:
+        soup (BeautifulSoup): The page. Pruning modifies it.
+        prune (bool, optional): Prune the body to its interesting paths first.
+            Defaults to True.
+
+    Returns:
+        AnchorFeatures: The signals of each anchor.
+    """
+    body = soup.body
+    if prune:
+        keep_only_interesting_paths(body)
+    index = DomIndex.from_soup(soup)
+    body_row = next(row for row in index.find_all("body") if index.element(row) is body)
+    rows = index.find_all("a")
+    rows = rows[(rows > body_row) & (rows < index.end[body_row])]
+    hrefs = [index.get(row, "href") for row in rows]
+    # same rules as has_neighbouring_heading_tag
+    heading_like = np.isin(
+        index.tag, index.name_ids(name for name in index.names if name.startswith("h"))
+    )
+    return AnchorFeatures(
+        anchors=[index.element(row) for row in rows],
+        hrefs=hrefs,
+        article_in_attributes=index.within(
+            rows, index.attribute_contains("article"), max_depth=1
+        ),
+        title_in_attributes=index.within(
+            rows, index.attribute_contains("title"), max_depth=2
+        ),
+        inside_article=index.inside_tag(rows, ["article"], max_depth=5),
+        inside_list=index.inside_tag(rows, ["li"], max_depth=5),
+        neighbouring_heading=index.has_child(heading_like)[rows]
+        | index.inside_tag(rows, ["h5", "h4", "h3", "h2"], max_depth=2),
+        dot_html=np.array(
+            [(href or "").endswith(".html") for href in hrefs], dtype=bool
+        ),
+    )
+
+
 def heuristic_article_in_attributes(soup: BeautifulSoup) -> list[AnchorTag]:
     """Heuristic function that checks to see if there is some mention of 'article' in
     the <a> tag attributes, or in the attributes of any of its parents (up to a certain
     depth)."""
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if check_upward_keyword_in_tag(a, "article", max_depth=1):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.article_in_attributes)
 
 
 def heuristic_anchor_inside_article_tag(
@@ -89,14 +231,8 @@ def heuristic_anchor_inside_article_tag(
 
     As long as the <a> tag is not too deep inside the <article>.
     """
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if a_inside_tag(a, "article", max_depth=5):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.inside_article)
 
 
 def heuristic_anchor_inside_list_tag(soup: BeautifulSoup) -> list[AnchorTag]:
@@ -104,14 +240,8 @@ def heuristic_anchor_inside_list_tag(soup: BeautifulSoup) -> list[AnchorTag]:
 
     As long as the <a> tag is not too deep inside the <li>.
     """
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if a_inside_tag(a, "li", max_depth=5):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.inside_list)
 
 
 def heuristic_has_neighbouring_heading(
@@ -119,14 +249,8 @@ def heuristic_has_neighbouring_heading(
 ) -> list[AnchorTag]:
     """Heuristic that returns all <a> tags that are inside an <article> tag (up to depth
     5) and have a neighbouring <h*> tag."""
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if has_neighbouring_heading_tag(a):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.neighbouring_heading)
 
 
 def heuristic_dot_html(soup: BeautifulSoup) -> list[AnchorTag]:
@@ -134,11 +258,5 @@ def heuristic_dot_html(soup: BeautifulSoup) -> list[AnchorTag]:
 
     Returns the link if it does.
     """
-    body = soup.body
-    keep_only_interesting_paths(body)
-    a_tags = body.find_all("a")
-    article_links = []
-    for a in a_tags:
-        if a["href"].endswith(".html"):
-            article_links.append(a)
-    return article_links
+    features = evaluate_anchors(soup)
+    return features.select(features.dot_html)
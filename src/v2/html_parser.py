@@ -1,7 +1,11 @@
+from functools import lru_cache
 from hashlib import sha256
+from typing import Iterable, Iterator
 
 from bs4 import BeautifulSoup, Tag
 
+from v2.dom_index import DomIndex
+
 
 def get_text_trace(text: str, soup: BeautifulSoup) -> list[str]:
     """Generic trace to some textual content."""
@@ -14,16 +18,28 @@ def get_text_trace(text: str, soup: BeautifulSoup) -> list[str]:
 
 
 def get_unique_anchor_traces(
-    article_links: list[str], html: BeautifulSoup
+    article_links: list[str], html: BeautifulSoup | Iterable
 ) -> list[list[str]]:
-    """TODO: DOCS"""
+    """The unique traces of the first anchor to each of <article_links>. <html> is the
+    parsed page, or the records of its anchors streamed by `v2.anchor_stream`.
+
+    Traces are matched against streamed records when scraping (see `v2.scraper`), which
+    are nested like "html.parser" nests them. Recording them from the records too keeps
+    them matching whatever parser is configured."""
+    if not isinstance(html, Tag):
+        paths: dict[str, list[str]] = {}
+        for record in html:
+            paths.setdefault(record.href, list(record.path[::-1]))
     anchor_paths = []
     existing_path_hashes = []
     for link in article_links:
-        anchor = html.find("a", href=link)
-        if anchor is None:
+        if isinstance(html, Tag):
+            anchor = html.find("a", href=link)
+            anchor_trace = None if anchor is None else trace_tag_to_root(anchor)
+        else:
+            anchor_trace = paths.get(link)
+        if anchor_trace is None:
             continue
-        anchor_trace = trace_tag_to_root(anchor)
         hash = sha256(str(anchor_trace).encode("utf-8")).hexdigest()
         if hash not in existing_path_hashes:
             anchor_paths.append(anchor_trace[::-1])
@@ -52,6 +68,88 @@ def trace_tag_to_root(anchor: BeautifulSoup) -> list[str]:
     return trace
 
 
+class _TrieNode:
+    __slots__ = ("children", "traces")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        # indices of the traces that end here
+        self.traces: list[int] = []
+
+
+class TraceTrie:
+    """A set of traces compiled into a trie of their shared prefixes, so that every
+    trace is matched in a single walk of the DOM. Traces like those in
+    `v2.registry.article_links` mostly differ in their last few tags, so their long
+    common prefix is only walked once.
+
+    Args:
+        traces (list[list[str]]): The traces, each a list of tag names from the root
+            down, e.g. ["body", "div", "a"].
+    """
+
+    def __init__(self, traces: list[list[str]]):
+        self.traces = traces
+        self.root = _TrieNode()
+        for index, trace in enumerate(traces):
+            if not trace:
+                raise ValueError("A trace must contain at least one tag.")
+            node = self.root
+            for name in trace:
+                node = node.children.setdefault(name, _TrieNode())
+            node.traces.append(index)
+
+    def walk(self, root: Tag) -> Iterator[tuple[list[int], Tag]]:
+        """Yields the tags under <root> matched by a trace, with the indices of the
+        traces that match them. Tags at the same depth (e.g. all matches of one trace)
+        are yielded in document order."""
+        stack = [(root, self.root)]
+        while stack:
+            tag, node = stack.pop()
+            matched = []
+            for child in tag.children:
+                if not isinstance(child, Tag):
+                    continue
+                child_node = node.children.get(child.name)
+                if child_node is not None:
+                    matched.append((child, child_node))
+            # pushed in reverse, so the first child is walked first
+            for child, child_node in reversed(matched):
+                stack.append((child, child_node))
+            for child, child_node in matched:
+                if child_node.traces:
+                    yield child_node.traces, child
+
+    def match(self, path: Iterable[str]) -> list[int]:
+        """The indices of the traces that are exactly <path>, e.g. an
+        `AnchorRecord.path` from `v2.anchor_stream`."""
+        node = self.root
+        for name in path:
+            node = node.children.get(name)
+            if node is None:
+                return []
+        return node.traces
+
+    def find_all(self, root: Tag) -> list[list[Tag]]:
+        """The tags under <root> matched by each trace, in document order."""
+        matches: list[list[Tag]] = [[] for _ in self.traces]
+        for indices, tag in self.walk(root):
+            for index in indices:
+                matches[index].append(tag)
+        return matches
+
+
+@lru_cache(maxsize=256)
+def _compile_traces(traces: tuple[tuple[str, ...], ...]) -> TraceTrie:
+    return TraceTrie([list(trace) for trace in traces])
+
+
+def compile_traces(traces: list[list[str]]) -> TraceTrie:
+    """Compile <traces> into a `TraceTrie`. Compiled tries are cached, so each source's
+    traces are only compiled once."""
+    return _compile_traces(tuple(tuple(trace) for trace in traces))
+
+
 def find_text_from_trace(root: Tag, trace: list[str]) -> str:
     """Finds the tag that matches the trace.
 
@@ -68,28 +166,51 @@ def find_text_from_trace(root: Tag, trace: list[str]) -> str:
     return matched_tags[0].get_text()
 
 
-def find_text_from_traces(root: Tag, traces: list[list[str]]):
-    for trace in traces:
-        try:
-            return find_text_from_trace(root, trace)
-        except ValueError:
-            continue
-    raise ValueError("Text not found with any trace.")
-
-
-def find_anchor_tags_from_traces(root: Tag, traces: list[list[str]]) -> list[Tag]:
+def find_text_from_traces(root: Tag | DomIndex, traces: list[list[str]]):
+    """Finds the text of the first tag matched by the earliest trace in <traces> that
+    matches any tag. Every trace is matched in the same walk of the DOM, or looked up
+    in <root> if it is a `DomIndex`."""
+    if isinstance(root, DomIndex):
+        for rows in root.match_traces(traces):
+            if len(rows):
+                return root.text(rows[0])
+        raise ValueError("Text not found with any trace.")
+    best: Tag | None = None
+    best_index = len(traces)
+    for indices, tag in compile_traces(traces).walk(root):
+        index = min(indices)
+        if index < best_index:
+            best, best_index = tag, index
+            if index == 0:
+                # no earlier trace left to match
+                break
+    if best is None:
+        raise ValueError("Text not found with any trace.")
+    return best.get_text()
+
+
+def find_anchor_tags_from_traces(
+    root: Tag | DomIndex, traces: list[list[str]]
+) -> list[Tag]:
     """Finds the tags that match the anchor traces.
 
     Args:
-        soup: The HTML to search.
+        soup: The HTML to search, or its `DomIndex` (built with `DomIndex.from_soup`).
         anchor_traces: The anchor traces to match.
 
     Returns:
-        A list of anchor tags that match the anchor traces.
+        A list of anchor tags that match the anchor traces, grouped by trace.
     """
-    anchor_tags = []
     for trace in traces:
-        anchor_tags.extend(_find_anchor_tags_from_trace(root, trace))
+        if not trace or trace[-1] != "a":
+            raise ValueError("An anchor trace must end with an anchor tag.")
+    if isinstance(root, DomIndex):
+        return [
+            root.element(row) for rows in root.match_traces(traces) for row in rows
+        ]
+    anchor_tags = []
+    for matches in compile_traces(traces).find_all(root):
+        anchor_tags.extend(matches)
     return anchor_tags
 
 
@@ -102,28 +223,10 @@ def _find_anchor_tags_from_trace(root_tag: Tag, trace: list[str]):
         soup (BeautifulSoup): The HTML to search.
         trace (list[str]): The anchor traces to match.
     """
-    if len(trace) == 1 and trace[0] != "a":
-        raise ValueError("The trace must start with an anchor tag.")
-    elif len(trace) == 1:
-        return root_tag.find_all("a", recursive=False)
-    tags = []
-    current_tag, *trace = trace
-    candidates = root_tag.find_all(current_tag, recursive=False)
-    for c in candidates:
-        result = _find_anchor_tags_from_trace(c, trace)
-        tags.extend(result)
-    return tags
+    return find_anchor_tags_from_traces(root_tag, [trace])
 
 
 def _find_tag_from_trace(root_tag: Tag, trace: list[str], tag: str):
     if trace[-1] != tag:
         raise ValueError(f"The trace must end with the {tag} tag.")
-    if len(trace) == 1:
-        return root_tag.find_all(tag, recursive=False)
-    tags = []
-    current_tag, *trace = trace
-    candidates = root_tag.find_all(current_tag, recursive=False)
-    for c in candidates:
-        result = _find_tag_from_trace(c, trace, tag)
-        tags.extend(result)
-    return tags
+    return compile_traces([trace]).find_all(root_tag)[0]
@@ -0,0 +1,184 @@
+"""HTML parser backends.
+
+Every page is parsed into a BeautifulSoup tree, which trace matching
+(`v2.html_parser`), the heuristics and the scrapers work on. Which parser builds the
+tree is configurable, per deployment, with the SCRAPER_HTML_PARSER environment variable
+or `set_parser_backend`:
+
+- "html.parser": Python's own parser. Always available, and the slowest.
+- "lxml": libxml2, through BeautifulSoup's lxml tree builder.
+- "html5-parser": gumbo (spec-compliant parsing, like a browser), which builds the
+  BeautifulSoup tree in C.
+- "selectolax": lexbor (spec-compliant too), converted into a BeautifulSoup tree.
+
+A backend whose package isn't installed falls back to "html.parser". Backends repair
+broken markup differently, so traces should be matched with the backend they were
+recorded with.
+
+Run `python -m v2.parsers <html files>` to compare the parse throughput of the
+installed backends on your own pages.
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+logger = logging.getLogger(__name__)
+
+PARSER_ENV = "SCRAPER_HTML_PARSER"
+DEFAULT_BACKEND = "html.parser"
+
+
+def _parse_with_html_parser(html: str | bytes) -> BeautifulSoup:
+    return BeautifulSoup(html, "html.parser")
+
+
+def _parse_with_lxml(html: str | bytes) -> BeautifulSoup:
+    return BeautifulSoup(html, "lxml")
+
+
+def _parse_with_html5_parser(html: str | bytes) -> BeautifulSoup:
+    import html5_parser
+
+    return html5_parser.parse(html, treebuilder="soup")
+
+
+def _parse_with_selectolax(html: str | bytes) -> BeautifulSoup:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    soup = BeautifulSoup("", "html.parser")
+    if tree.root is None:
+        return soup
+    # iteratively, deeply nested pages would overflow the stack otherwise
+    stack: list[tuple[Tag, object]] = [(soup, tree.root)]
+    while stack:
+        parent, node = stack.pop()
+        if node.tag == "-text":
+            parent.append(NavigableString(node.text_content))
+        elif node.tag == "-comment":
+            parent.append(Comment(node.text_content or ""))
+        elif not node.tag.startswith(("-", "_", "!")):
+            tag = soup.new_tag(node.tag, attrs=dict(node.attributes))
+            parent.append(tag)
+            # pushed in reverse so they are appended in document order
+            children = list(node.iter(include_text=True))
+            stack.extend((tag, child) for child in reversed(children))
+    return soup
+
+
+# backend name -> (package it needs, parse function)
+BACKENDS: dict[str, tuple[str | None, Callable[[str | bytes], BeautifulSoup]]] = {
+    "html.parser": (None, _parse_with_html_parser),
+    "lxml": ("lxml", _parse_with_lxml),
+    "html5-parser": ("html5_parser", _parse_with_html5_parser),
+    "selectolax": ("selectolax", _parse_with_selectolax),
+}
+
+
+def available_backends() -> list[str]:
+    """The backends whose packages are installed."""
+    return [
+        name
+        for name, (package, _) in BACKENDS.items()
+        if package is None or importlib.util.find_spec(package) is not None
+    ]
+
+
+_backend: str | None = None
+
+
+def set_parser_backend(name: str | None):
+    """Parse pages with the <name> backend from now on. None goes back to the
+    SCRAPER_HTML_PARSER environment variable (or "html.parser")."""
+    global _backend
+    if name is not None and name not in BACKENDS:
+        raise ValueError(
+            f"Unknown html parser {name}. Choose one of {', '.join(BACKENDS)}"
+        )
+    _backend = name
+
+
+def get_parser_backend() -> str:
+    """The backend pages are parsed with."""
+    name = _backend or os.environ.get(PARSER_ENV) or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        logger.warning(f"Unknown html parser {name}. Falling back to {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    if name not in available_backends():
+        logger.warning(
+            f"html parser {name} is not installed. Falling back to {DEFAULT_BACKEND}"
+        )
+        return DEFAULT_BACKEND
+    return name
+
+
+def parse_html(html: str | bytes, backend: str | None = None) -> BeautifulSoup:
+    """Parse <html> into a BeautifulSoup tree.
+
+    Args:
+        html (str | bytes): The page.
+        backend (str | None, optional): The backend to use. Defaults to None, i.e. the
+            configured backend.
+
+    Returns:
+        BeautifulSoup: The parsed page.
+    """
+    _, parse = BACKENDS[backend or get_parser_backend()]
+    return parse(html)
+
+
+def benchmark(
+    pages: list[str], backends: list[str] | None = None, repeat: int = 3
+) -> dict[str, dict]:
+    """Measure the parse throughput of each backend on <pages>.
+
+    Args:
+        pages (list[str]): The html pages to parse.
+        backends (list[str] | None, optional): The backends to measure. Defaults to
+            every installed backend.
+        repeat (int, optional): Times the pages are parsed. The fastest round counts.
+            Defaults to 3.
+
+    Returns:
+        dict[str, dict]: Pages and megabytes parsed per second, by backend.
+    """
+    megabytes = sum(len(page.encode("utf-8")) for page in pages) / 1_000_000
+    results = {}
+    for name in backends or available_backends():
+        _, parse = BACKENDS[name]
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for page in pages:
+                parse(page)
+            best = min(best, time.perf_counter() - start)
+        results[name] = {
+            "pages_per_second": len(pages) / best,
+            "mb_per_second": megabytes / best,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the parse throughput of the installed html parsers."
+    )
+    parser.add_argument("pages", nargs="+", help="html files to parse.")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="rounds per backend. The fastest counts."
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    pages = [Path(path).read_text(errors="replace") for path in args.pages]
+    for name, result in benchmark(pages, repeat=args.repeat).items():
+        logger.info(
+            f"{name:<14}{result['pages_per_second']:>10.1f} pages/s"
+            f"{result['mb_per_second']:>10.2f} MB/s"
+        )
@@ -3,19 +3,21 @@ import logging
 from datetime import datetime, timezone
 from typing import Any, Optional
 
-import aiometer
-from bs4 import BeautifulSoup, Tag
+from bs4 import Tag
 from pydantic import BaseModel, ConfigDict, Field
 
 from api.v2.trace.repository import TraceRepository
 from consts import HEADERS
+from deadlines import StageBudgets, run_all_within, run_within
 from exceptions import BaseException
 from models import PyObjectId
-from v2.client import get
+from v2.anchor_stream import stream_anchors
+from v2.client import is_not_modified, stage_jobs, stage_listing, stream
 from v2.client.helpers import get_domain
-from v2.html_parser import find_anchor_tags_from_traces, find_text_from_traces
+from v2.head_metadata import read_head
+from v2.html_parser import compile_traces, find_text_from_traces
 from v2.models.article import Article
-from v2.soup_helpers import create_soup
+from v2.parsers import parse_html
 
 logger = logging.getLogger(__name__)
 URL = str
@@ -42,6 +44,11 @@ class Scraper(BaseModel):
     articles: list[Article] = []
     max_at_once: int = 10
     max_per_second: int = 10
+    head_only: bool = Field(
+        default=False,
+        description="Read article titles from the <head> metadata of article pages, "
+        "and stop downloading them once found",
+    )
 
     def _set_domain(self, url: str):
         if not self.domain:
@@ -62,15 +69,30 @@ class Scraper(BaseModel):
 
     async def get_article_info(self, url: URL) -> Article | None:
         """Gets the article content and creates an article object. All errors should
-        be caught and should return None on error"""
+        be caught and should return None on error.
+
+        In head only mode, the title is read from the page's <head> metadata, and the
+        download stops as soon as it's found. The rest of the page is only read (and
+        the title traces used) if the head has no title."""
         self._set_domain(url)
         try:
-            response = await get(url, headers=HEADERS, follow_redirects=True)
-            soup = BeautifulSoup(response.text, "html.parser")
-            trace_obj = TraceRepository.read_by(
-                {"sourceId": self.sourceId, "type": "article_title"}
-            )
-            article_title = find_text_from_traces(soup, trace_obj.traces)
+            async with stream(url, headers=HEADERS, follow_redirects=True) as response:
+                if is_not_modified(response):
+                    logger.debug(f"{self.domain};{url} not modified since last scrape")
+                    return None
+                chunks = response.iter_bytes()
+                article_title = None
+                read = b""
+                if self.head_only:
+                    metadata, read = await read_head(chunks, response.encoding)
+                    article_title = metadata.headline
+                if article_title is None:
+                    read += b"".join([chunk async for chunk in chunks])
+                    soup = parse_html(read.decode(response.encoding, errors="replace"))
+                    trace_obj = TraceRepository.read_by(
+                        {"sourceId": self.sourceId, "type": "article_title"}
+                    )
+                    article_title = find_text_from_traces(soup, trace_obj.traces)
             return Article(
                 domain=self.domain,
                 url=url,
@@ -84,40 +106,68 @@ class Scraper(BaseModel):
             return None
 
     async def get_article_links(self, url: str) -> list[str]:
-        """List articles from the page found at <url>."""
+        """List articles from the page found at <url>. The page is streamed, and its
+        anchors are matched against the traces as they arrive, so it is never parsed
+        into a tree nor held in memory whole."""
         self._set_domain(url)
-        response = await get(url, headers=HEADERS, follow_redirects=True)
-        body_soup = create_soup(response.text)
-        trace_obj = TraceRepository.read_by(
-            {"sourceId": self.sourceId, "type": "article_links"}
-        )
-        article_links = find_anchor_tags_from_traces(body_soup, trace_obj.traces)
-        return list(
-            set(
-                [self._maybe_add_prefix_to_href(x.attrs["href"]) for x in article_links]
+        async with stream(url, headers=HEADERS, follow_redirects=True) as response:
+            if is_not_modified(response):
+                logger.info(f"{self.domain};{url} not modified since last scrape")
+                return []
+            trace_obj = TraceRepository.read_by(
+                {"sourceId": self.sourceId, "type": "article_links"}
             )
-        )
-
-    async def run(self, url: str) -> list[Article]:
+            traces = compile_traces(trace_obj.traces)
+            article_links = {
+                self._maybe_add_prefix_to_href(record.href)
+                async for record in stream_anchors(
+                    response.iter_bytes(), response.encoding
+                )
+                if record.href and traces.match(record.path)
+            }
+        return list(article_links)
+
+    async def run(
+        self, url: str, budgets: StageBudgets | None = None
+    ) -> list[Article]:
         """Full run of scrape, from article link acquisition to article information
         retrieval.
 
         Args:
             url (str): The URL to initially retrieve article links from.
+            budgets (StageBudgets | None, optional): Time budgets of the list and
+                articles stages. If a stage runs out of time (or the run deadline
+                passes), the articles retrieved until then are returned. Defaults to
+                None, i.e. only bound by the run deadline.
 
         Returns:
             Awaitable[list[Article]]: A list of article information.
         """
+        budgets = budgets or StageBudgets()
         self._set_domain(url)
         logger.info(f"{self.domain};getting article urls...")
-        # this may raise, we want it to. We can't continue without it.
-        article_urls = await self.get_article_links(url)
+        # this may raise, we want it to. We can't continue without it. Running out of
+        # time isn't an error though: there's just nothing to get.
+        with stage_listing():
+            article_urls = await run_within(
+                self.domain,
+                "list",
+                budgets.timeout("list"),
+                self.get_article_links(url),
+                default=[],
+            )
         logger.info(
             f"{self.domain};got {len(article_urls)} article urls. Beginning article text retrieval..."
         )
         logger.debug(f"{self.domain};{article_urls}")
-        jobs = [functools.partial(self.get_article_info, url) for url in article_urls]
-        articles = await aiometer.run_all(
+        jobs = stage_jobs(
+            [functools.partial(self.get_article_info, url) for url in article_urls]
+        )
+        # keeps the articles retrieved so far if time runs out
+        articles = await run_all_within(
+            self.domain,
+            "articles",
+            budgets.timeout("articles"),
             jobs,
             max_at_once=self.max_at_once,
             max_per_second=self.max_per_second,
@@ -1,7 +1,13 @@
+import logging
 import re
+import time
+from dataclasses import dataclass
+from typing import Collection, Iterable
 
 from bs4 import BeautifulSoup, Tag
 
+from v2.parsers import parse_html
+
 UNINTERESTING_TAGS = [
     "noscript",
     "script",
@@ -36,55 +42,156 @@ INTERESTING_TAGS = [
 
 AnchorTag = Tag
 
+logger = logging.getLogger(__name__)
+
 
-def find_all_anchor_tags(soup: BeautifulSoup) -> str:
-    anchors = soup.find_all("a")
+def find_all_anchor_tags(soup: BeautifulSoup | Iterable) -> str:
+    """Describe the anchors of a page as "text (href)" pairs. <soup> is the parsed page,
+    or the records of its anchors streamed by `v2.anchor_stream`."""
+    if isinstance(soup, Tag):
+        anchors = ((anchor.text, anchor.get("href")) for anchor in soup.find_all("a"))
+    else:
+        anchors = ((record.text, record.href) for record in soup)
     text_parts = []
-    for anchor in anchors:
-        anchor_text = anchor.text.replace("\n", " ")
+    for anchor_text, href in anchors:
+        anchor_text = anchor_text.replace("\n", " ")
         anchor_text = re.sub(" +", " ", anchor_text)
         anchor_text = anchor_text.strip()
-        href = anchor.get("href")
         if not href or not anchor_text:
             continue
         text_parts.append(f"{anchor_text} ({href})")
     return " ".join(text_parts)
 
 
-def remove_uninteresting_paths(tag: Tag):
-    """Remove uninteresting paths from the HTML."""
-    children = tag.contents.copy()
-    for child in children:
-        if isinstance(child, Tag):
-            if child.name in UNINTERESTING_TAGS:
-                child.decompose()
+@dataclass
+class PruneStats:
+    """What a pruning pass did.
+
+    Attributes:
+        visited (int): Elements examined.
+        pruned (int): Subtrees removed.
+        seconds (float): Time the pass took.
+        kept (bool): Whether the root still has a path worth keeping, i.e. contains
+            the required tag (always True if no tag is required).
+    """
+
+    visited: int = 0
+    pruned: int = 0
+    seconds: float = 0.0
+    kept: bool = True
+
+
+class _Frame:
+    __slots__ = ("tag", "child", "contains")
+
+    def __init__(self, tag: Tag):
+        self.tag = tag
+        self.child = tag.contents[0] if tag.contents else None
+        self.contains = False
+
+
+def prune_tree(
+    root: Tag,
+    allow: Collection[str] | None = None,
+    deny: Collection[str] = (),
+    require: str | None = None,
+) -> PruneStats:
+    """Prunes the tree under <root> in place, in a single post-order pass.
+
+    The walk is iterative and follows sibling links, so it neither recurses per level
+    (deeply nested pages can't hit the recursion limit) nor copies any child lists.
+
+    Args:
+        root (Tag): The tree to prune. The root itself is never removed.
+        allow (Collection[str] | None, optional): If given, only elements with these
+            tag names are kept. Defaults to None.
+        deny (Collection[str], optional): Elements with these tag names are removed,
+            with their subtrees. Defaults to ().
+        require (str | None, optional): If given, elements without a <require>
+            element in their subtree (and that aren't one themselves) are removed.
+            Defaults to None.
+
+    Returns:
+        PruneStats: What was pruned, and how long it took.
+    """
+    start = time.perf_counter()
+    allowed = None if allow is None else frozenset(allow)
+    denied = frozenset(deny)
+    stats = PruneStats()
+    stack = [_Frame(root)]
+    while stack:
+        frame = stack[-1]
+        child = frame.child
+        if child is None:
+            # every child is done
+            stack.pop()
+            keep = require is None or frame.contains or frame.tag.name == require
+            if not stack:
+                stats.kept = keep
+            elif keep:
+                stack[-1].contains = True
             else:
-                remove_uninteresting_paths(child)
+                frame.tag.decompose()
+                stats.pruned += 1
+            continue
+        frame.child = child.next_sibling
+        if not isinstance(child, Tag):
+            continue
+        stats.visited += 1
+        if child.name in denied or (allowed is not None and child.name not in allowed):
+            child.decompose()
+            stats.pruned += 1
+            continue
+        stack.append(_Frame(child))
+    stats.seconds = time.perf_counter() - start
+    return stats
 
 
-def keep_only_interesting_paths(tag: Tag) -> bool:
+def remove_uninteresting_paths(
+    tag: Tag, deny: Collection[str] = UNINTERESTING_TAGS
+) -> PruneStats:
+    """Remove uninteresting paths from the HTML."""
+    stats = prune_tree(tag, deny=deny)
+    logger.debug(
+        f"removed {stats.pruned} uninteresting paths in {stats.seconds * 1000:.1f}ms"
+    )
+    return stats
+
+
+def keep_only_interesting_paths(
+    tag: Tag,
+    allow: Collection[str] = INTERESTING_TAGS,
+    deny: Collection[str] = (),
+) -> bool:
     """We only retain paths that a) contain interesting tags and b) contain at least one
     <a> tag."""
-    some_child_contains_a_tag = False
-    children = tag.contents.copy()
-    for child in children:
-        if isinstance(child, Tag):
-            if child.name not in INTERESTING_TAGS:
-                child.decompose()
-                continue
-            child_contains_a_tag = keep_only_interesting_paths(child)
-            # switch flag to true if any child contains <a> tag
-            some_child_contains_a_tag = (
-                some_child_contains_a_tag or child_contains_a_tag
-            )
-            # if child does not contain <a> tag, we can prune it
-            if not child_contains_a_tag:
-                child.decompose()
-    return tag.name == "a" or some_child_contains_a_tag
+    stats = prune_tree(tag, allow=allow, deny=deny, require="a")
+    logger.debug(
+        f"pruned {stats.pruned} of {stats.visited} elements to their interesting "
+        f"paths in {stats.seconds * 1000:.1f}ms"
+    )
+    return stats.kept
+
+
+def detach_subtree(tag: Tag) -> BeautifulSoup:
+    """Detach <tag> from its tree and return it as the root of a standalone soup.
+    Nothing is serialised or parsed again: the subtree's nodes are moved as they are,
+    and the rest of the original tree can be garbage collected.
+
+    Args:
+        tag (Tag): The subtree to detach, e.g. a page's <body>.
+
+    Returns:
+        BeautifulSoup: A soup whose only top-level element is <tag>.
+    """
+    soup = BeautifulSoup("", "html.parser")
+    soup.append(tag.extract())
+    return soup
 
 
 def create_soup_for_article_link_retrieval(html_page: str) -> BeautifulSoup:
-    """Create a BeautifulSoup object from the HTML page.
+    """Create a BeautifulSoup object from the HTML page, pruned to its interesting
+    paths, with its <body> as the root. The page is parsed once.
 
     Args:
         html_page (str): The HTML page to parse.
@@ -92,14 +199,16 @@ def create_soup_for_article_link_retrieval(html_page: str) -> BeautifulSoup:
     Returns:
         BeautifulSoup: The parsed HTML page.
     """
-    soup = BeautifulSoup(html_page, "html.parser")
+    soup = parse_html(html_page)
     keep_only_interesting_paths(soup)
     body = soup.find("body")
-    body_soup = BeautifulSoup(str(body), "html.parser")
-    return body_soup
+    if body is None:
+        # a fragment, there's no body to root the soup at
+        return soup
+    return detach_subtree(body)
 
 
 def create_soup(html_page: str) -> BeautifulSoup:
-    soup = BeautifulSoup(html_page, "html.parser")
+    soup = parse_html(html_page)
     remove_uninteresting_paths(soup)
     return soup
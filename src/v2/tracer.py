@@ -1,24 +1,40 @@
 from api.v2.source import SourceRepository
 from v2.agents.manager import AgentManager
+from v2.client import client_pool, get_response_cache
 from v2.models.article import Article
 from v2.models.source import Source
 from v2.scraper import Scraper
 
 
-async def create_url_traces(name: str, url: str) -> list[Article]:
-    """Checks that the URL is scrapeable"""
+async def create_url_traces(
+    name: str, url: str, response_cache: bool = False
+) -> list[Article]:
+    """Checks that the URL is scrapeable
+
+    Args:
+        name (str): The name of the source.
+        url (str): The url of the listing page.
+        response_cache (bool, optional): Serve pages fetched in the last 15 minutes
+            from the response cache on disk, e.g. when re-checking a source. Defaults
+            to False, i.e. every page is fetched.
+    """
     agent_manager = AgentManager()
     # finds article links and sets traces if applicable
     url = url.rstrip("/")
     # get or create source
     source = SourceRepository.read_or_create(Source(name=name, url=url))
     scraper = Scraper(sourceId=source.id)
-    await agent_manager.maybe_create_article_link_traces(url, source.id)
-    article_links = await scraper.get_article_links(url)
-    # finds article info and sets traces if applicable
-    for link in article_links:
-        await agent_manager.get_or_create_or_update_article_title_traces(
-            link, source.id
-        )
-    article_info_models = await scraper.run(url)
+    # the agents and the scraper all read the same pages, so share warm connections and
+    # only download each page once per check (or once per 15 minutes, if asked for)
+    async with client_pool(
+        cache=get_response_cache() if response_cache else None, memory_cache=True
+    ):
+        await agent_manager.maybe_create_article_link_traces(url, source.id)
+        article_links = await scraper.get_article_links(url)
+        # finds article info and sets traces if applicable
+        for link in article_links:
+            await agent_manager.get_or_create_or_update_article_title_traces(
+                link, source.id
+            )
+        article_info_models = await scraper.run(url)
     return article_info_models
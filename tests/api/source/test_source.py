@@ -0,0 +1,53 @@
+import pytest
+import os
+from datetime import datetime
+from bson import ObjectId
+import httpx
+import mongomock
+
+pytest.importorskip('fastapi_cache')
+
+SOURCE_ID = '640ddfc8f9ebf203fe2c8300'
+
+
+@pytest.fixture
+def env():
+    os.environ['MONGO_URI'] = 'mongodb://localhost:27017'
+
+
+@mongomock.patch(servers=(('localhost', 27017),))
+def test_poke_lists_articles_through_a_session(env, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from fastapi_cache import FastAPICache
+    from fastapi_cache.backends.inmemory import InMemoryBackend
+    from api.lib.db import Db
+    from api.source.source import router
+    from scrapers import _test
+
+    Db().source.insert_one({
+        '_id': ObjectId(SOURCE_ID),
+        'ref': '_test',
+        'name': 'Test',
+        'created_at': datetime(2023, 1, 1),
+        'modified_at': datetime(2023, 1, 1),
+        'base_url': 'https://www.example.com',
+    })
+    calls = []
+
+    async def list_articles(client: httpx.AsyncClient, path: str):
+        calls.append((client, path))
+        return []
+
+    monkeypatch.setattr(_test, 'list_articles', list_articles)
+    FastAPICache.init(backend=InMemoryBackend())
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).get(
+        f'/source/{SOURCE_ID}/poke', params={'endpoint': '/news/'})
+    assert response.status_code == 200
+    assert response.json() == {
+        'url': 'https://www.example.com/news', 'success': True}
+    [(client, path)] = calls
+    assert isinstance(client, httpx.AsyncClient)
+    assert path == '/news/'
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+
+def test_adaptive_concurrency_increases_up_to_ceiling():
+    from v2.client.adaptive import AdaptiveConcurrency
+
+    controller = AdaptiveConcurrency("bbc.com", ceiling=4)
+    for _ in range(100):
+        controller.observe(200, 0.1)
+    assert controller.state()["limit"] == 4
+
+
+def test_adaptive_concurrency_backs_off_on_429():
+    from v2.client.adaptive import AdaptiveConcurrency
+
+    controller = AdaptiveConcurrency("bbc.com", ceiling=8, cooldown=0)
+    controller.limit = 8
+    controller.observe(429, 0.1)
+    assert controller.state()["limit"] == 4
+    controller.observe(None, 0.1)
+    assert controller.state()["limit"] == 2
+    assert controller.state()["backoffs"] == 2
+
+
+def test_adaptive_concurrency_backs_off_on_rising_latency():
+    from v2.client.adaptive import AdaptiveConcurrency
+
+    controller = AdaptiveConcurrency("bbc.com", ceiling=8, window=10, cooldown=0)
+    for _ in range(10):
+        controller.observe(200, 0.1)
+    limit = controller.limit
+    for _ in range(5):
+        controller.observe(200, 1.0)
+    assert controller.limit < limit
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_limits_in_flight():
+    from v2.client.adaptive import AdaptiveConcurrency
+
+    controller = AdaptiveConcurrency("bbc.com", ceiling=2)
+    controller.limit = 1
+    await controller.acquire()
+    waiter = asyncio.ensure_future(controller.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    controller.release()
+    await asyncio.wait_for(waiter, 1)
+    assert controller.in_flight == 1
@@ -0,0 +1,128 @@
+import pytest
+from bs4 import BeautifulSoup
+
+HTML = """<html><body>
+<nav><a href="/home">Home</a></nav>
+<div class="article"><a href="/news/1.html">One <b>&amp; more</b></a></div>
+<ul><li><div><h3><a href="/news/2">Tw&eacute;</a></h3></div></li></ul>
+<article><a href="/news/3.html"><h2>Three</h2><script>var x;</script></a></article>
+<p><a href="/outer">out<a href="/inner">in</a>er</a><br>
+<table><tr><td><a href="/news/4">Four</a></td></tr></table>
+</body></html>"""
+
+
+def test_streamed_anchors_match_the_parsed_page(monkeypatch):
+    from v2 import parsers
+    from v2.anchor_stream import AnchorExtractor
+    from v2.html_parser import trace_tag_to_root
+    from v2.soup_helpers import create_soup
+
+    # anchors are nested like html.parser nests them
+    monkeypatch.setattr(parsers, "_backend", "html.parser")
+
+    expected = [
+        (a.get("href"), a.get_text(), tuple(trace_tag_to_root(a)[::-1]))
+        for a in create_soup(HTML).find_all("a")
+    ]
+    extractor = AnchorExtractor()
+    records = []
+    # bytes split mid-tag, mid-entity and mid-character
+    data = HTML.encode("utf-8")
+    for start in range(0, len(data), 7):
+        records.extend(extractor.feed(data[start : start + 7]))
+    records.extend(extractor.close())
+    assert [(r.href, r.text, r.path) for r in records] == expected
+    # denied subtrees are skipped, nested anchors come after the anchor they're in
+    assert [r.href for r in records][:1] == ["/news/1.html"]
+    assert [r.href for r in records][3:5] == ["/outer", "/inner"]
+
+
+def test_records_feed_trace_matching_and_heuristics():
+    from v2.anchor_stream import extract_anchors, first_anchor_in
+    from v2.heuristic import AnchorFeatures, evaluate_anchors
+    from v2.html_parser import compile_traces
+    from v2.soup_helpers import INTERESTING_TAGS, find_all_anchor_tags
+
+    trie = compile_traces([["html", "body", "ul", "li", "div", "h3", "a"]])
+    assert [r.href for r in extract_anchors(HTML) if trie.match(r.path)] == ["/news/2"]
+    assert find_all_anchor_tags(extract_anchors(HTML)).startswith(
+        "One & more (/news/1.html) Twé (/news/2)"
+    )
+
+    pruned = extract_anchors(HTML, allow=INTERESTING_TAGS, deny=(), require="a")
+    features = AnchorFeatures.from_records(pruned)
+    expected = evaluate_anchors(BeautifulSoup(HTML, "html.parser"))
+    assert features.hrefs == expected.hrefs
+    for signal in AnchorFeatures.SIGNALS:
+        assert (getattr(features, signal) == getattr(expected, signal)).all(), signal
+
+    in_list = first_anchor_in("li")
+    record = next(r for r in extract_anchors(HTML) if in_list(r))
+    assert record.inside("div", {"class": "article"}) is None
+    assert record.inside("ul").name == "ul"
+
+
+def test_first_element_keeps_the_anchors_of_the_first_container():
+    from v2.anchor_stream import FirstElement, extract_anchors, first_anchor_in
+
+    html = """<ol><li><h3><a href="/1">1</a><a href="/1b">1b</a></h3></li>
+    <li><h3><a href="/2">2</a></h3></li></ol>
+    <ol><li><h3><a href="/3">3</a></h3></li></ol>
+    <article><h4><a href="/4">4</a></h4><h4><a href="/5">5</a></h4></article>
+    <article><p><h4><a href="/6">6</a></h4></p></article>"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    in_list, in_h3 = FirstElement("ol"), first_anchor_in("h3")
+    records = extract_anchors(html, deny=())
+    hrefs = [r.href for r in records if in_list(r) and in_h3(r)]
+    assert hrefs == [x.a["href"] for x in soup.ol.find_all("h3")] == ["/1", "/2"]
+    assert in_list.found
+
+    in_first_h4, in_h4 = FirstElement("h4", within="article"), first_anchor_in("h4")
+    records = extract_anchors(html, deny=())
+    hrefs = [r.href for r in records if in_first_h4(r) and in_h4(r)]
+    assert hrefs == [x.h4.a["href"] for x in soup.find_all("article")]
+    assert hrefs == ["/4", "/6"]
+
+    missing = FirstElement("div", {"aria-label": "Featured Contents"})
+    assert not any(missing(r) for r in extract_anchors(html, deny=()))
+    assert not missing.found
+
+
+@pytest.mark.parametrize(
+    "backend", ["html.parser", "lxml", "html5-parser", "selectolax"]
+)
+def test_traces_recorded_from_records_match_whatever_the_parser(backend, monkeypatch):
+    from v2 import parsers
+    from v2.anchor_stream import extract_anchors
+    from v2.html_parser import compile_traces, get_unique_anchor_traces
+
+    package = parsers.BACKENDS[backend][0]
+    if package:
+        pytest.importorskip(package)
+    monkeypatch.setattr(parsers, "_backend", backend)
+    links = ["/news/2", "/inner", "/news/4"]
+    traces = get_unique_anchor_traces(links, extract_anchors(HTML))
+    assert traces[0] == ["html", "body", "ul", "li", "div", "h3", "a"]
+    trie = compile_traces(traces)
+    assert [r.href for r in extract_anchors(HTML) if trie.match(r.path)] == links
+
+
+@pytest.mark.asyncio
+async def test_stream_anchors_reads_chunks_as_they_arrive():
+    from v2.anchor_stream import stream_anchors
+
+    chunks = [b'<div><a href="/a">caf', b"\xc3", b'\xa9</a><a href="/b">', b"b"]
+    consumed = []
+
+    async def body():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    records = stream_anchors(body())
+    first = await records.__anext__()
+    assert (first.href, first.text) == ("/a", "café")
+    # emitted before the rest of the body was read
+    assert len(consumed) == 3
+    assert [(r.href, r.text) async for r in records] == [("/b", "b")]
@@ -0,0 +1,140 @@
+import httpx
+import pytest
+
+
+def test_response_cache_round_trip(tmp_path):
+    from v2.client.cache import CachedResponse, ResponseCache
+
+    cache = ResponseCache(tmp_path)
+    key = cache.key("GET", "https://www.bbc.com/news?b=2&a=1#top")
+    # equivalent urls share a key
+    assert key == cache.key("GET", "HTTPS://WWW.BBC.COM:443/news?a=1&b=2")
+    cache.set(key, CachedResponse(200, [("content-type", "text/html")], b"hi", 0.0))
+    assert cache.get(key, ttl=float("inf")).content == b"hi"
+    # stale entries are dropped
+    assert cache.get(key, ttl=60) is None
+    assert len(cache) == 0
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    import time
+
+    from v2.client.cache import CachedResponse, ResponseCache
+
+    cache = ResponseCache(tmp_path)
+    for url in ["https://a.com", "https://b.com", "https://c.com"]:
+        key = cache.key("GET", url)
+        cache.set(key, CachedResponse(200, [], url.encode() * 100, time.time()))
+    # touch a.com so b.com is the least recently used
+    cache.get(cache.key("GET", "https://a.com"), ttl=60)
+    cache.max_bytes = cache.size
+    cache.set(
+        cache.key("GET", "https://d.com"),
+        CachedResponse(200, [], b"d", time.time()),
+    )
+    assert cache.get(cache.key("GET", "https://b.com"), ttl=60) is None
+    assert cache.get(cache.key("GET", "https://a.com"), ttl=60) is not None
+    # survives a restart
+    assert len(ResponseCache(tmp_path)) == len(cache)
+
+
+@pytest.mark.asyncio
+async def test_cache_transport_serves_repeat_requests(httpx_mock, tmp_path):
+    from v2.client import ClientPool, ResponseCache, get
+
+    httpx_mock.add_response(url="https://www.bbc.com/news", text="listing")
+    cache = ResponseCache(tmp_path, domain_ttls={"www.bbc.com": 60})
+    async with ClientPool(cache=cache):
+        first = await get("https://www.bbc.com/news")
+        second = await get("https://www.bbc.com/news")
+    assert first.text == second.text == "listing"
+    assert second.extensions["from_cache"]
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_transport_streams_misses_and_stores_complete_bodies(
+    httpx_mock, tmp_path
+):
+    from pytest_httpx import IteratorStream
+
+    from v2.client import ClientPool, ResponseCache, stream
+
+    url = "https://www.bbc.com/news"
+    sent = []
+
+    def body():
+        for chunk in [b"<head>", b"<body>", b"</body>"]:
+            sent.append(chunk)
+            yield chunk
+
+    httpx_mock.add_callback(
+        lambda request: httpx.Response(200, stream=IteratorStream(body())),
+        url=url,
+        is_reusable=True,
+    )
+    cache = ResponseCache(tmp_path)
+    async with ClientPool(cache=cache):
+        # an early stop still stops the download, and isn't cached
+        async with stream(url) as response:
+            chunks = response.iter_bytes()
+            assert await chunks.__anext__() == b"<head>"
+        assert len(sent) < 3 and len(cache) == 0
+        async with stream(url, max_bytes=8) as response:
+            assert await response.read() == b"<head><b"
+        assert len(cache) == 0
+        sent.clear()
+        async with stream(url) as response:
+            assert await response.read() == b"<head><body></body>"
+        async with stream(url) as response:
+            assert await response.read() == b"<head><body></body>"
+            assert response.response.extensions["from_cache"]
+    assert len(cache) == 1
+    assert len(httpx_mock.get_requests()) == 3
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_lasts_as_long_as_the_pool(httpx_mock):
+    from v2.client import ClientPool, stream
+
+    url = "https://www.bbc.com/news"
+    httpx_mock.add_response(url=url, text="listing", is_reusable=True)
+    for _ in range(2):
+        async with ClientPool(memory_cache=True):
+            for _ in range(2):
+                async with stream(url) as response:
+                    assert await response.read() == b"listing"
+    # once per pool
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def test_response_cache_directory_is_configurable(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    from consts import SRC_DIR
+
+    script = "import consts; print(consts.CACHE_DIR, consts.RESPONSE_CACHE_DIR)"
+
+    def directories(**env):
+        env = {**os.environ, **env}
+        for name in ["SCRAPER_CACHE_DIR", "SCRAPER_RESPONSE_CACHE_DIR"]:
+            if not env[name]:
+                del env[name]
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=SRC_DIR,
+            env=env,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        return output.split()
+
+    assert directories(
+        SCRAPER_CACHE_DIR=str(tmp_path), SCRAPER_RESPONSE_CACHE_DIR=""
+    ) == [str(tmp_path), str(tmp_path / "responses")]
+    assert directories(
+        SCRAPER_CACHE_DIR="", SCRAPER_RESPONSE_CACHE_DIR=str(tmp_path / "r")
+    )[1] == str(tmp_path / "r")
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_client_pool_one_client_per_origin():
+    from v2.client import ClientPool
+
+    async with ClientPool() as pool:
+        bbc = pool.client_for("https://www.bbc.com/news/1")
+        assert pool.client_for("https://www.bbc.com/news/2") is bbc
+        assert pool.client_for("https://www.theguardian.com/news") is not bbc
+        assert pool.client_for("http://www.bbc.com/news") is not bbc
+        assert len(pool.origins) == 3
+    assert bbc.is_closed
+    assert pool.origins == []
+
+
+@pytest.mark.asyncio
+async def test_client_pool_is_current_inside_context():
+    from v2.client import ClientPool, client_pool, current_pool
+
+    assert current_pool() is None
+    async with ClientPool() as pool:
+        assert current_pool() is pool
+        # nested callers reuse the open pool
+        async with client_pool() as nested:
+            assert nested is pool
+        assert current_pool() is pool
+    assert current_pool() is None
+
+
+@pytest.mark.asyncio
+async def test_get_uses_pooled_client(httpx_mock):
+    from v2.client import ClientPool, get
+
+    httpx_mock.add_response(url="https://www.bbc.com/a", text="a")
+    httpx_mock.add_response(url="https://www.bbc.com/b", text="b")
+    async with ClientPool() as pool:
+        response_a = await get("https://www.bbc.com/a")
+        response_b = await get("https://www.bbc.com/b")
+        assert pool.origins == ["https://www.bbc.com"]
+    assert response_a.text == "a"
+    assert response_b.text == "b"
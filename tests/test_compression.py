@@ -0,0 +1,63 @@
+import gzip
+import zlib
+
+import httpx
+import pytest
+from pytest_httpx import IteratorStream
+
+
+def _chunks(content: bytes, size: int = 16) -> list[bytes]:
+    return [content[i : i + size] for i in range(0, len(content), size)]
+
+
+@pytest.mark.asyncio
+async def test_compression_transport_decodes_incrementally(httpx_mock):
+    from v2.client.compression import CompressionTransport, TransferStatsRegistry
+
+    body = b"<html>" + b"news " * 200 + b"</html>"
+    compressed = gzip.compress(body)
+    httpx_mock.add_response(
+        url="https://www.bbc.com/news",
+        headers={"Content-Encoding": "gzip", "Content-Length": str(len(compressed))},
+        stream=IteratorStream(_chunks(compressed)),
+    )
+    registry = TransferStatsRegistry()
+    transport = CompressionTransport(httpx.AsyncHTTPTransport(), registry=registry)
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://www.bbc.com/news")
+    assert response.content == body
+    assert "content-encoding" not in response.headers
+    assert response.extensions["wire_content_length"] == str(len(compressed))
+    request = httpx_mock.get_request()
+    assert "gzip" in request.headers["accept-encoding"]
+
+    stats = response.extensions["transfer_stats"]
+    assert (stats.wire_bytes, stats.decoded_bytes) == (len(compressed), len(body))
+    assert registry.snapshot()["bbc.com"]["requests"] == 1
+    assert registry.get("https://bbc.com").ratio == pytest.approx(
+        len(body) / len(compressed)
+    )
+
+
+@pytest.mark.asyncio
+async def test_compression_transport_handles_raw_deflate_and_identity(httpx_mock):
+    from v2.client.compression import CompressionTransport, TransferStatsRegistry
+
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    raw_deflate = compressor.compress(b"deflated") + compressor.flush()
+    httpx_mock.add_response(
+        url="https://www.bbc.com/a",
+        headers={"Content-Encoding": "deflate"},
+        content=raw_deflate,
+    )
+    httpx_mock.add_response(url="https://www.bbc.com/b", content=b"plain")
+    registry = TransferStatsRegistry()
+    transport = CompressionTransport(httpx.AsyncHTTPTransport(), registry=registry)
+    async with httpx.AsyncClient(transport=transport) as client:
+        deflated = await client.get("https://www.bbc.com/a")
+        plain = await client.get("https://www.bbc.com/b")
+    assert deflated.content == b"deflated"
+    assert plain.content == b"plain"
+    stats = registry.get("https://www.bbc.com")
+    assert stats.requests == 2
+    assert stats.decoded_bytes == len(b"deflated") + len(b"plain")
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_sends_stored_validators(httpx_mock, tmp_path):
+    from v2.client import ClientPool, ValidatorStore, get, is_not_modified
+
+    url = "https://www.bbc.com/news"
+    httpx_mock.add_response(
+        url=url,
+        text="<html></html>",
+        headers={"ETag": '"abc"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+    )
+    httpx_mock.add_response(url=url, status_code=304)
+    store = ValidatorStore(tmp_path / "validators.json")
+    async with ClientPool(validators=store):
+        first = await get(url)
+        second = await get(url)
+    assert first.status_code == 200
+    # 304 is passed through to the caller rather than raised
+    assert is_not_modified(second)
+    first_request, second_request = httpx_mock.get_requests()
+    assert "if-none-match" not in first_request.headers
+    assert second_request.headers["if-none-match"] == '"abc"'
+    assert second_request.headers["if-modified-since"] == "Wed, 21 Oct 2015 07:28:00 GMT"
+    # validators are only persisted on save, not when the pool closes
+    assert ValidatorStore(tmp_path / "validators.json").get(url) is None
+    store.save()
+    assert ValidatorStore(tmp_path / "validators.json").get(url) == {
+        "etag": '"abc"',
+        "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+
+
+@pytest.mark.asyncio
+async def test_staged_validators_are_stored_once_committed(httpx_mock, tmp_path):
+    from v2.client import (
+        ClientPool,
+        ValidatorStore,
+        get,
+        stage_jobs,
+        stage_listing,
+        staged_run,
+    )
+
+    listing, ok, failed = (f"https://www.bbc.com/{x}" for x in ["news", "a", "b"])
+    for url in [listing, ok, failed]:
+        httpx_mock.add_response(url=url, headers={"ETag": url})
+    httpx_mock.add_response(url=listing, headers={"ETag": "new"})
+    httpx_mock.add_response(url=failed, status_code=304)
+
+    async def job(url, retrieved):
+        await get(url)
+        return url if retrieved else None
+
+    path = tmp_path / "validators.json"
+    store = ValidatorStore(path)
+    async with ClientPool(validators=store):
+        with staged_run() as run:
+            with stage_listing():
+                await get(listing)
+            jobs = stage_jobs([lambda: job(ok, True), lambda: job(failed, False)])
+            await asyncio.gather(*(job() for job in jobs))
+        assert store.get(listing) is None and store.get(ok) is None
+        run.commit()
+        # the failed article is listed again next run
+        assert ValidatorStore(path).get(ok) == {"etag": ok}
+        assert store.get(listing) is None and store.get(failed) is None
+
+        # an article that wasn't modified was persisted in a previous run
+        with staged_run() as run:
+            with stage_listing():
+                await get(listing)
+            await stage_jobs([lambda: job(failed, False)])[0]()
+        run.commit()
+    assert ValidatorStore(path).get(listing) == {"etag": "new"}
+
+
+def test_validator_store_save_merges_with_disk(tmp_path):
+    from v2.client import ValidatorStore
+
+    path = tmp_path / "validators.json"
+    a = ValidatorStore(path)
+    b = ValidatorStore(path)
+    a.set("https://a.com", etag="1", last_modified=None)
+    b.set("https://b.com", etag="2", last_modified=None)
+    a.save()
+    b.save()
+    store = ValidatorStore(path)
+    assert store.get("https://a.com") == {"etag": "1"}
+    assert store.get("https://b.com") == {"etag": "2"}
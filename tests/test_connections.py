@@ -0,0 +1,97 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_dns_cache_shares_and_expires_lookups(monkeypatch):
+    from v2.client.connections import DNSCache
+
+    lookups = []
+
+    async def fake_getaddrinfo(host, port, type=0):
+        lookups.append(host)
+        await asyncio.sleep(0.01)
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.2", port)),
+        ]
+
+    loop = asyncio.get_running_loop()
+    monkeypatch.setattr(loop, "getaddrinfo", fake_getaddrinfo)
+    cache = DNSCache(ttl=60)
+    results = await asyncio.gather(
+        *[cache.resolve("www.bbc.com", 443) for _ in range(3)]
+    )
+    assert results == [["10.0.0.1", "10.0.0.2"]] * 3
+    await cache.resolve("www.bbc.com", 443)
+    assert lookups == ["www.bbc.com"]
+
+    cache.ttl = 0
+    cache.forget("www.bbc.com", 443)
+    await cache.resolve("www.bbc.com", 443)
+    await cache.resolve("www.bbc.com", 443)
+    assert len(lookups) == 3
+
+
+@pytest.mark.asyncio
+async def test_shared_http_transport_outlives_sessions():
+    from v2.client import connections
+
+    limits = httpx.Limits(max_connections=4)
+    first = connections.get_shared_http_transport("bbc", limits)
+    await first.aclose()
+    second = connections.get_shared_http_transport("bbc", limits)
+    other = connections.get_shared_http_transport("guardian", limits)
+    assert first._transport is second._transport
+    assert other._transport is not first._transport
+    await connections.close_shared_http_transports()
+    assert connections.get_shared_http_transport("bbc", limits)._transport is not (
+        first._transport
+    )
+    await connections.close_shared_http_transports()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_connects_to_each_origin_once(httpx_mock):
+    from v2.client import prewarm
+
+    httpx_mock.add_response(method="HEAD", url="https://www.bbc.com")
+    httpx_mock.add_response(
+        method="HEAD", url="https://www.theguardian.com", status_code=405
+    )
+    async with httpx.AsyncClient() as client:
+        await prewarm(
+            client,
+            [
+                "https://www.bbc.com/news",
+                "https://www.bbc.com/sport",
+                "https://www.theguardian.com/au",
+            ],
+        )
+    assert sorted(str(r.url) for r in httpx_mock.get_requests()) == [
+        "https://www.bbc.com",
+        "https://www.theguardian.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_prewarm_skips_the_rate_limit(httpx_mock):
+    import time
+
+    from v2.client import prewarm
+    from v2.client.transports import create_transport
+
+    url = "https://www.prewarm-example.com"
+    httpx_mock.add_response(method="HEAD", url=url)
+    httpx_mock.add_response(url=f"{url}/news")
+    transport = create_transport(httpx.Limits(), rate_limit=0.5, rate_burst=1)
+    async with httpx.AsyncClient(transport=transport) as client:
+        await prewarm(client, [f"{url}/news"])
+        start = time.monotonic()
+        await client.get(f"{url}/news")
+    # the only token was left for the run
+    assert time.monotonic() - start < 1
@@ -0,0 +1,109 @@
+import asyncio
+import functools
+
+import httpx
+import pytest
+
+
+def test_nested_deadline_cannot_extend_the_run():
+    from deadlines import (
+        MIN_PERSIST_TIMEOUT,
+        StageBudgets,
+        current_deadline,
+        deadline,
+        remaining,
+    )
+
+    assert remaining() is None
+    with deadline(10) as run:
+        with deadline(60) as nested:
+            assert nested is run
+        with deadline(None) as kept:
+            assert kept is run
+        # later stages' budgets are set aside from the run's deadline
+        budgets = StageBudgets(list=5, articles=30, persist=4)
+        assert budgets.timeout("list") == 5
+        assert budgets.timeout("articles") == pytest.approx(6, abs=0.1)
+        assert budgets.timeout("persist") == 4
+    # past the deadline, retrieved articles still get time to be written
+    with deadline(0):
+        assert StageBudgets().timeout("persist") == MIN_PERSIST_TIMEOUT
+        assert StageBudgets(persist=2).timeout("persist") == 2
+    assert current_deadline() is None
+    assert StageBudgets().timeout("articles") is None
+
+
+@pytest.mark.asyncio
+async def test_run_all_within_returns_partial_results():
+    from deadlines import run_all_within
+
+    async def job(i):
+        # finish in reverse order
+        await asyncio.sleep((3 - i) / 100 if i < 3 else 10)
+        return i
+
+    results = await run_all_within(
+        "bbc.com",
+        "articles",
+        0.1,
+        [functools.partial(job, i) for i in range(5)],
+        max_at_once=5,
+    )
+    # in job order, like aiometer.run_all
+    assert results == [0, 1, 2]
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.timeouts = []
+
+    async def handle_async_request(self, request):
+        self.timeouts.append(request.extensions["timeout"])
+        await asyncio.sleep(self.delay)
+        return httpx.Response(200, request=request)
+
+
+@pytest.mark.asyncio
+async def test_deadline_transport_clamps_and_abandons_requests():
+    from deadlines import DeadlineExceededError, deadline
+    from v2.client.transports import DeadlineTransport
+
+    inner = RecordingTransport()
+    transport = DeadlineTransport(inner)
+    async with httpx.AsyncClient(transport=transport, timeout=30) as client:
+        await client.get("https://www.bbc.com/news")
+        assert inner.timeouts[-1]["read"] == 30
+        with deadline(2):
+            await client.get("https://www.bbc.com/news")
+            assert 1 < inner.timeouts[-1]["read"] <= 2
+        inner.delay = 10
+        with deadline(0.05), pytest.raises(DeadlineExceededError):
+            await client.get("https://www.bbc.com/news")
+        with deadline(0), pytest.raises(DeadlineExceededError):
+            await client.get("https://www.bbc.com/news")
+
+
+@pytest.mark.asyncio
+async def test_retry_does_not_sleep_past_the_deadline(monkeypatch):
+    from deadlines import deadline
+    from v2.client import wrappers
+
+    sleeps = []
+
+    async def fake_sleep(self, seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(wrappers.CircuitBreaker, "sleep", fake_sleep)
+    monkeypatch.setattr(wrappers, "_circuit_breakers", {})
+
+    @wrappers.retry_on_failed_request(max_attempts=3)
+    async def fetch(url):
+        return httpx.Response(
+            503, headers={"Retry-After": "20"}, request=httpx.Request("GET", url)
+        )
+
+    with deadline(5):
+        response = await fetch("https://www.bbc.com/news")
+    assert response.status_code == 503
+    assert sleeps == []
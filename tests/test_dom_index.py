@@ -0,0 +1,57 @@
+from bs4 import BeautifulSoup
+
+HTML = """<html><body>
+<div class="story article-list"><ul>
+<li><h3><a href="/news/1.html" rel="bookmark">One</a></h3></li>
+<li><a href="/news/2">Two<br>more</a><script>var x = 1;</script></li>
+</ul></div>
+<p>unclosed <span>text</span></i></body></html>"""
+
+
+def test_from_html_indexes_the_same_tree_as_html_parser():
+    from v2.dom_index import DomIndex
+
+    soup = BeautifulSoup(HTML, "html.parser")
+    from_soup = DomIndex.from_soup(soup)
+    from_html = DomIndex.from_html(HTML)
+    assert len(from_soup) == len(soup.find_all(True))
+    for field in ["tag", "parent", "depth", "path", "end", "text_start", "text_stop"]:
+        assert (getattr(from_soup, field) == getattr(from_html, field)).all(), field
+    assert from_html.elements is None
+
+    anchors = from_html.find_all("a")
+    hrefs = [from_html.get(row, "href") for row in anchors]
+    assert hrefs == ["/news/1.html", "/news/2"]
+    # scripts aren't text, like in get_text()
+    assert from_html.text(anchors[1] - 1) == soup.find_all("li")[1].get_text()
+    assert from_html.text(from_html.find_all("div")[0]) == soup.div.get_text()
+
+
+def test_dom_index_answers_trace_and_ancestor_queries_in_bulk():
+    from v2.dom_index import DomIndex
+    from v2.html_parser import find_anchor_tags_from_traces, find_text_from_traces
+
+    soup = BeautifulSoup(HTML, "html.parser")
+    index = DomIndex.from_soup(soup)
+    traces = [
+        ["html", "body", "div", "ul", "li", "h3", "a"],
+        ["html", "body", "div", "ul", "li", "a"],
+    ]
+    assert find_anchor_tags_from_traces(index, traces) == find_anchor_tags_from_traces(
+        soup, traces
+    )
+    assert find_text_from_traces(index, [["html", "h1"], traces[1]]) == "Twomore"
+    assert len(index.match_trace(["html", "body", "nav"])) == 0
+
+    anchors = index.find_all("a")
+    assert index.inside_tag(anchors, ["li"], max_depth=1).tolist() == [False, True]
+    assert index.inside_tag(anchors, ["li"], max_depth=2).tolist() == [True, True]
+    # class is matched by token, other attributes by substring
+    article = index.attribute_contains("article")
+    assert not article.any()
+    assert index.attribute_contains("article-list").sum() == 1
+    assert not index.attribute_contains("book").any()
+    assert index.within(anchors, index.attribute_contains("/news/1"), 0).tolist() == [
+        True,
+        False,
+    ]
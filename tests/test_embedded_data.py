@@ -0,0 +1,64 @@
+import pytest
+
+PAGE = b"""<html><head>
+<script type="application/ld+json">[{"@type": "WebSite", "name": "The Age"},
+{"@type": "NewsArticle", "headline": "Caf\\u00e9 closes", "inLanguage": "en",
+"author": [{"@type": "Person", "name": "A. Writer"}, "B. Writer"],
+"datePublished": "2024-02-15T09:00:00.000Z", "keywords": "food, melbourne"}];
+</script>
+<SCRIPT TYPE='application/ld+json'>{not json}</SCRIPT>
+<script id="__NEXT_DATA__" type="application/json">
+{"props": {"pageProps": {"articleId": "p5f52t"}}}</script>
+</head><body>
+<script>window.__APOLLO_STATE__ = {"Article:1": {"body": "</div> <p>"}};</script>
+<script>var x = 1; window.__PRELOADED_STATE__ = {"page": 2}; render();</script>
+</body></html>"""
+
+
+@pytest.mark.parametrize("json_library", ["orjson", "json"])
+def test_extract_embedded_finds_every_kind_of_blob(monkeypatch, json_library):
+    from v2 import embedded_data
+
+    if json_library == "json":
+        monkeypatch.setattr(embedded_data, "orjson", None)
+    data = embedded_data.extract_embedded(PAGE)
+    # the invalid script is skipped
+    assert len(data.json_ld) == 1
+    assert data.page_props == {"articleId": "p5f52t"}
+    assert data.state == {
+        "__APOLLO_STATE__": {"Article:1": {"body": "</div> <p>"}},
+        "__PRELOADED_STATE__": {"page": 2},
+    }
+    # str pages work too
+    assert embedded_data.extract_embedded(PAGE.decode()).state == data.state
+
+
+def test_article_metadata_is_read_from_the_article_object():
+    from v2.embedded_data import ArticleMetadata, EmbeddedData, extract_embedded
+
+    article = extract_embedded(PAGE).article
+    assert article.headline == "Café closes"
+    assert article.authors == ["A. Writer", "B. Writer"]
+    assert article.date_published == "2024-02-15T09:00:00.000Z"
+    assert article.date_modified is None
+    assert (article.language, article.keywords) == ("en", ["food", "melbourne"])
+
+    video = {"@type": "VideoObject", "uploadDate": "2024-01", "author": {"name": "C"}}
+    assert EmbeddedData(json_ld=[{"@graph": [video]}]).article == ArticleMetadata(
+        authors=["C"], date_published="2024-01", date_modified="2024-01", raw=video
+    )
+    assert EmbeddedData().article is None
+
+
+def test_extract_embedded_reads_the_real_attributes_and_encoding():
+    from v2.embedded_data import extract_embedded
+
+    page = """<script data-type="x" type="application/ld+json">
+    {"@type": "NewsArticle", "headline": "Café closes"}</script>
+    <script data-id="y" id="__NEXT_DATA__">{"props": {}}</script>
+    <script>window.__PRELOADED_STATE__ = {"town": "Orléans"}; go();</script>"""
+    for encoding in ["utf-8", "latin-1"]:
+        data = extract_embedded(page.encode(encoding), encoding)
+        assert data.article.headline == "Café closes"
+        assert data.next_data == {"props": {}}
+        assert data.state == {"__PRELOADED_STATE__": {"town": "Orléans"}}
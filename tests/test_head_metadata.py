@@ -0,0 +1,60 @@
+import pytest
+from pytest_httpx import IteratorStream
+
+HEAD = b"""<html><head><title>Rates rise | The Age</title>
+<noscript><img src="/pixel.gif"></noscript>
+<meta name="twitter:title" content="Rates rise again">
+<script type="application/ld+json">{"@graph": [{"@type": "WebPage"},
+{"@type": "NewsArticle", "headline": "Rates rise, again"}]}</script>
+<meta property="og:title" content="Rates rise: what it means">
+</head>"""
+
+
+def test_head_extractor_stops_once_the_needed_fields_are_found():
+    from v2.head_metadata import HeadExtractor
+
+    extractor = HeadExtractor(needs=["og:title"])
+    head = HEAD.removesuffix(b"</head>")
+    done = [extractor.feed(head[i : i + 16]) for i in range(0, len(head), 16)]
+    # done with the og:title, before the head ends
+    assert done[-1] and not any(done[:-3])
+    assert not extractor.metadata.complete
+    metadata = extractor.metadata
+    assert metadata.title == "Rates rise | The Age"
+    assert metadata.meta == {
+        "twitter:title": "Rates rise again",
+        "og:title": "Rates rise: what it means",
+    }
+    assert metadata.json_ld_values("headline") == ["Rates rise, again"]
+    assert metadata.headline == "Rates rise: what it means"
+
+    # without the fields it needs, the extractor is done when the body starts
+    extractor = HeadExtractor(needs=["og:description"])
+    assert not extractor.feed(b"<html><head><title> Only </title>")
+    assert extractor.feed(b"<link rel=icon><div>")
+    assert extractor.metadata.headline == "Only"
+
+
+@pytest.mark.asyncio
+async def test_article_info_agent_stops_after_the_matching_h1(httpx_mock):
+    from v2.agents.article_info_agent import ArticleInfoAgent
+
+    sent = []
+
+    def body():
+        for chunk in [
+            HEAD,
+            b"<body><div><h1>Related</h1><main><h1>Rates rise: what it means",
+            b"</h1></main>",
+            b"<p>the rest of the article</p>",
+        ]:
+            sent.append(chunk)
+            yield chunk
+
+    httpx_mock.add_response(
+        url="https://www.theage.com.au/a", stream=IteratorStream(body())
+    )
+    trace = await ArticleInfoAgent().run("https://www.theage.com.au/a")
+    # the <h1> matching the head's title, not the first one
+    assert trace == ["html", "body", "div", "main", "h1"]
+    assert len(sent) == 3
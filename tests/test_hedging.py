@@ -0,0 +1,84 @@
+import asyncio
+
+import httpx
+import pytest
+
+
+class ScriptedTransport(httpx.AsyncBaseTransport):
+    """Answers the n-th request after delays[n] seconds."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.requests = 0
+        self.cancelled = 0
+
+    async def handle_async_request(self, request):
+        n = self.requests
+        self.requests += 1
+        try:
+            await asyncio.sleep(self.delays[n] if n < len(self.delays) else 0)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return httpx.Response(200, stream=httpx.ByteStream(str(n).encode()))
+
+
+def _warm(registry, url, latency=0.01, samples=20, requests=100):
+    domain = registry.get(url)
+    for _ in range(samples):
+        domain.observe(latency)
+    domain.requests = requests
+    return domain
+
+
+@pytest.mark.asyncio
+async def test_hedging_transport_takes_first_response():
+    from v2.client.hedging import HedgingRegistry, HedgingTransport
+
+    registry = HedgingRegistry()
+    domain = _warm(registry, "https://www.bbc.com")
+    inner = ScriptedTransport([1.0, 0.0])
+    transport = HedgingTransport(inner, percentile=0.95, registry=registry)
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://www.bbc.com/news/1")
+        # let the loser's cancellation run
+        await asyncio.sleep(0)
+    assert response.text == "1"
+    assert inner.requests == 2 and inner.cancelled == 1
+    assert (domain.hedges, domain.hedge_wins) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_hedging_respects_budget_and_warmup():
+    from v2.client.hedging import HedgingRegistry, HedgingTransport
+
+    registry = HedgingRegistry()
+    inner = ScriptedTransport([0.05, 0.05])
+    transport = HedgingTransport(inner, budget=0.05, registry=registry)
+    async with httpx.AsyncClient(transport=transport) as client:
+        # no latencies known yet
+        await client.get("https://www.bbc.com/news/1")
+        # latencies known, but 1 hedge in 2 requests is over budget
+        _warm(registry, "https://www.bbc.com", requests=1)
+        await client.get("https://www.bbc.com/news/2")
+    assert inner.requests == 2
+    assert registry.get("https://bbc.com").hedges == 0
+
+
+@pytest.mark.asyncio
+async def test_hedging_times_requests_from_when_they_are_sent():
+    from v2.client.hedging import HedgingRegistry, HedgingTransport, SendTimingTransport
+    from v2.client.transports import StreamLimitTransport
+
+    registry = HedgingRegistry()
+    domain = _warm(registry, "https://www.bbc.com", latency=0.05)
+    inner = ScriptedTransport([0.03] * 3)
+    # one request at a time: the last one queues for longer than the usual latency
+    limited = StreamLimitTransport(SendTimingTransport(inner), max_streams=1)
+    transport = HedgingTransport(limited, registry=registry, timed_from_send=True)
+    async with httpx.AsyncClient(transport=transport) as client:
+        await asyncio.gather(
+            *(client.get(f"https://www.bbc.com/news/{n}") for n in range(3))
+        )
+    assert inner.requests == 3 and domain.hedges == 0
+    assert max(list(domain._latencies)[-3:]) < 0.05
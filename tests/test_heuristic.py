@@ -0,0 +1,42 @@
+from bs4 import BeautifulSoup
+
+HTML = """<html><body>
+<nav><a href="/home">Home</a></nav>
+<div class="article"><a href="/news/1.html">One</a></div>
+<ul><li><div><h3><a href="/news/2">Two</a></h3></div></li></ul>
+<article><a href="/news/3.html"><h2>Three</h2></a></article>
+<table><tr><td><a href="/news/4">Four</a></td></tr></table>
+</body></html>"""
+
+
+def test_evaluate_anchors_computes_every_signal_in_one_pass():
+    from v2.heuristic import evaluate_anchors
+
+    features = evaluate_anchors(BeautifulSoup(HTML, "html.parser"))
+    # uninteresting paths are pruned
+    assert features.hrefs == ["/news/1.html", "/news/2", "/news/3.html"]
+    assert features.article_in_attributes.tolist() == [True, False, False]
+    assert features.inside_list.tolist() == [False, True, False]
+    assert features.inside_article.tolist() == [False, False, True]
+    # the heading inside the third anchor has no anchor itself, so it is pruned
+    assert features.neighbouring_heading.tolist() == [False, True, False]
+    assert features.dot_html.tolist() == [True, False, True]
+    selected = features.select(features.dot_html & ~features.inside_article)
+    assert [a["href"] for a in selected] == ["/news/1.html"]
+    assert features.rows()[1]["inside_list"] is True
+
+    unpruned = evaluate_anchors(BeautifulSoup(HTML, "html.parser"), prune=False)
+    assert len(unpruned) == 5
+    assert unpruned.neighbouring_heading.tolist() == [False, False, True, True, False]
+
+
+def test_heuristics_filter_the_feature_table():
+    from v2.heuristic import heuristic_dot_html, heuristic_has_neighbouring_heading
+
+    soup = BeautifulSoup(HTML, "html.parser")
+    assert [a["href"] for a in heuristic_dot_html(soup)] == [
+        "/news/1.html",
+        "/news/3.html",
+    ]
+    # pruning again is a no-op
+    assert [a["href"] for a in heuristic_has_neighbouring_heading(soup)] == ["/news/2"]
@@ -127,3 +127,33 @@ def test_e2e(theage):
     a_tags = find_anchor_tags_from_traces(theage, traces)
     for tag in a_tags:
         assert tag.attrs["href"].startswith("/business")
+
+
+def test_trace_trie_matches_overlapping_traces_in_one_walk():
+    from v2.html_parser import (
+        compile_traces,
+        find_anchor_tags_from_traces,
+        find_text_from_traces,
+    )
+
+    html = """
+    <body><div><section>
+    <article><h4><a href="/1">One</a></h4></article>
+    <article><a href="/2">Two</a><h4><a href="/3">Three</a></h4></article>
+    </section></div><h1>Title</h1></body>
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    traces = [
+        ["body", "div", "section", "article", "h4", "a"],
+        ["body", "div", "section", "article", "a"],
+    ]
+    tags = find_anchor_tags_from_traces(soup, traces)
+    assert [tag.attrs["href"] for tag in tags] == ["/1", "/3", "/2"]
+    assert compile_traces(traces) is compile_traces([list(t) for t in traces])
+    # the earliest trace that matches wins, wherever its match is
+    assert find_text_from_traces(soup, [["body", "h1"], traces[1]]) == "Title"
+    assert find_text_from_traces(soup, [["body", "h2"], traces[1]]) == "Two"
+    with pytest.raises(ValueError):
+        find_text_from_traces(soup, [["body", "h2"]])
+    with pytest.raises(ValueError):
+        find_anchor_tags_from_traces(soup, [["body", "h1"]])
@@ -0,0 +1,64 @@
+import logging
+
+import httpx
+import pytest
+
+
+def _response(status_code, content=b""):
+    return httpx.Response(
+        status_code,
+        content=content,
+        request=httpx.Request("GET", "https://www.bbc.com/news"),
+    )
+
+
+def test_http_event_truncates_bodies():
+    from v2.client.httplog import HttpEvent
+
+    event = HttpEvent(_response(500, b"a" * 100), include_body=True, max_body_bytes=10)
+    assert event.as_dict()["response_body"] == "a" * 10 + "... [90 more bytes]"
+    assert "RESPONSE: aaaaaaaaaa..." in str(event)
+    assert "response_body" not in HttpEvent(_response(200, b"ok")).as_dict()
+
+
+def test_should_sample_body(monkeypatch):
+    from v2.client import httplog
+
+    monkeypatch.setattr(httplog, "config", httplog.HttpLogConfig())
+    assert httplog.should_sample_body(_response(503))
+    assert not httplog.should_sample_body(_response(200))
+    httplog.configure_http_logging(body_sample_rate=1.0, sample_errors=False)
+    assert httplog.should_sample_body(_response(200))
+
+
+def test_log_http_event_is_lazy(monkeypatch, caplog):
+    from v2.client import httplog
+
+    def fail(self):
+        raise AssertionError("event rendered")
+
+    logger = logging.getLogger("test_httplog")
+    monkeypatch.setattr(httplog.HttpEvent, "as_dict", fail)
+    with caplog.at_level(logging.INFO, logger="test_httplog"):
+        httplog.log_http_event(logger, _response(200, b"ok"))
+    assert caplog.records == []
+
+    monkeypatch.undo()
+    with caplog.at_level(logging.DEBUG, logger="test_httplog"):
+        httplog.log_http_event(logger, _response(200, b"ok"))
+    (record,) = caplog.records
+    assert record.http_event.as_dict()["status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_log_and_raise_attaches_event_to_errors(caplog):
+    from v2.client.wrappers import log_and_raise_if_non_200
+
+    @log_and_raise_if_non_200
+    async def fetch():
+        return _response(404, b"not found")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await fetch()
+    (record,) = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert record.http_event.as_dict()["response_body"] == "not found"
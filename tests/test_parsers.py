@@ -0,0 +1,46 @@
+import pytest
+
+PAGE = """<html><body><div class="story top"><a href="/news/1">One</a><!-- ad -->
+<ul><li><a href="/news/2">Two</a></li></ul></div></body></html>"""
+
+
+def test_parser_backend_is_configurable(monkeypatch):
+    from v2 import parsers
+
+    monkeypatch.setattr(parsers, "_backend", None)
+    monkeypatch.delenv(parsers.PARSER_ENV, raising=False)
+    assert parsers.get_parser_backend() == "html.parser"
+    monkeypatch.setenv(parsers.PARSER_ENV, "selectolax")
+    monkeypatch.setattr(parsers, "available_backends", lambda: ["html.parser"])
+    # not installed
+    assert parsers.get_parser_backend() == "html.parser"
+    parsers.set_parser_backend("html.parser")
+    assert parsers.get_parser_backend() == "html.parser"
+    with pytest.raises(ValueError):
+        parsers.set_parser_backend("regex")
+
+    soup = parsers.parse_html(PAGE)
+    assert [a["href"] for a in soup.find_all("a")] == ["/news/1", "/news/2"]
+
+
+@pytest.mark.parametrize("backend", ["lxml", "html5-parser", "selectolax"])
+def test_backends_build_the_same_tree(backend):
+    from v2.html_parser import find_anchor_tags_from_traces
+    from v2.parsers import BACKENDS, parse_html
+
+    pytest.importorskip(BACKENDS[backend][0])
+    expected = parse_html(PAGE, backend="html.parser")
+    soup = parse_html(PAGE, backend=backend)
+    assert soup.find("div")["class"] == expected.find("div")["class"]
+    anchors = find_anchor_tags_from_traces(
+        soup, [["html", "body", "div", "ul", "li", "a"]]
+    )
+    assert [a.get_text() for a in anchors] == ["Two"]
+
+
+def test_benchmark_reports_throughput_per_backend():
+    from v2.parsers import benchmark
+
+    results = benchmark([PAGE] * 5, backends=["html.parser"], repeat=1)
+    assert results["html.parser"]["pages_per_second"] > 0
+    assert results["html.parser"]["mb_per_second"] > 0
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import pytest
+
+
+def test_get_rate_limit_key():
+    from v2.client.ratelimit import get_rate_limit_key
+
+    assert get_rate_limit_key("https://www.aljazeera.com/news") == "aljazeera.com"
+    assert get_rate_limit_key("https://aljazeera.com/economy") == "aljazeera.com"
+    assert get_rate_limit_key("https://api.afr.com/x") == "api.afr.com"
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate_after_burst():
+    from v2.client.ratelimit import TokenBucket
+
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    await asyncio.gather(*[bucket.acquire() for _ in range(7)])
+    # 2 free tokens, then 5 more at 50/s
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_domain_rate_limiter_keeps_most_conservative_limit():
+    from v2.client.ratelimit import DomainRateLimiter
+
+    limiter = DomainRateLimiter()
+    limiter.configure("www.aljazeera.com", rate=4, burst=4)
+    limiter.configure("https://aljazeera.com/economy", rate=2, burst=8)
+    bucket = limiter._buckets["aljazeera.com"]
+    assert (bucket.rate, bucket.burst) == (2, 4)
+    assert not limiter.is_configured("https://www.bbc.com")
+
+
+def test_token_bucket_is_shared_across_event_loops():
+    from v2.client.ratelimit import TokenBucket
+
+    bucket = TokenBucket(rate=100, burst=1)
+
+    async def acquire():
+        await asyncio.gather(*[bucket.acquire() for _ in range(3)])
+
+    asyncio.run(acquire())
+    asyncio.run(acquire())
@@ -0,0 +1,46 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_without_network(httpx_mock, tmp_path):
+    from v2.client import ClientPool, get, recording, replaying
+
+    path = tmp_path / "run.jsonl.gz"
+    httpx_mock.add_response(url="https://www.bbc.com/news", text="first")
+    httpx_mock.add_response(url="https://www.bbc.com/news", text="second")
+    httpx_mock.add_response(url="https://www.bbc.com/news/1", text="article")
+    with recording(path) as cassette:
+        async with ClientPool():
+            await get("https://www.bbc.com/news")
+            await get("https://www.bbc.com/news")
+            await get("https://www.bbc.com/news/1")
+    assert len(cassette) == 3
+    assert cassette.interactions[0].latency >= 0
+
+    with replaying(path):
+        async with ClientPool():
+            replayed = [
+                (await get(url)).text
+                for url in [
+                    "https://www.bbc.com/news",
+                    "https://www.bbc.com/news/1",
+                    "https://www.bbc.com/news",
+                    # the last recording is repeated
+                    "https://www.bbc.com/news",
+                ]
+            ]
+    assert replayed == ["first", "article", "second", "second"]
+    assert len(httpx_mock.get_requests()) == 3
+
+
+@pytest.mark.asyncio
+async def test_replay_raises_on_unrecorded_request(tmp_path):
+    from v2.client import ClientPool, ReplayMissError, get, recording, replaying
+
+    path = tmp_path / "empty.jsonl.gz"
+    with recording(path):
+        pass
+    with replaying(path):
+        async with ClientPool():
+            with pytest.raises(ReplayMissError):
+                await get("https://www.bbc.com/news")
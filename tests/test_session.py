@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_create_session_uses_outlet_header_profile(httpx_mock):
+    from session import create_session
+
+    httpx_mock.add_response(url="https://www.aljazeera.com/graphql")
+    async with create_session("aljazeera") as client:
+        await client.get("https://www.aljazeera.com/graphql")
+    request = httpx_mock.get_request()
+    assert request.headers["wp-site"] == "aje"
+
+
+@pytest.mark.asyncio
+async def test_create_session_defaults_to_common_headers(httpx_mock):
+    from consts import HEADERS
+    from session import create_session
+
+    httpx_mock.add_response(url="https://www.bbc.com/news")
+    async with create_session("bbc", max_connections=4) as client:
+        await client.get("https://www.bbc.com/news")
+    request = httpx_mock.get_request()
+    assert request.headers["user-agent"] == HEADERS["user-agent"]
+    assert "wp-site" not in request.headers
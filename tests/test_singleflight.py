@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.requests = 0
+        self.cancelled = False
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return httpx.Response(200, stream=httpx.ByteStream(b"listing"))
+
+
+@pytest.mark.asyncio
+async def test_singleflight_transport_coalesces_concurrent_gets():
+    from v2.client.singleflight import SingleflightGroup, SingleflightTransport
+
+    inner = CountingTransport()
+    group = SingleflightGroup()
+    transport = SingleflightTransport(inner, group=group)
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = await asyncio.gather(
+            client.get("https://www.bbc.com/news"),
+            client.get("https://www.bbc.com/news#top"),
+            client.get("https://www.bbc.com/news", headers={"wp-site": "aje"}),
+        )
+        # once finished, the next request goes out again
+        await client.get("https://www.bbc.com/news")
+    assert [r.text for r in responses] == ["listing"] * 3
+    assert inner.requests == 3
+    assert group.coalesced == 1
+    assert group.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_survives_a_cancelled_waiter():
+    from v2.client.singleflight import SingleflightGroup, SingleflightTransport
+
+    inner = CountingTransport()
+    transport = SingleflightTransport(inner, group=SingleflightGroup())
+    async with httpx.AsyncClient(transport=transport) as client:
+        first = asyncio.create_task(client.get("https://www.bbc.com/news"))
+        second = asyncio.create_task(client.get("https://www.bbc.com/news"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        response = await second
+    assert first.cancelled()
+    assert response.text == "listing"
+    assert inner.requests == 1 and not inner.cancelled
+
+
+@pytest.mark.asyncio
+async def test_singleflight_cancels_request_when_every_waiter_leaves():
+    from v2.client.singleflight import SingleflightGroup, SingleflightTransport
+
+    inner = CountingTransport()
+    group = SingleflightGroup()
+    transport = SingleflightTransport(inner, group=group)
+    async with httpx.AsyncClient(transport=transport) as client:
+        tasks = [
+            asyncio.create_task(client.get("https://www.bbc.com/news"))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+    assert inner.cancelled
+    assert group.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_is_shared_by_stacks_configured_alike(httpx_mock, tmp_path):
+    from v2.client import ValidatorStore
+    from v2.client.transports import create_transport
+
+    url = "https://www.bbc.com/news"
+    store = ValidatorStore(tmp_path / "validators.json")
+    store.set(url, etag='"abc"', last_modified=None)
+
+    async def respond(request):
+        await asyncio.sleep(0.05)
+        if "if-none-match" in request.headers:
+            return httpx.Response(304)
+        return httpx.Response(200, text="listing")
+
+    httpx_mock.add_callback(respond, url=url, is_reusable=True)
+    limits = httpx.Limits(max_connections=2)
+    async with (
+        httpx.AsyncClient(transport=create_transport(limits, validators=store)) as a,
+        httpx.AsyncClient(transport=create_transport(limits)) as b,
+        httpx.AsyncClient(transport=create_transport(limits)) as c,
+    ):
+        responses = await asyncio.gather(a.get(url), b.get(url), c.get(url))
+    # separate clients configured alike share the request, but only the client that
+    # sent the validators is told the page is unchanged
+    assert [r.status_code for r in responses] == [304, 200, 200]
+    assert responses[2].text == "listing"
+    assert len(httpx_mock.get_requests()) == 2
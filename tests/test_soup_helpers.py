@@ -128,3 +128,61 @@ def test_has_neighbouring_heading_tag():
         "html.parser",
     )
     assert has_neighbouring_heading_tag(soup.a)
+
+
+def test_prune_tree_is_iterative_and_reports_stats():
+    from v2.soup_helpers import INTERESTING_TAGS, prune_tree
+
+    depth = 20_000
+    html = (
+        "<body>"
+        + "<div>" * depth
+        + '<a href="/news/1">one</a>'
+        + "</div>" * depth
+        + "<p>no link</p><nav><a href='/home'>home</a></nav></body>"
+    )
+    soup = BeautifulSoup(html, "html.parser")
+    stats = prune_tree(soup, allow=INTERESTING_TAGS, deny=["nav"], require="a")
+    assert stats.kept
+    # the <p> without a link and the denied <nav>
+    assert stats.pruned == 2
+    assert stats.visited == depth + 4
+    assert stats.seconds > 0
+    assert [a["href"] for a in soup.find_all("a")] == ["/news/1"]
+
+
+def test_remove_uninteresting_paths_with_custom_deny_list():
+    from v2.soup_helpers import remove_uninteresting_paths
+
+    soup = BeautifulSoup(
+        "<div><script>x</script><aside>a</aside><form>f</form></div>", "html.parser"
+    )
+    stats = remove_uninteresting_paths(soup, deny=["form", "script"])
+    assert stats.pruned == 2
+    assert str(soup) == "<div><aside>a</aside></div>"
+
+
+def test_article_link_soup_is_parsed_once_without_serialising(monkeypatch):
+    from bs4 import Tag
+
+    from v2 import soup_helpers
+    from v2.html_parser import trace_tag_to_root
+
+    parses = []
+    parse_html = soup_helpers.parse_html
+    monkeypatch.setattr(
+        soup_helpers, "parse_html", lambda html: parses.append(html) or parse_html(html)
+    )
+
+    def no_serialising(*args, **kwargs):
+        raise AssertionError("the page was serialised")
+
+    monkeypatch.setattr(Tag, "decode", no_serialising)
+    soup = soup_helpers.create_soup_for_article_link_retrieval(
+        "<html><head><title>t</title></head><body>"
+        '<div><a href="/news/1">one</a></div><p>no link</p></body></html>'
+    )
+    assert len(parses) == 1
+    assert [child.name for child in soup.contents] == ["body"]
+    assert trace_tag_to_root(soup.a) == ["a", "div", "body"]
+    assert soup.find("title") is None
@@ -0,0 +1,67 @@
+import pytest
+from pytest_httpx import IteratorStream
+
+
+@pytest.mark.asyncio
+async def test_stream_reads_whole_body(httpx_mock):
+    from v2.client import stream
+
+    httpx_mock.add_response(url="https://www.bbc.com/news", text="hello")
+    async with stream("https://www.bbc.com/news") as response:
+        assert await response.read() == b"hello"
+    assert response.text == "hello"
+    stats = response.response.extensions["byte_stats"]
+    assert (stats.bytes_read, stats.bytes_skipped) == (5, 0)
+    assert not stats.truncated and not stats.aborted
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_at_max_bytes(httpx_mock):
+    from v2.client import stream
+
+    httpx_mock.add_response(
+        url="https://www.bbc.com/news",
+        stream=IteratorStream([b"aaaa", b"bbbb", b"cccc"]),
+        headers={"Content-Length": "12"},
+    )
+    async with stream("https://www.bbc.com/news", max_bytes=6) as response:
+        assert await response.read() == b"aaaabb"
+    assert response.stats.truncated
+    assert response.stats.bytes_read == 6
+    assert response.stats.bytes_skipped == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_caller_can_abort(httpx_mock):
+    from v2.client import stream
+
+    httpx_mock.add_response(
+        url="https://www.bbc.com/news",
+        stream=IteratorStream([b"<head>", b"<body>", b"..."]),
+    )
+    async with stream("https://www.bbc.com/news") as response:
+        async for chunk in response.iter_bytes():
+            if b"<head>" in chunk:
+                break
+    assert response.stats.aborted and not response.stats.truncated
+    assert response.stats.bytes_read == 6
+    # no Content-Length, so what was skipped is unknown
+    assert response.stats.bytes_skipped is None
+
+
+@pytest.mark.asyncio
+async def test_stream_domain_budget_is_shared(httpx_mock):
+    from v2.client import byte_budgets, stream
+
+    httpx_mock.add_response(url="https://www.bbc.com/a", text="aaaaaa")
+    httpx_mock.add_response(url="https://bbc.com/b", text="bbbbbb")
+    byte_budgets.configure("bbc.com", 8)
+    try:
+        async with stream("https://www.bbc.com/a") as a:
+            await a.read()
+        async with stream("https://bbc.com/b") as b:
+            await b.read()
+        assert (a.content, b.content) == (b"aaaaaa", b"bb")
+        assert byte_budgets.remaining("https://bbc.com") == 0
+    finally:
+        byte_budgets.clear()
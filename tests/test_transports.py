@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+import pytest
+
+
+class SlowTransport(httpx.AsyncBaseTransport):
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle_async_request(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return httpx.Response(200, stream=httpx.ByteStream(b"ok"))
+
+
+@pytest.mark.asyncio
+async def test_stream_limit_transport_caps_requests_in_flight():
+    from v2.client.transports import StreamLimitTransport
+
+    inner = SlowTransport()
+    transport = StreamLimitTransport(inner, max_streams=2)
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = await asyncio.gather(
+            *[client.get(f"https://www.bbc.com/{i}") for i in range(6)]
+        )
+    assert all(r.text == "ok" for r in responses)
+    assert inner.max_in_flight == 2
+
+
+def test_create_transport_falls_back_without_h2(monkeypatch):
+    from v2.client import transports
+
+    monkeypatch.setattr(transports, "http2_available", lambda: False)
+    transport = transports.create_transport(httpx.Limits(), http2=True)
+    # prewarming requests go straight to the http transport
+    http_transport = transport._transport.network
+    assert isinstance(http_transport, httpx.AsyncHTTPTransport)
+    assert not http_transport._pool._http2
@@ -7,3 +7,10 @@ def test_normalise_tag():
     assert normalise_tag("Hello  World!") == "hello-world"
     assert normalise_tag("Hello's  World!") == "hello-s-world"
     assert normalise_tag("  Hello's  World!  ") == "hello-s-world"
+
+
+def test_find_json_objects():
+    from src.utils import find_json_objects
+
+    text = 'var a = {"x": 1}; f({"y": [1, {"z": 2}]}) { not json'
+    assert list(find_json_objects(text)) == [{"x": 1}, {"y": [1, {"z": 2}]}]
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+
+def test_calculate_sleep_uses_retry_after():
+    from v2.client.wrappers import _calculate_sleep
+
+    assert _calculate_sleep(1, {"Retry-After": "5"}) == 5
+    assert _calculate_sleep(1, {"Retry-After": "120"}, max_backoff_wait=30) == 30
+    # dates in the past fall back to exponential backoff
+    retry_after = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    assert _calculate_sleep(3, retry_after, backoff_factor=0.1) == pytest.approx(0.4)
+
+
+@pytest.mark.asyncio
+async def test_retry_on_failed_request_waits_for_retry_after(monkeypatch):
+    from v2.client import wrappers
+
+    sleeps = []
+
+    async def fake_sleep(self, seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(wrappers.CircuitBreaker, "sleep", fake_sleep)
+    monkeypatch.setattr(wrappers, "_circuit_breakers", {})
+    responses = iter([503, 200])
+
+    @wrappers.retry_on_failed_request(max_attempts=3)
+    async def fetch(url):
+        return httpx.Response(
+            next(responses),
+            headers={"Retry-After": "7"},
+            request=httpx.Request("GET", url),
+        )
+
+    response = await fetch("https://www.bbc.com/news")
+    assert response.status_code == 200
+    assert sleeps == [7]
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_once_open(monkeypatch):
+    from v2.client import wrappers
+
+    monkeypatch.setattr(wrappers, "_circuit_breakers", {})
+    breaker = wrappers.get_circuit_breaker(
+        "https://www.bbc.com", failure_threshold=2, recovery_timeout=60
+    )
+    calls = []
+
+    @wrappers.retry_on_failed_request(max_attempts=5, backoff_factor=0)
+    async def fetch(url):
+        calls.append(url)
+        return httpx.Response(503, request=httpx.Request("GET", url))
+
+    with pytest.raises(wrappers.CircuitOpenError):
+        await fetch("https://www.bbc.com/news/1")
+    assert len(calls) == 2
+    assert breaker.state == wrappers.CircuitState.OPEN
+    # other requests to the host don't touch the network
+    with pytest.raises(wrappers.CircuitOpenError):
+        await fetch("https://www.bbc.com/news/2")
+    assert len(calls) == 2
+
+
+def test_circuit_breaker_half_open_probe():
+    from v2.client.wrappers import CircuitBreaker, CircuitOpenError, CircuitState
+
+    breaker = CircuitBreaker("www.bbc.com", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.recovery_timeout = 60
+    breaker.opened_at -= 60
+    # one probe is let through, the rest fail fast
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_circuit_breaker_sleeps_in_any_event_loop():
+    from v2.client.wrappers import CircuitBreaker
+
+    breaker = CircuitBreaker("www.bbc.com", failure_threshold=1, recovery_timeout=60)
+    # e.g. warm lambda invocations, each with an asyncio.run of its own
+    asyncio.run(breaker.sleep(0.01))
+    breaker.record_failure()
+    start = time.monotonic()
+    asyncio.run(breaker.sleep(5))
+    # woken up straight away: the circuit is open
+    assert time.monotonic() - start < 1